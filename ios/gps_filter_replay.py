@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+離線重播 GPS 三層過濾漏斗（GPS_FILTERING_SYSTEM.md / src/services/gpsHistory.ts addPoint）
+
+用法:
+  python3 ios/gps_filter_replay.py ios/28-Jan-2026-1425.gpx
+  python3 ios/gps_filter_replay.py tracks/ --json report.json
+  python3 ios/gps_filter_replay.py tracks/ --max-accuracy 30 40 60 --max-speed 8 10 12 --window 3 5 7   # 參數掃描
+
+每個 GPX 檔視為一個會話（緩衝區與上一有效點從空開始），依序經過：
+  1. 精度過濾：accuracy > max_accuracy（米）丟棄；精度取自 <hdop>（本專案工具以米存放），缺少視為 0
+  2. 速度過濾：與上一個通過的「原始」點相隔 > 0.5 秒，且速度 > max_speed（m/s）、距離 > max_jump（米）時丟棄
+  3. 平滑化：最近 window 個通過點的平均座標
+  4. 最小距離：平滑後與上一個記錄點不到 min_distance（米）不記錄（第一點一定記錄）
+報告每層丟棄數、記錄點數，以及原始 / 記錄後的路徑長度。
+
+第 2、4 層都依賴上一個通過的點，只能逐點走；平行化在「軌跡」層級：多個檔以多行程同時重播，
+每個檔只讀一次，所有參數組合在同一個行程內重播。
+"""
+
+import argparse
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from gpx_stream import iter_points
+from rebase_gpx_times import collect_gpx_files, parse_gpx_time
+
+EARTH_RADIUS_M = 6371000
+# 與 gpsHistory.ts 相同的預設值
+MAX_ACCURACY_M = 40
+MAX_SPEED_MPS = 10
+MAX_JUMP_M = 50
+SMOOTHING_WINDOW = 5
+MIN_DISTANCE_M = 10
+# 時間差不超過此值（秒）時不做速度檢查（避免時間戳異常）
+MIN_SPEED_CHECK_S = 0.5
+LAYERS = ("accuracy", "teleport", "min_distance")
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """與 gpsHistory.ts calculateDistanceMeters 相同的 haversine（米）"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlam = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlam / 2) ** 2
+    return EARTH_RADIUS_M * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def load_track(path):
+    """GPX → (lats, lons, times 秒或 None, accuracies 米)"""
+    lats, lons, times, accs = [], [], [], []
+    for p in iter_points(path):
+        lats.append(float(p["lat"]))
+        lons.append(float(p["lon"]))
+        if p["time"]:
+            seconds, frac = parse_gpx_time(p["time"])
+            times.append(seconds + (float(frac) if frac else 0.0))
+        else:
+            times.append(None)
+        accs.append(float(p["hdop"]) if p["hdop"] else 0.0)
+    return lats, lons, times, accs
+
+
+def replay(track, max_accuracy=MAX_ACCURACY_M, max_speed=MAX_SPEED_MPS, max_jump=MAX_JUMP_M,
+           window=SMOOTHING_WINDOW, min_distance=MIN_DISTANCE_M):
+    """
+    對一條軌跡重播漏斗，回傳統計 dict：
+    points、rejected_<層>、recorded、raw_length_m、recorded_length_m，以及 recorded_points [(lat, lon)]
+    """
+    lats, lons, times, accs = track
+    rejected = dict.fromkeys(LAYERS, 0)
+    buf_lat, buf_lon = [], []
+    last_valid = None  # (lat, lon, t) 上一個通過前兩層的原始點
+    recorded = []
+    recorded_len = 0.0
+    for lat, lon, t, acc in zip(lats, lons, times, accs):
+        if acc > max_accuracy:
+            rejected["accuracy"] += 1
+            continue
+        if last_valid is not None and t is not None and last_valid[2] is not None:
+            dt = t - last_valid[2]
+            if dt > MIN_SPEED_CHECK_S:
+                dist = haversine_m(last_valid[0], last_valid[1], lat, lon)
+                if dist / dt > max_speed and dist > max_jump:
+                    rejected["teleport"] += 1
+                    continue
+
+        buf_lat.append(lat)
+        buf_lon.append(lon)
+        if len(buf_lat) > window:
+            del buf_lat[0], buf_lon[0]
+        # 每次重新加總（與 App 相同），不累計浮點誤差
+        avg_lat, avg_lon = sum(buf_lat) / len(buf_lat), sum(buf_lon) / len(buf_lon)
+        last_valid = (lat, lon, t)
+
+        if recorded:
+            step = haversine_m(recorded[-1][0], recorded[-1][1], avg_lat, avg_lon)
+            if step < min_distance:
+                rejected["min_distance"] += 1
+                continue
+            recorded_len += step
+        recorded.append((avg_lat, avg_lon))
+
+    raw_len = sum(haversine_m(lats[k], lons[k], lats[k + 1], lons[k + 1]) for k in range(len(lats) - 1))
+    return {
+        "points": len(lats),
+        **{f"rejected_{layer}": n for layer, n in rejected.items()},
+        "recorded": len(recorded),
+        "raw_length_m": raw_len,
+        "recorded_length_m": recorded_len,
+        "recorded_points": recorded,
+    }
+
+
+def config_grid(args):
+    """各參數的候選值做笛卡兒積 → [dict]"""
+    keys = ("max_accuracy", "max_speed", "max_jump", "window", "min_distance")
+    return [dict(zip(keys, values)) for values in itertools.product(*(getattr(args, k) for k in keys))]
+
+
+def _replay_task(task):
+    path, configs = task
+    try:
+        track = load_track(path)
+    except Exception as e:  # 單一檔案壞掉不影響其他檔
+        return {"path": path, "error": f"{type(e).__name__}: {e}"}
+    results = []
+    for cfg in configs:
+        stats = replay(track, **cfg)
+        del stats["recorded_points"]
+        results.append(stats)
+    return {"path": path, "results": results}
+
+
+def replay_corpus(files, configs, workers=None):
+    """多個檔平行重播；回傳與 files 同順序的 [{"path", "results" 或 "error"}]"""
+    tasks = [(f, configs) for f in files]
+    if workers == 1 or len(tasks) <= 1:
+        return [_replay_task(t) for t in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_replay_task, tasks, chunksize=max(1, len(tasks) // 64)))
+
+
+def summarize(per_file, configs):
+    """每個參數組合加總所有檔的統計"""
+    totals = []
+    for i, cfg in enumerate(configs):
+        agg = {"config": cfg, "tracks": 0}
+        for entry in per_file:
+            if "error" in entry:
+                continue
+            agg["tracks"] += 1
+            for key, value in entry["results"][i].items():
+                agg[key] = agg.get(key, 0) + value
+        totals.append(agg)
+    return totals
+
+
+def _format_totals(t):
+    cfg = t["config"]
+    points = t.get("points", 0) or 1
+    rej = "、".join(f"{layer} {t.get(f'rejected_{layer}', 0)}（{t.get(f'rejected_{layer}', 0) / points:.1%}）"
+                   for layer in LAYERS)
+    return (
+        f"精度≤{cfg['max_accuracy']:g}m 速度≤{cfg['max_speed']:g}m/s 跳躍{cfg['max_jump']:g}m "
+        f"窗口{cfg['window']} 最小距離{cfg['min_distance']:g}m："
+        f"{t['tracks']} 條、{t.get('points', 0)} 點 → 記錄 {t.get('recorded', 0)}；丟棄 {rej}；"
+        f"長度 {t.get('raw_length_m', 0) / 1000:.2f} → {t.get('recorded_length_m', 0) / 1000:.2f} km"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="離線重播 GPS 三層過濾漏斗")
+    parser.add_argument("paths", nargs="+", help="GPX 檔或目錄（目錄遞迴找 *.gpx）")
+    parser.add_argument("--max-accuracy", type=float, nargs="+", default=[MAX_ACCURACY_M], help="精度閾值（米）")
+    parser.add_argument("--max-speed", type=float, nargs="+", default=[MAX_SPEED_MPS], help="速度閾值（m/s）")
+    parser.add_argument("--max-jump", type=float, nargs="+", default=[MAX_JUMP_M], help="跳躍距離閾值（米）")
+    parser.add_argument("--window", type=int, nargs="+", default=[SMOOTHING_WINDOW], help="平滑窗口點數")
+    parser.add_argument("--min-distance", type=float, nargs="+", default=[MIN_DISTANCE_M], help="最小記錄距離（米）")
+    parser.add_argument("--workers", type=int, default=None, help="平行行程數（預設 CPU 核心數）")
+    parser.add_argument("--json", help="另把每檔與加總的統計寫成 JSON")
+    args = parser.parse_args(argv)
+
+    files = collect_gpx_files(args.paths)
+    if not files:
+        print("❌ 沒有找到 GPX 檔")
+        sys.exit(1)
+    configs = config_grid(args)
+    t0 = time.perf_counter()
+    per_file = replay_corpus(files, configs, args.workers)
+    elapsed = time.perf_counter() - t0
+
+    for entry in per_file:
+        if "error" in entry:
+            print(f"❌ {entry['path']}: {entry['error']}")
+    totals = summarize(per_file, configs)
+    for t in totals:
+        print(_format_totals(t))
+    print(f"{len(files)} 個檔 × {len(configs)} 組參數，耗時 {elapsed:.2f} 秒")
+
+    if args.json:
+        tmp_path = f"{args.json}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"configs": configs, "totals": totals, "files": per_file}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, args.json)
+        print(f"→ {args.json}")
+    if any("error" in entry for entry in per_file):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
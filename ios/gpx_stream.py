@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+ios/ 底下 GPX 工具共用的串流讀寫（記憶體用量不隨檔案大小成長）
+
+- iter_points: 以 iterparse 逐點讀取 <trkpt> / <wpt> / <rtept>，處理完的元素立即清除
+- GpxWriter: 逐點寫出 GPX（<wpt> 或 <trk><trkseg><trkpt>），先寫暫存檔再 rename
+- read_first_time / rewrite_times: 逐行改寫所有 <time>，其餘內容原樣保留
+
+有無 xmlns 的 GPX 都能讀（只比對標籤的本地名稱）。
+"""
+
+import os
+import re
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape, quoteattr
+
+GPX_NS = "http://www.topografix.com/GPX/1/1"
+POINT_TAGS = ("trkpt", "wpt", "rtept")
+# 點的子元素中會讀出的欄位；hdop 在本專案的工具裡存放水平精度（米，對應 iOS horizontalAccuracy）
+POINT_FIELDS = ("ele", "time", "name", "hdop")
+_TIME = re.compile(r"(<time>)([^<]*)(</time>)")
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def normalize_time(text):
+    """GPX 時間字串正規化：去空白、空格改 T、無時區時補 Z"""
+    text = (text or "").strip().replace(" ", "T")
+    if text and not text.endswith("Z") and "+" not in text:
+        text += "Z"
+    return text
+
+
+def iter_points(path, kinds=POINT_TAGS):
+    """
+    逐一產生 GPX 中的點：{"kind", "lat", "lon", "ele", "time", "name", "hdop"}（皆為原始字串，缺少為 None）。
+    每個點讀完即從樹上移除，長時間的軌跡也只佔固定記憶體。
+    """
+    stack = []
+    in_point = 0
+    for event, elem in ET.iterparse(str(path), events=("start", "end")):
+        name = _local(elem.tag)
+        if event == "start":
+            stack.append(elem)
+            if name in kinds:
+                in_point += 1
+            continue
+        stack.pop()
+        if name in kinds:
+            in_point -= 1
+            point = {"kind": name, "lat": elem.get("lat"), "lon": elem.get("lon"), "ele": None, "time": None,
+                     "name": None, "hdop": None}
+            for child in elem:
+                field = _local(child.tag)
+                if field in POINT_FIELDS:
+                    point[field] = (child.text or "").strip() or None
+            yield point
+        elif in_point:
+            continue  # 點的子元素要等點本身讀完
+        if stack:
+            stack[-1].remove(elem)
+        elem.clear()
+
+
+def read_first_time(path):
+    """文件中第一個 <time> 的內容（含 <metadata>），沒有則回傳 None"""
+    for event, elem in ET.iterparse(str(path), events=("end",)):
+        if _local(elem.tag) == "time":
+            return (elem.text or "").strip() or None
+    return None
+
+
+def rewrite_times(src, dst, fn):
+    """
+    逐行複製 src 到 dst，把每個 <time>…</time> 的內容換成 fn(原內容)，回傳改寫的個數。
+    dst 先寫暫存檔再 rename，可與 src 相同。
+    """
+    count = 0
+
+    def repl(m):
+        nonlocal count
+        count += 1
+        return f"{m.group(1)}{fn(m.group(2))}{m.group(3)}"
+
+    tmp_path = f"{dst}.tmp"
+    try:
+        with open(src, "r", encoding="utf-8", newline="") as fin, open(tmp_path, "w", encoding="utf-8", newline="") as fout:
+            pending = ""
+            for line in fin:
+                pending += line
+                # <time> 跨行時先累積到 </time> 出現
+                if pending.rfind("<time>") > pending.rfind("</time>"):
+                    continue
+                fout.write(_TIME.sub(repl, pending))
+                pending = ""
+            fout.write(_TIME.sub(repl, pending))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, dst)
+    return count
+
+
+class GpxWriter:
+    """
+    串流寫出 GPX。kind="wpt" 寫成 Xcode 模擬器用的 <wpt> 清單；kind="trkpt" 寫成 <trk><trkseg>。
+    indent 為每層縮排；metadata 可含 name / desc / time。輸出結尾不加換行（與原本各腳本相同）。
+    """
+
+    def __init__(self, path, creator="SolefoodMVP", kind="wpt", indent="    ", xmlns=None, metadata=None,
+                 track_name=None):
+        self.path = str(path)
+        self.tmp_path = f"{self.path}.tmp"
+        self.kind = kind
+        self.indent = indent
+        self.count = 0
+        self._f = open(self.tmp_path, "w", encoding="utf-8")
+        ns = f" xmlns={quoteattr(xmlns)}" if xmlns else ""
+        self._line('<?xml version="1.0" encoding="UTF-8"?>', 0, first=True)
+        self._line(f"<gpx version=\"1.1\" creator={quoteattr(creator)}{ns}>", 0)
+        if metadata:
+            self._line("<metadata>", 1)
+            for key in ("name", "desc", "time"):
+                if metadata.get(key) is not None:
+                    self._line(f"<{key}>{escape(str(metadata[key]))}</{key}>", 2)
+            self._line("</metadata>", 1)
+        if kind == "trkpt":
+            self._line("<trk>", 1)
+            if track_name is not None:
+                self._line(f"<name>{escape(track_name)}</name>", 2)
+            self._line("<trkseg>", 2)
+        self._depth = 3 if kind == "trkpt" else 1
+
+    def _line(self, text, depth, first=False):
+        self._f.write(("" if first else "\n") + self.indent * depth + text)
+
+    def write(self, lat, lon, time=None, ele=None, name=None, hdop=None):
+        """寫一個點；lat / lon / ele / hdop 照原樣輸出（字串或已格式化的數字）"""
+        d = self._depth
+        self._line(f"<{self.kind} lat=\"{lat}\" lon=\"{lon}\">", d)
+        if name is not None:
+            self._line(f"<name>{escape(name)}</name>", d + 1)
+        if ele is not None:
+            self._line(f"<ele>{ele}</ele>", d + 1)
+        if time is not None:
+            self._line(f"<time>{time}</time>", d + 1)
+        if hdop is not None:
+            self._line(f"<hdop>{hdop}</hdop>", d + 1)
+        self._line(f"</{self.kind}>", d)
+        self.count += 1
+
+    def new_segment(self):
+        """trkpt 模式下結束目前的 <trkseg> 並開始新的一段（例如一天內的多次會話）"""
+        if self.kind != "trkpt":
+            raise ValueError("只有 kind=\"trkpt\" 才有 <trkseg>")
+        self._line("</trkseg>", 2)
+        self._line("<trkseg>", 2)
+
+    def close(self):
+        if self.kind == "trkpt":
+            self._line("</trkseg>", 2)
+            self._line("</trk>", 1)
+        self._line("</gpx>", 0)
+        self._f.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self._f.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
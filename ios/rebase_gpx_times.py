@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+批次把 GPX 的時間戳平移到指定起點（預設現在），讓 iOS 模擬器從該時間開始播放軌跡
+
+用法:
+  python3 ios/rebase_gpx_times.py ios/SolefoodMVP/test.gpx
+  python3 ios/rebase_gpx_times.py ios/ fixtures/ --stagger 600     # 目錄遞迴找 *.gpx，每個檔依序晚 10 分鐘開始
+  python3 ios/rebase_gpx_times.py a.gpx --start 2026-03-01T08:00:00Z --only-past
+
+- 每個檔整體平移：新時間 = 起點 + (原時間 - 檔內第一個時間)，點與點的間隔不變
+- 時間格式固定（YYYY-MM-DDTHH:MM:SS[.fff]Z），以切片解析並按分鐘快取日期時間前綴，不逐筆呼叫 datetime；
+  其他格式（時區位移、空格分隔）退回 datetime.fromisoformat
+- 多個檔以多行程平行處理；每個檔串流改寫（gpx_stream.rewrite_times），寫完才取代原檔
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timezone
+
+from gpx_stream import normalize_time, read_first_time, rewrite_times
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# 軌跡的點多半每秒一筆，同一分鐘只解析 / 格式化一次 "YYYY-MM-DDTHH:MM:" 前綴
+_MINUTE_OF_PREFIX = {}
+_PREFIX_OF_MINUTE = {}
+_CACHE_MAX = 1 << 16
+
+
+def parse_gpx_time(text):
+    """GPX 時間 → (epoch 整數秒, 小數部分字串，如 ".250" 或 "")"""
+    s = text.strip()
+    if len(s) >= 20 and s[-1] == "Z" and s[10] == "T" and s[13] == ":" and s[16] == ":":
+        prefix = s[:17]
+        minute = _MINUTE_OF_PREFIX.get(prefix)
+        if minute is None:
+            day = date(int(s[0:4]), int(s[5:7]), int(s[8:10])).toordinal() - _EPOCH_ORDINAL
+            minute = day * 1440 + int(s[11:13]) * 60 + int(s[14:16])
+            if len(_MINUTE_OF_PREFIX) >= _CACHE_MAX:
+                _MINUTE_OF_PREFIX.clear()
+            _MINUTE_OF_PREFIX[prefix] = minute
+        return minute * 60 + int(s[17:19]), s[19:-1]
+    dt = datetime.fromisoformat(normalize_time(s).replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    whole = int(dt.timestamp() // 1)
+    frac = f".{dt.microsecond:06d}".rstrip("0") if dt.microsecond else ""
+    return whole, frac
+
+
+def format_gpx_time(seconds, frac=""):
+    """epoch 整數秒 → YYYY-MM-DDTHH:MM:SS[frac]Z（UTC）"""
+    minute, sec = divmod(seconds, 60)
+    prefix = _PREFIX_OF_MINUTE.get(minute)
+    if prefix is None:
+        day, rem = divmod(minute, 1440)
+        h, m = divmod(rem, 60)
+        prefix = f"{date.fromordinal(day + _EPOCH_ORDINAL).isoformat()}T{h:02d}:{m:02d}:"
+        if len(_PREFIX_OF_MINUTE) >= _CACHE_MAX:
+            _PREFIX_OF_MINUTE.clear()
+        _PREFIX_OF_MINUTE[minute] = prefix
+    return f"{prefix}{sec:02d}{frac}Z"
+
+
+def parse_start(value):
+    """--start 參數："now" 或 ISO 時間 → epoch 整數秒"""
+    if value in (None, "", "now"):
+        return int(time.time())
+    return parse_gpx_time(normalize_time(value))[0]
+
+
+def rebase_file(path, start, dst=None, only_if_past=False):
+    """
+    把 path 的所有 <time> 平移成從 start（epoch 秒）開始，寫到 dst（預設原檔）。
+    回傳 {"path", "count", "first", "last", "shifted"}；沒有時間標籤時 count 為 0。
+    only_if_past：第一個時間已晚於 start 時不改。
+    """
+    result = {"path": str(path), "count": 0, "first": None, "last": None, "shifted": False}
+    first_text = read_first_time(path)
+    if not first_text:
+        return result
+    delta = start - parse_gpx_time(first_text)[0]
+    if only_if_past and delta <= 0:
+        result["first"] = normalize_time(first_text)
+        return result
+
+    def shift(text):
+        seconds, frac = parse_gpx_time(text)
+        new = format_gpx_time(seconds + delta, frac)
+        if result["first"] is None:
+            result["first"] = new
+        result["last"] = new
+        return new
+
+    result["count"] = rewrite_times(path, dst or path, shift)
+    result["shifted"] = True
+    return result
+
+
+def collect_gpx_files(paths):
+    """檔案照列；目錄遞迴找 *.gpx（依路徑排序）"""
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            found = []
+            for dirpath, _, names in os.walk(p):
+                found.extend(os.path.join(dirpath, n) for n in names if n.lower().endswith(".gpx"))
+            files.extend(sorted(found))
+        else:
+            files.append(p)
+    return files
+
+
+def _rebase_task(args):
+    path, start, only_if_past = args
+    try:
+        return rebase_file(path, start, only_if_past=only_if_past)
+    except Exception as e:  # 單一檔案壞掉不影響其他檔
+        return {"path": str(path), "error": f"{type(e).__name__}: {e}"}
+
+
+def rebase_many(files, start, stagger_s=0, only_if_past=False, workers=None):
+    """第 i 個檔從 start + i * stagger_s 開始；回傳與 files 同順序的結果列表"""
+    tasks = [(f, start + i * stagger_s, only_if_past) for i, f in enumerate(files)]
+    if workers == 1 or len(tasks) <= 1:
+        return [_rebase_task(t) for t in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_rebase_task, tasks, chunksize=max(1, len(tasks) // 64)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批次平移 GPX 時間戳")
+    parser.add_argument("paths", nargs="+", help="GPX 檔或目錄（目錄遞迴找 *.gpx）")
+    parser.add_argument("--start", default="now", help="起點時間（ISO，如 2026-03-01T08:00:00Z；預設 now）")
+    parser.add_argument("--stagger", type=int, default=0, help="每個檔依序延後的整數秒數（預設 0，全部同時開始）")
+    parser.add_argument("--only-past", action="store_true", help="只改第一個時間早於起點的檔")
+    parser.add_argument("--workers", type=int, default=None, help="平行行程數（預設 CPU 核心數）")
+    args = parser.parse_args(argv)
+
+    files = collect_gpx_files(args.paths)
+    if not files:
+        print("❌ 沒有找到 GPX 檔")
+        sys.exit(1)
+    start = parse_start(args.start)
+    t0 = time.perf_counter()
+    results = rebase_many(files, start, args.stagger, args.only_past, args.workers)
+    elapsed = time.perf_counter() - t0
+
+    errors = [r for r in results if "error" in r]
+    for r in results:
+        if "error" in r:
+            print(f"❌ {r['path']}: {r['error']}")
+        elif not r["count"] and not r["first"]:
+            print(f"⚠️  {r['path']}: 未找到時間標籤")
+        elif not r["shifted"]:
+            print(f"ℹ️  {r['path']}: 已是未來時間（{r['first']}），未修改")
+        else:
+            print(f"✅ {r['path']}: {r['count']} 個時間點，{r['first']} → {r['last']}")
+    total = sum(r.get("count", 0) for r in results)
+    print(f"共 {len(files)} 個檔、{total} 個時間點，耗時 {elapsed:.2f} 秒")
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+軌跡簡化：減少 GPX 點數，讓模擬器播放與地圖 / H3 渲染測試更輕
+
+用法:
+  python3 ios/simplify_gpx.py ios/28-Jan-2026-1425.gpx                       # → 28-Jan-2026-1425.simplified.gpx
+  python3 ios/simplify_gpx.py in.gpx out.gpx --method vw --tolerance 3
+  python3 ios/simplify_gpx.py in.gpx out.gpx --min-interval 2                # 另外讓保留的點至少相隔 2 秒
+
+- dp：Douglas–Peucker，保證每個原始點到簡化後折線的距離不超過 tolerance（米）
+- vw：Visvalingam–Whyatt，反覆移除「與前後點構成三角形面積最小」的點，
+  直到最小面積 ≥ tolerance²（平方米）；形狀較圓滑，但偏差不保證在 tolerance 內
+- --min-interval：簡化前先丟掉距上一個保留點不到 N 秒的點（頭尾一定保留）
+- 座標先以軌跡平均緯度投影成平面公尺（等距圓柱），距離計算都在平面上
+- 完成後印出點數減少比例與實際最大偏差（每個原始點到簡化折線的距離）
+
+有安裝 numpy 時，長區段的點到線段距離與初始三角形面積以向量化計算；沒有則退回純 Python，結果相同。
+輸出保留輸入的點類型（trkpt / wpt）與 ele、time、name、hdop 原始字串。
+"""
+
+import argparse
+import heapq
+import math
+import sys
+from pathlib import Path
+
+from gpx_stream import GpxWriter, iter_points
+from rebase_gpx_times import parse_gpx_time
+
+try:
+    import numpy as np
+except ImportError:  # numpy 為選用依賴
+    np = None
+
+EARTH_RADIUS_M = 6371000
+DEFAULT_TOLERANCE_M = 5.0
+METHODS = ("dp", "vw")
+# 區段內點數達此值才改走 numpy（太少時呼叫開銷比純 Python 還大）
+VECTORIZE_MIN_POINTS = 32
+
+
+class Coords:
+    """平面公尺座標：list 供逐點存取；有 numpy 時另存 ndarray 供長區段向量化"""
+
+    def __init__(self, xs, ys):
+        self.xs = list(xs)
+        self.ys = list(ys)
+        self.ax = np.asarray(self.xs, dtype=np.float64) if np is not None else None
+        self.ay = np.asarray(self.ys, dtype=np.float64) if np is not None else None
+
+    def __len__(self):
+        return len(self.xs)
+
+    def subset(self, idx):
+        return Coords([self.xs[k] for k in idx], [self.ys[k] for k in idx])
+
+    def segment_max(self, i, j):
+        """第 i+1 … j-1 點到線段 (i, j) 的最遠者 → (索引, 距離米)；同距離取索引最小者"""
+        if self.ax is not None and j - i > VECTORIZE_MIN_POINTS:
+            ax, ay = self.ax[i], self.ay[i]
+            dx, dy = self.ax[j] - ax, self.ay[j] - ay
+            seg2 = dx * dx + dy * dy
+            px = self.ax[i + 1:j] - ax
+            py = self.ay[i + 1:j] - ay
+            if seg2 == 0:
+                d = np.hypot(px, py)
+            else:
+                t = np.clip((px * dx + py * dy) / seg2, 0.0, 1.0)
+                d = np.hypot(px - t * dx, py - t * dy)
+            k = int(np.argmax(d))
+            return i + 1 + k, float(d[k])
+        xs, ys = self.xs, self.ys
+        ax, ay = xs[i], ys[i]
+        dx, dy = xs[j] - ax, ys[j] - ay
+        seg2 = dx * dx + dy * dy
+        best, best_d = i + 1, -1.0
+        for k in range(i + 1, j):
+            px, py = xs[k] - ax, ys[k] - ay
+            t = 0.0 if seg2 == 0 else min(1.0, max(0.0, (px * dx + py * dy) / seg2))
+            d = math.hypot(px - t * dx, py - t * dy)
+            if d > best_d:
+                best, best_d = k, d
+        return best, best_d
+
+    def triangle_areas(self):
+        """每個內部點與前後點構成的三角形面積（平方米），頭尾為無限大"""
+        n = len(self)
+        if self.ax is not None and n > 2:
+            xs, ys = self.ax, self.ay
+            areas = np.full(n, math.inf)
+            areas[1:-1] = 0.5 * np.abs(
+                (xs[:-2] - xs[2:]) * (ys[1:-1] - ys[:-2]) - (xs[:-2] - xs[1:-1]) * (ys[2:] - ys[:-2])
+            )
+            return areas.tolist()
+        areas = [math.inf] * n
+        for k in range(1, n - 1):
+            areas[k] = self.area(k - 1, k, k + 1)
+        return areas
+
+    def area(self, a, b, c):
+        xs, ys = self.xs, self.ys
+        return 0.5 * abs((xs[a] - xs[c]) * (ys[b] - ys[a]) - (xs[a] - xs[b]) * (ys[c] - ys[a]))
+
+    def path_length(self, idx):
+        xs, ys = self.xs, self.ys
+        return sum(math.hypot(xs[b] - xs[a], ys[b] - ys[a]) for a, b in zip(idx, idx[1:]))
+
+
+def project(lats, lons):
+    """經緯度 → 以平均緯度為基準的平面公尺座標"""
+    lat0 = sum(lats) / len(lats) if lats else 0.0
+    kx = EARTH_RADIUS_M * math.cos(math.radians(lat0)) * math.pi / 180
+    ky = EARTH_RADIUS_M * math.pi / 180
+    return Coords([lo * kx for lo in lons], [la * ky for la in lats])
+
+
+def douglas_peucker(coords, tolerance_m):
+    """回傳保留點的索引（遞增）；以堆疊取代遞迴，長軌跡不會爆遞迴深度"""
+    n = len(coords)
+    if n <= 2:
+        return list(range(n))
+    keep = [False] * n
+    keep[0] = keep[n - 1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        i, j = stack.pop()
+        if j - i < 2:
+            continue
+        k, dist = coords.segment_max(i, j)
+        if dist > tolerance_m:
+            keep[k] = True
+            stack.append((i, k))
+            stack.append((k, j))
+    return [k for k in range(n) if keep[k]]
+
+
+def visvalingam_whyatt(coords, tolerance_m):
+    """回傳保留點的索引（遞增）；面積門檻為 tolerance_m²"""
+    n = len(coords)
+    if n <= 2:
+        return list(range(n))
+    threshold = tolerance_m * tolerance_m
+    areas = coords.triangle_areas()
+    prev = list(range(-1, n - 1))
+    nxt = list(range(1, n + 1))
+    removed = [False] * n
+    heap = [(areas[k], k) for k in range(1, n - 1)]
+    heapq.heapify(heap)
+    floor = 0.0
+    while heap:
+        area, k = heapq.heappop(heap)
+        if removed[k] or area != areas[k]:
+            continue  # 已移除或面積已更新的舊項目
+        if area >= threshold:
+            break
+        # 鄰點重算後的面積不得小於已移除者，移除順序才不會倒退（Visvalingam 原論文的作法）
+        floor = max(floor, area)
+        removed[k] = True
+        p, q = prev[k], nxt[k]
+        nxt[p], prev[q] = q, p
+        for m in (p, q):
+            if 0 < m < n - 1:
+                areas[m] = max(floor, coords.area(prev[m], m, nxt[m]))
+                heapq.heappush(heap, (areas[m], m))
+    return [k for k in range(n) if not removed[k]]
+
+
+def thin_by_time(times, min_interval_s):
+    """丟掉距上一個保留點不到 min_interval_s 秒的點（頭尾保留、無時間的點保留），回傳索引"""
+    n = len(times)
+    keep = []
+    last = None
+    for k, t in enumerate(times):
+        if k in (0, n - 1) or t is None or last is None or t - last >= min_interval_s:
+            keep.append(k)
+            if t is not None:
+                last = t
+    return keep
+
+
+def max_deviation(coords, kept):
+    """每個原始點到簡化折線（對應區段）的最大距離（米）"""
+    worst = 0.0
+    for i, j in zip(kept, kept[1:]):
+        if j - i >= 2:
+            worst = max(worst, coords.segment_max(i, j)[1])
+    return worst
+
+
+def simplify_points(points, tolerance_m=DEFAULT_TOLERANCE_M, method="dp", min_interval_s=None):
+    """
+    points 為 gpx_stream.iter_points 的輸出列表；回傳 (保留的 points, 報告 dict)。
+    報告含 before / after / reduction / max_deviation_m / length_m / simplified_length_m。
+    """
+    if method not in METHODS:
+        raise ValueError(f"未知的簡化方法: {method}")
+    idx = list(range(len(points)))
+    if min_interval_s:
+        times = [parse_gpx_time(p["time"])[0] if p["time"] else None for p in points]
+        idx = thin_by_time(times, min_interval_s)
+    coords = project([float(p["lat"]) for p in points], [float(p["lon"]) for p in points])
+    sub = coords if len(idx) == len(points) else coords.subset(idx)
+    simplify = douglas_peucker if method == "dp" else visvalingam_whyatt
+    kept = [idx[k] for k in simplify(sub, tolerance_m)]
+
+    report = {
+        "method": method,
+        "tolerance_m": tolerance_m,
+        "before": len(points),
+        "after": len(kept),
+        "reduction": 1 - len(kept) / len(points) if points else 0.0,
+        "max_deviation_m": max_deviation(coords, kept),
+        "length_m": coords.path_length(range(len(points))),
+        "simplified_length_m": coords.path_length(kept),
+    }
+    return [points[k] for k in kept], report
+
+
+def write_points(path, points, creator="SolefoodMVP"):
+    """依第一個點的類型（trkpt / wpt）寫出 GPX"""
+    kind = points[0]["kind"] if points and points[0]["kind"] in ("trkpt", "wpt") else "trkpt"
+    with GpxWriter(path, creator=creator, kind=kind) as out:
+        for p in points:
+            out.write(p["lat"], p["lon"], time=p["time"], ele=p["ele"], name=p["name"], hdop=p.get("hdop"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GPX 軌跡簡化（Douglas–Peucker / Visvalingam–Whyatt）")
+    parser.add_argument("input", help="輸入 GPX")
+    parser.add_argument("output", nargs="?", help="輸出 GPX（預設 <輸入>.simplified.gpx）")
+    parser.add_argument("--method", choices=METHODS, default="dp", help="dp（預設）或 vw")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE_M, help="容許偏差（米），預設 5")
+    parser.add_argument("--min-interval", type=float, help="保留點之間的最小時間間隔（秒）")
+    args = parser.parse_args(argv)
+
+    src = Path(args.input)
+    if not src.exists():
+        print(f"找不到: {src}")
+        sys.exit(1)
+    dst = Path(args.output) if args.output else src.with_suffix(".simplified.gpx")
+    points = list(iter_points(src))
+    if not points:
+        print("未找到任何點")
+        sys.exit(1)
+    kept, report = simplify_points(points, args.tolerance, args.method, args.min_interval)
+    write_points(dst, kept)
+    print(
+        f"{report['method']} 容許 {report['tolerance_m']:g} m：{report['before']} → {report['after']} 點"
+        f"（減少 {report['reduction']:.1%}），最大偏差 {report['max_deviation_m']:.2f} m，"
+        f"長度 {report['length_m']:.0f} → {report['simplified_length_m']:.0f} m → {dst}"
+    )
+
+
+if __name__ == "__main__":
+    main()
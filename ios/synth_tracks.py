@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+合成 GPS 軌跡產生器（給歷史紀錄儲存、H3 渲染、過濾漏斗的壓力測試用）
+
+用法:
+  python3 ios/synth_tracks.py out.gpx                                          # 隨機漫步 30 分鐘，每秒一點
+  python3 ios/synth_tracks.py out.gpx --mode grid --duration 7200 --interval 0.5
+  python3 ios/synth_tracks.py day.gpx --sessions 4 --duration 1800 --seed 7     # 一天 4 次會話，各為一段 <trkseg>
+  python3 ios/synth_tracks.py big.sgtk --duration 3000000                       # 三百萬點，寫成精簡二進位
+
+- walk：隨機漫步（方向緩慢變化、速度小幅波動）
+- grid：沿街道格網移動，到路口時直走 / 左轉 / 右轉（不迴轉）
+- 每點加上高斯抖動；偶發「精度下降」片段（accuracy 50–150 m、抖動放大）與單點瞬移（100–500 m）
+- 同一個 seed 產生完全相同的軌跡；逐點產生、逐點寫出，點數不受記憶體限制
+
+輸出依副檔名：
+  .gpx   <trk><trkseg><trkpt>，<hdop> 存水平精度（米），多次會話各為一段 <trkseg>
+  .sgtk  精簡二進位（見下），每點 15 bytes，約為 GPX 的 1/8
+
+.sgtk 格式（little-endian，版本 1）：
+  magic    b"SGTK"
+  version  u8
+  flags    u8（保留，目前為 0）
+  start_ms int64（第一點的 epoch 毫秒）
+  每點     int32 緯度 × 1e6、int32 經度 × 1e6、uint32 距上一點的毫秒（第一點為 0）、
+           uint16 精度（0.1 m，上限 6553.5 m）、u8 旗標（bit0 = 新會話的第一點）
+  點數不寫在檔頭，讀到檔尾為止，寫入時不必回頭修改。
+"""
+
+import argparse
+import math
+import os
+import random
+import struct
+import sys
+import time
+
+from gpx_stream import GpxWriter
+from rebase_gpx_times import format_gpx_time, parse_start
+
+# 台北 101
+DEFAULT_ORIGIN = (25.0330, 121.5654)
+METERS_PER_DEG_LAT = 6371000 * math.pi / 180
+DEFAULT_SPEED_MPS = 2.8
+JITTER_SIGMA_M = 3.0
+# 正常情況的 accuracy 範圍（米）
+BASE_ACCURACY_M = (4.0, 16.0)
+# 每點開始一段精度下降的機率、片段長度（點數）與期間的 accuracy / 抖動
+ACCURACY_DROP_RATE = 0.002
+ACCURACY_DROP_POINTS = (5, 60)
+DROP_ACCURACY_M = (50.0, 150.0)
+DROP_JITTER_SIGMA_M = 25.0
+# 每點發生單點瞬移的機率與距離（米）
+TELEPORT_RATE = 0.003
+TELEPORT_DISTANCE_M = (100.0, 500.0)
+GRID_BLOCK_M = 120.0
+# 路口時的選擇機率：直走、左轉（其餘為右轉）
+GRID_STRAIGHT = 0.6
+GRID_LEFT = 0.2
+# 多次會話之間的間隔（秒）
+SESSION_GAP_S = (1800, 4 * 3600)
+
+SGTK_MAGIC = b"SGTK"
+SGTK_VERSION = 1
+_SGTK_HEADER = struct.Struct("<4sBBq")
+_SGTK_RECORD = struct.Struct("<iiIHB")
+COORD_SCALE = 1_000_000
+
+
+def _offset(lat, lon, north_m, east_m):
+    """以公尺平移經緯度（小範圍平面近似）"""
+    return (lat + north_m / METERS_PER_DEG_LAT,
+            lon + east_m / (METERS_PER_DEG_LAT * math.cos(math.radians(lat))))
+
+
+class _Walk:
+    """隨機漫步：方向每秒以高斯擾動，速度在 ±20% 內波動"""
+
+    def __init__(self, rng, speed):
+        self.rng = rng
+        self.speed = speed
+        self.heading = rng.uniform(0, 2 * math.pi)
+
+    def step(self, dt):
+        self.heading += self.rng.gauss(0, math.radians(12)) * math.sqrt(dt)
+        d = self.speed * self.rng.uniform(0.8, 1.2) * dt
+        return d * math.cos(self.heading), d * math.sin(self.heading)
+
+
+class _Grid:
+    """街道格網：沿東西 / 南北向街道前進，到路口時選擇方向"""
+
+    _DIRS = ((1, 0), (0, 1), (-1, 0), (0, -1))  # 北、東、南、西（north, east）
+
+    def __init__(self, rng, speed, block_m=GRID_BLOCK_M):
+        self.rng = rng
+        self.speed = speed
+        self.block_m = block_m
+        self.dir = rng.randrange(4)
+        self.to_corner = block_m
+
+    def step(self, dt):
+        remaining = self.speed * self.rng.uniform(0.85, 1.15) * dt
+        north = east = 0.0
+        while remaining > 0:
+            d = min(remaining, self.to_corner)
+            dn, de = self._DIRS[self.dir]
+            north += dn * d
+            east += de * d
+            remaining -= d
+            self.to_corner -= d
+            if self.to_corner <= 1e-9:
+                r = self.rng.random()
+                if r >= GRID_STRAIGHT:
+                    self.dir = (self.dir + (3 if r < GRID_STRAIGHT + GRID_LEFT else 1)) % 4
+                self.to_corner = self.block_m
+        return north, east
+
+
+def iter_track(seed=0, mode="walk", origin=DEFAULT_ORIGIN, start=None, duration_s=1800, interval_s=1.0,
+               sessions=1, speed=DEFAULT_SPEED_MPS, jitter_m=JITTER_SIGMA_M, drop_rate=ACCURACY_DROP_RATE,
+               teleport_rate=TELEPORT_RATE):
+    """
+    逐點產生 (epoch 毫秒, lat, lon, accuracy 米, 是否新會話第一點)。
+    真實位置照 mode 移動；輸出位置 = 真實位置 + 抖動（精度下降期間放大），偶爾為瞬移點。
+    """
+    rng = random.Random(seed)
+    mover = _Grid(rng, speed) if mode == "grid" else _Walk(rng, speed)
+    lat, lon = origin
+    t_ms = (int(time.time()) if start is None else start) * 1000
+    step_ms = int(round(interval_s * 1000))
+    per_session = max(1, int(duration_s / interval_s))
+    drop_left = 0
+    for session in range(sessions):
+        if session:
+            t_ms += rng.randint(*SESSION_GAP_S) * 1000
+        for k in range(per_session):
+            if k:
+                north, east = mover.step(interval_s)
+                lat, lon = _offset(lat, lon, north, east)
+                t_ms += step_ms
+            if drop_left == 0 and rng.random() < drop_rate:
+                drop_left = rng.randint(*ACCURACY_DROP_POINTS)
+            if drop_left:
+                drop_left -= 1
+                acc = rng.uniform(*DROP_ACCURACY_M)
+                sigma = DROP_JITTER_SIGMA_M
+            else:
+                acc = rng.uniform(*BASE_ACCURACY_M)
+                sigma = jitter_m
+            out_lat, out_lon = _offset(lat, lon, rng.gauss(0, sigma), rng.gauss(0, sigma))
+            if rng.random() < teleport_rate:
+                bearing = rng.uniform(0, 2 * math.pi)
+                dist = rng.uniform(*TELEPORT_DISTANCE_M)
+                out_lat, out_lon = _offset(out_lat, out_lon, dist * math.cos(bearing), dist * math.sin(bearing))
+            yield t_ms, out_lat, out_lon, acc, k == 0 and session > 0
+
+
+def _time_text(t_ms, sub_second):
+    seconds, ms = divmod(t_ms, 1000)
+    return format_gpx_time(seconds, f".{ms:03d}" if sub_second else "")
+
+
+def write_gpx(path, points, sub_second=False, name="Synthetic Track"):
+    """points 為 iter_track 的輸出；回傳點數"""
+    with GpxWriter(path, creator="SolefoodMVP-Synth", kind="trkpt", indent="  ",
+                   xmlns="http://www.topografix.com/GPX/1/1", track_name=name) as out:
+        for t_ms, lat, lon, acc, new_session in points:
+            if new_session:
+                out.new_segment()
+            out.write(f"{lat:.6f}", f"{lon:.6f}", time=_time_text(t_ms, sub_second), hdop=f"{acc:.1f}")
+    return out.count
+
+
+def write_sgtk(path, points):
+    """寫出 .sgtk（先寫暫存檔再 rename）；回傳點數"""
+    tmp_path = f"{path}.tmp"
+    count = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            prev_ms = None
+            pack = _SGTK_RECORD.pack
+            for t_ms, lat, lon, acc, new_session in points:
+                if prev_ms is None:
+                    prev_ms = t_ms
+                    f.write(_SGTK_HEADER.pack(SGTK_MAGIC, SGTK_VERSION, 0, t_ms))
+                f.write(pack(round(lat * COORD_SCALE), round(lon * COORD_SCALE), t_ms - prev_ms,
+                             min(0xFFFF, round(acc * 10)), 1 if new_session else 0))
+                prev_ms = t_ms
+                count += 1
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return count
+
+
+def iter_sgtk(path):
+    """讀 .sgtk → 與 iter_track 相同的 (epoch 毫秒, lat, lon, accuracy 米, 是否新會話第一點)"""
+    with open(path, "rb") as f:
+        header = f.read(_SGTK_HEADER.size)
+        if len(header) < _SGTK_HEADER.size:
+            return
+        magic, version, _, t_ms = _SGTK_HEADER.unpack(header)
+        if magic != SGTK_MAGIC or version != SGTK_VERSION:
+            raise ValueError(f"不是 SGTK v{SGTK_VERSION} 檔案: {path}")
+        size = _SGTK_RECORD.size
+        while True:
+            chunk = f.read(size * 4096)
+            if not chunk:
+                break
+            for lat, lon, dt, acc, flags in _SGTK_RECORD.iter_unpack(chunk[:len(chunk) - len(chunk) % size]):
+                t_ms += dt
+                yield t_ms, lat / COORD_SCALE, lon / COORD_SCALE, acc / 10, bool(flags & 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="合成 GPS 軌跡產生器")
+    parser.add_argument("output", help="輸出檔（.gpx 或 .sgtk）")
+    parser.add_argument("--mode", choices=("walk", "grid"), default="walk", help="walk（預設）或 grid")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--duration", type=float, default=1800, help="每次會話的秒數（預設 1800）")
+    parser.add_argument("--interval", type=float, default=1.0, help="取樣間隔（秒，預設 1）")
+    parser.add_argument("--sessions", type=int, default=1, help="會話數（之間隔 30 分鐘到 4 小時）")
+    parser.add_argument("--speed", type=float, default=DEFAULT_SPEED_MPS, help="移動速度（m/s）")
+    parser.add_argument("--origin", type=float, nargs=2, metavar=("LAT", "LON"), default=list(DEFAULT_ORIGIN))
+    parser.add_argument("--start", default="now", help="第一點時間（ISO，預設 now）")
+    parser.add_argument("--jitter", type=float, default=JITTER_SIGMA_M, help="抖動標準差（米）")
+    parser.add_argument("--drop-rate", type=float, default=ACCURACY_DROP_RATE, help="每點開始精度下降的機率")
+    parser.add_argument("--teleport-rate", type=float, default=TELEPORT_RATE, help="每點瞬移的機率")
+    args = parser.parse_args(argv)
+
+    if args.interval <= 0 or args.sessions < 1:
+        print("❌ --interval 須 > 0，--sessions 須 ≥ 1")
+        sys.exit(1)
+    points = iter_track(
+        seed=args.seed,
+        mode=args.mode,
+        origin=tuple(args.origin),
+        start=parse_start(args.start),
+        duration_s=args.duration,
+        interval_s=args.interval,
+        sessions=args.sessions,
+        speed=args.speed,
+        jitter_m=args.jitter,
+        drop_rate=args.drop_rate,
+        teleport_rate=args.teleport_rate,
+    )
+    t0 = time.perf_counter()
+    if args.output.endswith(".sgtk"):
+        count = write_sgtk(args.output, points)
+    else:
+        count = write_gpx(args.output, points, sub_second=args.interval != int(args.interval))
+    elapsed = time.perf_counter() - t0
+    size_mb = os.path.getsize(args.output) / 1e6
+    print(f"✅ {count} 個點（{args.mode}，seed {args.seed}）→ {args.output}（{size_mb:.1f} MB，{elapsed:.1f} 秒）")
+
+
+if __name__ == "__main__":
+    main()
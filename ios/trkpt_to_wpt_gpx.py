@@ -3,42 +3,39 @@
 將 GPX 的 <trkpt> 轉成 Xcode 支援的 <wpt> 格式
 用法: python3 ios/trkpt_to_wpt_gpx.py [輸入.gpx] [輸出.gpx]
 預設: 讀取 ios/SolefoodMVP/28-Jan-2026-1425.gpx，輸出 ios/SolefoodMVP/test.gpx
+讀寫皆為串流（gpx_stream.py），長時間的軌跡也不會整份讀進記憶體
 """
 
-import re
 import sys
 from pathlib import Path
-from datetime import datetime, timedelta
+
+from gpx_stream import GpxWriter, iter_points, normalize_time
+
+def iter_trkpt_points(path: Path):
+    """從 trkpt 格式 GPX 逐點讀取 (lat, lon, time)；沒有 <time> 的點略過"""
+    for p in iter_points(path, kinds=("trkpt",)):
+        if p["time"] is None:
+            continue
+        yield {"lat": p["lat"], "lon": p["lon"], "time": normalize_time(p["time"])}
 
 def parse_trkpt_gpx(path: Path) -> list[dict]:
     """從 trkpt 格式 GPX 讀取 (lat, lon, time)"""
-    text = path.read_text(encoding="utf-8")
-    points = []
-    # <trkpt lat="..." lon="..."> ... <time>...</time> ...
-    for m in re.finditer(
-        r'<trkpt\s+lat="([^"]+)"\s+lon="([^"]+)"[^>]*>.*?<time>([^<]+)</time>',
-        text, re.DOTALL
-    ):
-        lat, lon, time_str = m.groups()
-        time_str = time_str.strip().replace(" ", "T")
-        if not time_str.endswith("Z") and "+" not in time_str:
-            time_str = time_str + "Z"
-        points.append({"lat": lat, "lon": lon, "time": time_str})
-    return points
+    return list(iter_trkpt_points(path))
 
-def write_wpt_gpx(path: Path, points: list[dict], creator: str = "SolefoodMVP"):
-    """寫出 Xcode 用的 <wpt> GPX"""
-    lines = [
-        '<?xml version="1.0" encoding="UTF-8"?>',
-        f'<gpx version="1.1" creator="{creator}">',
-    ]
-    for i, p in enumerate(points):
-        name_tag = '\n        <name>起點</name>' if i == 0 else ''
-        lines.append(f'    <wpt lat="{p["lat"]}" lon="{p["lon"]}">{name_tag}')
-        lines.append(f'        <time>{p["time"]}</time>')
-        lines.append('    </wpt>')
-    lines.append('</gpx>')
-    path.write_text("\n".join(lines), encoding="utf-8")
+def write_wpt_gpx(path: Path, points, creator: str = "SolefoodMVP") -> int:
+    """寫出 Xcode 用的 <wpt> GPX（points 可為任意可迭代物件，逐點寫出），回傳點數；沒有任何點時不寫檔"""
+    out = GpxWriter(path, creator=creator, kind="wpt")
+    try:
+        for p in points:
+            out.write(p["lat"], p["lon"], time=p["time"], name="起點" if out.count == 0 else None)
+    except BaseException:
+        out.abort()
+        raise
+    if out.count:
+        out.close()
+    else:
+        out.abort()
+    return out.count
 
 def main():
     ios_dir = Path(__file__).parent
@@ -53,13 +50,12 @@ def main():
     if not src.exists():
         print(f"找不到: {src}")
         sys.exit(1)
-    points = parse_trkpt_gpx(src)
-    if not points:
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    count = write_wpt_gpx(dst, iter_trkpt_points(src))
+    if not count:
         print("未找到任何 trkpt 點，請確認 GPX 含 <trkpt> 與 <time>")
         sys.exit(1)
-    dst.parent.mkdir(parents=True, exist_ok=True)
-    write_wpt_gpx(dst, points)
-    print(f"已轉換 {len(points)} 個點 -> {dst}")
+    print(f"已轉換 {count} 個點 -> {dst}")
 
 if __name__ == "__main__":
     main()
@@ -4,72 +4,45 @@
 这样 iOS 模拟器就会从现在开始播放轨迹
 """
 
-import xml.etree.ElementTree as ET
-from datetime import datetime, timedelta
 import sys
 import os
 
+from gpx_stream import normalize_time, read_first_time
+from rebase_gpx_times import format_gpx_time, parse_gpx_time, parse_start, rebase_file
+
 def update_gpx_timestamps(gpx_file_path):
     """更新 GPX 文件的时间戳"""
     
     print(f"🔧 正在更新 GPX 文件时间戳: {gpx_file_path}")
     print("=" * 60)
     
-    # 读取 GPX 文件
-    tree = ET.parse(gpx_file_path)
-    root = tree.getroot()
-    
-    # GPX 命名空间
-    namespace = {'gpx': 'http://www.topografix.com/GPX/1/1'}
+    # 只读第一个时间点（串流，不建整棵树）
+    first_time_str = read_first_time(gpx_file_path)
     
-    # 找到所有时间点
-    time_elements = root.findall('.//gpx:time', namespace)
-    
-    if not time_elements:
+    if not first_time_str:
         print("❌ 未找到时间标签")
         return False
     
-    print(f"📍 找到 {len(time_elements)} 个时间点")
-    
-    # 获取第一个时间点的原始时间
-    first_time_str = time_elements[0].text
-    first_time = datetime.fromisoformat(first_time_str.replace('Z', '+00:00'))
-    
+    first_time_str = normalize_time(first_time_str)
     print(f"📅 原始第一个时间点: {first_time_str}")
     
     # 计算时间差
-    now = datetime.now(first_time.tzinfo)
-    time_diff = (now - first_time).total_seconds()
+    now = parse_start("now")
+    time_diff = now - parse_gpx_time(first_time_str)[0]
     
-    print(f"📅 当前时间: {now.isoformat()}")
+    print(f"📅 当前时间: {format_gpx_time(now)}")
     print(f"⏱️  时间差: {time_diff:.0f} 秒 ({time_diff/3600:.1f} 小时)")
     
-    # 如果时间是过去的，更新为从现在开始
-    if time_diff > 0:
-        print("🔄 时间戳是过去的，更新为从现在开始...")
-        
-        # 更新所有时间点
-        for time_elem in time_elements:
-            old_time_str = time_elem.text
-            old_time = datetime.fromisoformat(old_time_str.replace('Z', '+00:00'))
-            
-            # 计算相对于第一个点的偏移
-            offset = (old_time - first_time).total_seconds()
-            
-            # 新时间 = 现在 + 偏移
-            new_time = now + timedelta(seconds=offset)
-            time_elem.text = new_time.strftime('%Y-%m-%dT%H:%M:%SZ')
-        
-        # 保存文件
-        tree.write(gpx_file_path, encoding='UTF-8', xml_declaration=True)
-        
-        print(f"✅ 已更新 {len(time_elements)} 个时间点")
-        print(f"📅 新的第一个时间点: {time_elements[0].text}")
-        print(f"📅 新的最后时间点: {time_elements[-1].text}")
+    # 如果时间是过去的，整体平移为从现在开始（逐行改写，其余内容原样保留，写完才替换原文件）
+    result = rebase_file(gpx_file_path, now, only_if_past=True)
+    if result["shifted"]:
+        print("🔄 时间戳是过去的，已更新为从现在开始")
+        print(f"✅ 已更新 {result['count']} 个时间点")
+        print(f"📅 新的第一个时间点: {result['first']}")
+        print(f"📅 新的最后时间点: {result['last']}")
         
         # 计算轨迹总时长
-        last_time = datetime.fromisoformat(time_elements[-1].text.replace('Z', '+00:00'))
-        duration = (last_time - now).total_seconds()
+        duration = parse_gpx_time(result["last"])[0] - now
         print(f"⏱️  轨迹总时长: {duration:.0f} 秒 ({duration/60:.1f} 分钟)")
         
     else:
@@ -4,78 +4,46 @@
 這樣 iOS 模擬器就會從現在開始播放軌跡
 """
 
-import xml.etree.ElementTree as ET
-from datetime import datetime, timedelta
 import sys
 import os
 from pathlib import Path
 
+from gpx_stream import normalize_time, read_first_time
+from rebase_gpx_times import format_gpx_time, parse_gpx_time, parse_start, rebase_file
+
 def update_gpx_timestamps(gpx_file_path):
     """更新 GPX 文件的時間戳"""
     
     print(f"🔧 正在更新 GPX 文件時間戳: {gpx_file_path}")
     print("=" * 60)
     
-    # 讀取 GPX 文件
-    tree = ET.parse(gpx_file_path)
-    root = tree.getroot()
-    
-    # test.gpx 可能沒有 xmlns，用兩種方式找 <time>
-    time_elements = root.findall('.//{http://www.topografix.com/GPX/1/1}time')
-    if not time_elements:
-        time_elements = root.findall('.//time')
+    # 只讀第一個時間點（串流，不建整棵樹；有無 xmlns 皆可）
+    first_time_str = read_first_time(gpx_file_path)
     
-    if not time_elements:
+    if not first_time_str:
         print("❌ 未找到時間標籤")
         return False
     
-    print(f"📍 找到 {len(time_elements)} 個時間點")
-    
-    # 獲取第一個時間點的原始時間
-    first_time_str = time_elements[0].text.strip() if time_elements[0].text else ""
-    first_time_str = first_time_str.replace(" ", "T")
-    if not first_time_str.endswith("Z") and "+" not in first_time_str:
-        first_time_str = first_time_str + "Z"
-    
-    first_time = datetime.fromisoformat(first_time_str.replace('Z', '+00:00'))
-    
+    first_time_str = normalize_time(first_time_str)
     print(f"📅 原始第一個時間點: {first_time_str}")
     
     # 計算時間差
-    now = datetime.now(first_time.tzinfo)
-    time_diff = (now - first_time).total_seconds()
+    now = parse_start("now")
+    time_diff = now - parse_gpx_time(first_time_str)[0]
     
-    print(f"📅 當前時間: {now.strftime('%Y-%m-%dT%H:%M:%SZ')}")
+    print(f"📅 當前時間: {format_gpx_time(now)}")
     print(f"⏱️  時間差: {time_diff:.0f} 秒 ({time_diff/3600:.1f} 小時)")
     
-    # 如果時間是過去的，更新為從現在開始
-    if time_diff > 0:
-        print("🔄 時間戳是過去的，更新為從現在開始...")
-        
-        # 更新所有時間點
-        for time_elem in time_elements:
-            old_time_str = (time_elem.text or "").strip().replace(" ", "T")
-            if not old_time_str.endswith("Z") and "+" not in old_time_str:
-                old_time_str = old_time_str + "Z"
-            old_time = datetime.fromisoformat(old_time_str.replace('Z', '+00:00'))
-            
-            # 計算相對於第一個點的偏移
-            offset = (old_time - first_time).total_seconds()
-            
-            # 新時間 = 現在 + 偏移
-            new_time = now + timedelta(seconds=offset)
-            time_elem.text = new_time.strftime('%Y-%m-%dT%H:%M:%SZ')
-        
-        # 保存文件
-        tree.write(gpx_file_path, encoding='UTF-8', xml_declaration=True)
-        
-        print(f"✅ 已更新 {len(time_elements)} 個時間點")
-        print(f"📅 新的第一個時間點: {time_elements[0].text}")
-        print(f"📅 新的最後時間點: {time_elements[-1].text}")
+    # 如果時間是過去的，整體平移為從現在開始（逐行改寫，其餘內容原樣保留，寫完才取代原檔）
+    result = rebase_file(gpx_file_path, now, only_if_past=True)
+    if result["shifted"]:
+        print("🔄 時間戳是過去的，已更新為從現在開始")
+        print(f"✅ 已更新 {result['count']} 個時間點")
+        print(f"📅 新的第一個時間點: {result['first']}")
+        print(f"📅 新的最後時間點: {result['last']}")
         
         # 計算軌跡總時長
-        last_time = datetime.fromisoformat(time_elements[-1].text.replace('Z', '+00:00'))
-        duration = (last_time - now).total_seconds()
+        duration = parse_gpx_time(result["last"])[0] - now
         print(f"⏱️  軌跡總時長: {duration:.0f} 秒 ({duration/60:.1f} 分鐘)")
         
     else:
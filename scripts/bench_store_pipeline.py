@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+門市圖資處理的效能基準（完全離線）。
+
+以固定亂數種子產生模擬全台門市的資料：點集中在各縣市中心附近（常態分布），
+另有少量鄉間散布點，並在部分門市旁「種下」已知距離的重複點
+（小於同格去重精度、小於 MERGE_RADIUS_M、略大於 MERGE_RADIUS_M；與原點同品牌），
+再依序量測各階段：
+
+  load            讀入 JSON 並轉成帶 lat/lon 的點（同 merge_store_sources.py）
+  distance_merge  距離合併（同 ecpay_store_list.py，只在同品牌內合併）
+  cell_dedupe     同格去重（同上，依品牌分組）
+  serialize_json  串流寫出 JSON（JsonArrayWriter）
+  serialize_bin   寫出二進位檔（store_binary）
+
+--columnar 改以欄式 StoreSet（store_set.py）執行同樣的階段：串流讀入、去重只改遮罩、輸出時才逐筆建立 dict；
+去重後筆數必須與 dict 版本相同。
+
+每階段記錄耗時與 tracemalloc 記憶體峰值（另跑一次，不影響計時），並與基準檔比較：
+耗時超過基準 (1 + --time-threshold) 倍且差距大於 MIN_REGRESSION_S、
+或記憶體峰值超過基準 (1 + --mem-threshold) 倍、或去重後筆數不同，皆視為退化，結束碼為 1。
+基準檔記錄 seed、dup_rate、是否有 numpy、是否 --columnar；任一項與本次不同時耗時不可互比，
+直接拒絕比較（結束碼 1）。要比較欄式與 dict 版本時，以 --baseline 各自指定一個基準檔。
+
+執行: python3 scripts/bench_store_pipeline.py                        # 10k / 100k / 1M，與基準比較
+      python3 scripts/bench_store_pipeline.py --sizes 10000 100000
+      python3 scripts/bench_store_pipeline.py --save-baseline          # 以本次結果覆寫基準
+      python3 scripts/bench_store_pipeline.py --columnar --sizes 1000000 --baseline /tmp/bench_columnar.json
+基準: scripts/bench_baseline.json（與機器有關，換機器時請重新 --save-baseline）
+依賴: 無（numpy 為選用，與 store_geo.py 相同）
+"""
+
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from store_binary import write_store_binary, write_store_binary_rows
+from store_geo import EARTH_RADIUS_M, GRID_DECIMALS, MERGE_RADIUS_M, cell_dedupe, distance_merge, np
+from store_io import JsonArrayWriter, iter_json_array
+from store_linkage import brand_of
+from store_set import StoreSet
+
+# 2：去重改為依品牌分組（同正式流程），筆數與耗時都與 1 版不可互比
+BASELINE_VERSION = 2
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+DEFAULT_SEED = 20260204
+# 有種下重複點的門市比例
+DEFAULT_DUP_RATE = 0.2
+# 種下的重複點與原點的距離（米）
+PLANTED_OFFSETS_M = (0.3, 2, 10, 25, MERGE_RADIUS_M - 0.5, MERGE_RADIUS_M + 0.5, 45)
+# 鄉間散布點比例（均勻分布在台灣本島範圍）
+RURAL_RATE = 0.08
+TAIWAN_BBOX = (21.9, 120.0, 25.3, 122.0)  # minLat, minLon, maxLat, maxLon
+DEFAULT_TIME_THRESHOLD = 0.5
+DEFAULT_MEM_THRESHOLD = 0.25
+# 低於此秒數的差距視為量測雜訊，不判定為退化
+MIN_REGRESSION_S = 0.05
+
+# (名稱, 緯度, 經度, 權重, 分布標準差 km)
+CITIES = (
+    ("台北", 25.0330, 121.5654, 16, 4.0),
+    ("新北", 25.0120, 121.4650, 18, 7.0),
+    ("桃園", 24.9936, 121.3010, 10, 6.0),
+    ("台中", 24.1477, 120.6736, 12, 6.0),
+    ("台南", 22.9999, 120.2270, 8, 6.0),
+    ("高雄", 22.6273, 120.3014, 12, 6.0),
+    ("新竹", 24.8138, 120.9675, 5, 4.0),
+    ("基隆", 25.1276, 121.7392, 2, 2.5),
+    ("嘉義", 23.4801, 120.4491, 3, 3.0),
+    ("彰化", 24.0809, 120.5384, 4, 5.0),
+    ("屏東", 22.6727, 120.4880, 3, 5.0),
+    ("宜蘭", 24.7021, 121.7378, 2, 4.0),
+    ("花蓮", 23.9872, 121.6016, 2, 3.0),
+    ("台東", 22.7583, 121.1444, 1, 3.0),
+)
+BRANDS = (
+    ("ecpay-UNIMART-", "7-ELEVEN {}門市", "🏪"),
+    ("ecpay-FAMI-", "全家 {}店", "🏪"),
+    ("ecpay-HILIFE-", "萊爾富 {}店", "🏪"),
+    ("ecpay-OKMART-", "OK超商 {}店", "🏪"),
+    ("711-node", "7-Eleven", "🥤"),
+)
+STAGES = ("load", "distance_merge", "cell_dedupe", "serialize_json", "serialize_bin")
+# 影響結果或耗時的設定；與基準不同時不比較
+BASELINE_CONFIG = ("seed", "dup_rate", "numpy", "columnar")
+
+
+def _offset(lat, lon, distance_m, bearing):
+    """(lat, lon) 往 bearing 方向移動 distance_m 米（小距離平面近似）"""
+    dlat = math.degrees(distance_m * math.cos(bearing) / EARTH_RADIUS_M)
+    dlon = math.degrees(distance_m * math.sin(bearing) / EARTH_RADIUS_M) / math.cos(math.radians(lat))
+    return lat + dlat, lon + dlon
+
+
+def iter_synthetic_stores(n, seed=DEFAULT_SEED, dup_rate=DEFAULT_DUP_RATE):
+    """逐筆產生 n 筆 RestaurantPoint（同樣的 n / seed / dup_rate 結果完全相同）"""
+    rng = random.Random(seed)
+    weights = [c[3] for c in CITIES]
+    min_lat, min_lon, max_lat, max_lon = TAIWAN_BBOX
+    i = 0
+    while i < n:
+        if rng.random() < RURAL_RATE:
+            lat, lon = rng.uniform(min_lat, max_lat), rng.uniform(min_lon, max_lon)
+        else:
+            _, c_lat, c_lon, _, spread_km = rng.choices(CITIES, weights)[0]
+            lat, lon = _offset(c_lat, c_lon, abs(rng.gauss(0, spread_km * 1000)), rng.uniform(0, 2 * math.pi))
+        prefix, title, emoji = BRANDS[rng.randrange(len(BRANDS))]
+        copies = [(lat, lon)]
+        if rng.random() < dup_rate:
+            copies.append(_offset(lat, lon, rng.choice(PLANTED_OFFSETS_M), rng.uniform(0, 2 * math.pi)))
+        for lat, lon in copies:
+            if i >= n:
+                break
+            yield {
+                "id": f"{prefix}{100000 + i}",
+                "coord": [round(lon, 6), round(lat, 6)],
+                "title": title.format(i) if "{}" in title else title,
+                "emoji": emoji,
+            }
+            i += 1
+
+
+def write_synthetic(path, n, seed=DEFAULT_SEED, dup_rate=DEFAULT_DUP_RATE):
+    with JsonArrayWriter(path) as out:
+        for p in iter_synthetic_stores(n, seed, dup_rate):
+            out.write(p)
+
+
+def _load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    points = []
+    for p in raw:
+        lon, lat = float(p["coord"][0]), float(p["coord"][1])
+        points.append({
+            "id": p["id"],
+            "coord": [round(lon, 6), round(lat, 6)],
+            "lat": lat,
+            "lon": lon,
+            "title": p["title"],
+            "emoji": p["emoji"],
+        })
+    return points
+
+
+def _export(points):
+    return [{"id": p["id"], "coord": p["coord"], "title": p["title"], "emoji": p["emoji"]} for p in points]
+
+
+def _point_brand(p):
+    return brand_of(p["id"])
+
+
+def _run_stages(path, work_dir, measure):
+    """依序執行各階段；measure(name, fn) 回傳 fn() 的結果並記錄量測值"""
+    points = measure("load", lambda: _load(path))
+    kept = measure("distance_merge", lambda: distance_merge(points, MERGE_RADIUS_M, _point_brand))
+    final = measure("cell_dedupe", lambda: cell_dedupe(kept, GRID_DECIMALS, _point_brand))
+    out_export = _export(final)
+
+    def serialize_json():
+        with JsonArrayWriter(os.path.join(work_dir, "out.json")) as out:
+            for p in out_export:
+                out.write(p)
+
+    measure("serialize_json", serialize_json)
+    measure("serialize_bin", lambda: write_store_binary(os.path.join(work_dir, "out.bin"), out_export))
+    return len(points), len(kept), len(final)
+
+
+def _load_columnar(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return StoreSet.from_points(iter_json_array(f))
+
+
+def _run_stages_columnar(path, work_dir, measure):
+    """同 _run_stages，以 StoreSet 執行"""
+    stores = measure("load", lambda: _load_columnar(path))
+    loaded = len(stores)
+    kept = loaded - measure("distance_merge", lambda: stores.distance_merge(MERGE_RADIUS_M, by_brand=True))
+    final = kept - measure("cell_dedupe", lambda: stores.cell_dedupe(GRID_DECIMALS, by_brand=True))
+
+    def serialize_json():
+        with JsonArrayWriter(os.path.join(work_dir, "out.json")) as out:
+            for p in stores.iter_export():
+                out.write(p)
+
+    measure("serialize_json", serialize_json)
+    measure("serialize_bin", lambda: write_store_binary_rows(os.path.join(work_dir, "out.bin"), stores.iter_rows()))
+    return loaded, kept, final
+
+
+def bench_size(n, seed=DEFAULT_SEED, dup_rate=DEFAULT_DUP_RATE, memory=True, columnar=False):
+    """回傳 {"loaded", "kept", "final", "stages": {name: {"seconds", "peak_kb"}}}"""
+    run_stages = _run_stages_columnar if columnar else _run_stages
+    stages = {name: {} for name in STAGES}
+    with tempfile.TemporaryDirectory(prefix="store-bench-") as work_dir:
+        path = os.path.join(work_dir, "synthetic.json")
+        write_synthetic(path, n, seed, dup_rate)
+
+        def timed(name, fn):
+            gc.collect()
+            t0 = time.perf_counter()
+            result = fn()
+            stages[name]["seconds"] = round(time.perf_counter() - t0, 4)
+            return result
+
+        def traced(name, fn):
+            gc.collect()
+            tracemalloc.start()
+            try:
+                return fn()
+            finally:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                stages[name]["peak_kb"] = round(peak / 1024)
+
+        loaded, kept, final = run_stages(path, work_dir, timed)
+        if memory:
+            run_stages(path, work_dir, traced)
+    return {"loaded": loaded, "kept": kept, "final": final, "stages": stages}
+
+
+def load_baseline(path):
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data if data.get("version") == BASELINE_VERSION else None
+
+
+def config_of(results):
+    """結果或基準 → BASELINE_CONFIG 各項（舊基準沒有 columnar 欄位，當時只有 dict 版本）"""
+    return {key: results.get(key, False if key == "columnar" else None) for key in BASELINE_CONFIG}
+
+
+def config_mismatch(results, baseline):
+    """與基準不同的設定名稱列表"""
+    cur, base = config_of(results), config_of(baseline)
+    return [key for key in BASELINE_CONFIG if cur[key] != base[key]]
+
+
+def compare(results, baseline, time_threshold=DEFAULT_TIME_THRESHOLD, mem_threshold=DEFAULT_MEM_THRESHOLD):
+    """回傳退化說明列表（空列表表示沒有退化）"""
+    problems = []
+    if baseline is None:
+        return problems
+    mismatch = config_mismatch(results, baseline)
+    if mismatch:
+        base = config_of(baseline)
+        detail = "、".join(f"{key} {base[key]} → {results.get(key)}" for key in mismatch)
+        return [f"基準的設定與本次不同（{detail}），無法比較；請以 --baseline 指定相同設定的基準檔"]
+    for size, cur in results["sizes"].items():
+        base = baseline["sizes"].get(size)
+        if base is None:
+            continue
+        for key in ("loaded", "kept", "final"):
+            if cur[key] != base[key]:
+                problems.append(f"{size} 筆：{key} {cur[key]} ≠ 基準 {base[key]}（去重結果改變）")
+        for name in STAGES:
+            c, b = cur["stages"][name], base["stages"].get(name, {})
+            if "seconds" in b and c["seconds"] > b["seconds"] * (1 + time_threshold) \
+                    and c["seconds"] - b["seconds"] > MIN_REGRESSION_S:
+                problems.append(f"{size} 筆 {name}：{c['seconds']:.3f}s，基準 {b['seconds']:.3f}s")
+            if "peak_kb" in c and "peak_kb" in b and c["peak_kb"] > b["peak_kb"] * (1 + mem_threshold):
+                problems.append(f"{size} 筆 {name}：記憶體峰值 {c['peak_kb']} KB，基準 {b['peak_kb']} KB")
+    return problems
+
+
+def _print_table(size, res, base):
+    print(f"{int(size):>9,} 筆 → 距離合併 {res['kept']:,} → 同格去重 {res['final']:,}")
+    for name in STAGES:
+        s = res["stages"][name]
+        line = f"    {name:<15} {s['seconds']:>8.3f}s"
+        if "peak_kb" in s:
+            line += f"  峰值 {s['peak_kb'] / 1024:>8.1f} MB"
+        b = (base or {}).get("stages", {}).get(name)
+        if b and b.get("seconds"):
+            line += f"  （基準 {b['seconds']:.3f}s，{s['seconds'] / b['seconds']:.2f}×）"
+        print(line)
+
+
+def main(argv=None):
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="門市圖資處理效能基準（離線、合成資料）")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="資料筆數")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--dup-rate", type=float, default=DEFAULT_DUP_RATE, help="種下重複點的門市比例")
+    parser.add_argument("--baseline", default=os.path.join(script_dir, "bench_baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="以本次結果覆寫基準檔")
+    parser.add_argument("--no-memory", action="store_true", help="不量測記憶體峰值（省去第二輪）")
+    parser.add_argument("--columnar", action="store_true", help="以欄式 StoreSet 執行各階段")
+    parser.add_argument("--time-threshold", type=float, default=DEFAULT_TIME_THRESHOLD)
+    parser.add_argument("--mem-threshold", type=float, default=DEFAULT_MEM_THRESHOLD)
+    parser.add_argument("--output", help="另將本次結果寫成 JSON")
+    args = parser.parse_args(argv)
+
+    baseline = load_baseline(args.baseline)
+    results = {
+        "version": BASELINE_VERSION,
+        "seed": args.seed,
+        "dup_rate": args.dup_rate,
+        "python": platform.python_version(),
+        "numpy": np is not None,
+        "columnar": args.columnar,
+        "sizes": {},
+    }
+    print(
+        f"Python {results['python']}，numpy {'有' if np is not None else '無'}，seed {args.seed}"
+        f"{'，欄式 StoreSet' if args.columnar else ''}"
+    )
+    # 設定不同的基準不列出倍率
+    comparable = baseline if baseline is not None and not config_mismatch(results, baseline) else None
+    for n in args.sizes:
+        res = bench_size(n, args.seed, args.dup_rate, memory=not args.no_memory, columnar=args.columnar)
+        results["sizes"][str(n)] = res
+        _print_table(str(n), res, (comparable or {}).get("sizes", {}).get(str(n)))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        if baseline is not None and not config_mismatch(results, baseline):
+            # 保留本次沒跑的筆數（設定不同時整份覆寫）
+            results["sizes"] = {**baseline["sizes"], **results["sizes"]}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"已寫入基準 {args.baseline}")
+        return
+
+    if baseline is None:
+        print(f"沒有基準檔 {args.baseline}，可加 --save-baseline 建立")
+        return
+    problems = compare(results, baseline, args.time_threshold, args.mem_threshold)
+    if comparable is None:
+        print(problems[0])
+        sys.exit(1)
+    if problems:
+        print("效能退化：")
+        for line in problems:
+            print(f"  - {line}")
+        sys.exit(1)
+    print("與基準相比沒有退化")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+綠界門市的增量更新：以 (CvsType, StoreId) 比對上次結果，只重新處理有變動的門市。
+
+- 狀態檔（STATE）：上次所有門市的地址、經緯度、是否在距離合併中保留
+- 只對「新增」與「地址變更」的門市做 Geocoding
+- 距離合併只在變動點（新位置與舊位置）相連的區塊內重算，其餘沿用上次結果
+- 日誌檔（JOURNAL）：記下本次抓到的門市清單與每筆 Geocoding 結果；
+  中斷後再執行會從日誌接續，不重抓、不重查，完成輸出後才刪除
+
+由 ecpay_store_list.py --incremental 呼叫。
+"""
+
+import json
+import os
+
+from store_geo import MERGE_RADIUS_M, connected_neighbourhood, distance_merge
+from store_io import write_json_atomic
+
+# 2：距離合併改為同品牌內比較，舊狀態的保留旗標不再適用
+STATE_VERSION = 2
+
+
+def store_key(s: dict, index: int) -> str:
+    """門市唯一鍵：CvsType:StoreId（無 StoreId 時以序號代替，與輸出 id 一致）"""
+    return f"{s.get('CvsType', 'UNIMART')}:{s.get('StoreId', index)}"
+
+
+def load_state(path) -> dict:
+    """讀取上次狀態：{key: {"addr", "lat", "lon", "kept"}}（依上次順序）；無檔案或版本不符回傳 {}"""
+    if not os.path.isfile(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") != STATE_VERSION:
+        return {}
+    return {e["key"]: e for e in data.get("stores", [])}
+
+
+def save_state(path, entries):
+    write_json_atomic(path, {"version": STATE_VERSION, "stores": entries})
+
+
+class RefreshJournal:
+    """
+    JSON Lines 日誌：第一行為 {"type": "fetch", "stores": [...]}，
+    之後每筆 {"type": "geocode", "key", "addr", "lat", "lon"}。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.stores = None
+        self.geocoded = {}
+        if os.path.isfile(path):
+            self._load()
+        self._fh = None
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    break  # 中斷時寫到一半的最後一行
+                if rec.get("type") == "fetch":
+                    self.stores = rec["stores"]
+                elif rec.get("type") == "geocode":
+                    self.geocoded[rec["key"]] = (rec["addr"], rec["lat"], rec["lon"])
+
+    def _append(self, rec):
+        if self._fh is None:
+            self._fh = open(self.path, "a", encoding="utf-8")
+        self._fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self._fh.flush()
+
+    def record_fetch(self, stores):
+        # 新的抓取會讓舊日誌失效
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+        self.stores = stores
+        self.geocoded = {}
+        self._append({"type": "fetch", "stores": stores})
+
+    def record_geocode(self, key, addr, lat, lon):
+        self.geocoded[key] = (addr, lat, lon)
+        self._append({"type": "geocode", "key": key, "addr": addr, "lat": lat, "lon": lon})
+
+    def finish(self):
+        """輸出完成後刪除日誌"""
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+
+def plan_geocoding(all_stores, prev, journal=None):
+    """
+    比對本次門市與上次狀態。
+    回傳 (coords, todo, changes)：
+      coords  - {key: (lat, lon)} 可直接沿用的座標（上次狀態或日誌）
+      todo    - [(index, key, addr)] 需要 Geocoding 的門市
+      changes - 各類變動筆數
+    """
+    changes = {"added": 0, "address_changed": 0, "renamed": 0, "unchanged": 0, "removed": 0, "resumed": 0}
+    coords = {}
+    todo = []
+    seen = set()
+    for i, s in enumerate(all_stores):
+        key = store_key(s, i)
+        seen.add(key)
+        addr = s.get("StoreAddr", "").strip()
+        old = prev.get(key)
+        if old is None:
+            changes["added"] += 1
+        elif old["addr"] != addr:
+            changes["address_changed"] += 1
+        elif old.get("name") != s.get("StoreName", ""):
+            changes["renamed"] += 1
+        else:
+            changes["unchanged"] += 1
+        if not addr:
+            continue
+        # 上次查無結果（lat 為 None）的門市不沿用，重新排入 Geocoding；
+        # 是否真的打網路由 GeocodeCache 的查無結果過期時間決定
+        resumed = journal.geocoded.get(key) if journal is not None else None
+        if resumed is not None and resumed[0] == addr and resumed[1] is not None:
+            coords[key] = (resumed[1], resumed[2])
+            changes["resumed"] += 1
+        elif old is not None and old["addr"] == addr and old["lat"] is not None:
+            coords[key] = (old["lat"], old["lon"])
+        else:
+            todo.append((i, key, addr))
+    changes["removed"] = sum(1 for key in prev if key not in seen)
+    return coords, todo, changes
+
+
+def incremental_merge(raw, keys, prev, radius_m=MERGE_RADIUS_M, group_of=None):
+    """
+    距離合併的增量版：raw 為本次所有有座標的點（依輸入順序），keys 為對應的門市鍵。
+    只重算與變動點相連的區塊；未受影響的點沿用上次的保留結果。group_of 同 store_geo.distance_merge。
+    回傳 (與 raw 同長度的 kept 旗標列表, 重算的點數)。
+    """
+    seeds = []
+    unchanged_order = []
+    current = set(keys)
+    for p, key in zip(raw, keys):
+        old = prev.get(key)
+        if old is None or old["lat"] is None or (old["lat"], old["lon"]) != (p["lat"], p["lon"]):
+            seeds.append((p["lat"], p["lon"]))
+            if old is not None and old["lat"] is not None:
+                seeds.append((old["lat"], old["lon"]))
+        else:
+            unchanged_order.append(key)
+    for key, old in prev.items():
+        if key not in current and old["lat"] is not None:
+            seeds.append((old["lat"], old["lon"]))
+
+    # 未變動門市的相對順序若與上次不同，「先出現者勝出」的結果可能改變，改為全量重算
+    unchanged = set(unchanged_order)
+    if [key for key in prev if key in unchanged] != unchanged_order:
+        kept = set(id(p) for p in distance_merge(raw, radius_m, group_of))
+        return [id(p) in kept for p in raw], len(raw)
+
+    affected = connected_neighbourhood(raw, seeds, radius_m)
+    region = [raw[i] for i in sorted(affected)]
+    region_kept = set(id(p) for p in distance_merge(region, radius_m, group_of))
+    flags = []
+    for i, (p, key) in enumerate(zip(raw, keys)):
+        if i in affected:
+            flags.append(id(p) in region_kept)
+        else:
+            flags.append(bool(prev[key].get("kept")))
+    return flags, len(affected)
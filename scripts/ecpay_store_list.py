@@ -2,28 +2,57 @@
 """
 綠界 ECPay 門市清單 API → 經緯度（Mapbox Geocoding）→ App 餐廳格式
 輸出: assets/data/ecpay_convenience_stores.json（RestaurantPoint[]）
+      --bin 時另輸出 assets/data/ecpay_convenience_stores.bin（同內容的精簡二進位格式，見 store_binary.py）
 
 需設定環境變數（或改下方預設）：
   ECPAY_MERCHANT_ID   - 綠界廠商編號（測試：2000132）
   ECPAY_HASH_KEY      - 綠界 HashKey（向綠界索取）
   ECPAY_HASH_IV       - 綠界 HashIV（向綠界索取）
   MAPBOX_ACCESS_TOKEN - Mapbox token（用於地址→經緯度）
+選用：
+  GEOCODE_QPS         - Geocoding 每秒請求上限（預設 10）
+  GEOCODE_WORKERS     - Geocoding 併發執行緒數（預設 8）
+  MAPBOX_GEOCODE_URL  - Geocoding 端點（測試時可指向本機替身伺服器）
+  MAPBOX_BATCH_GEOCODE_URL - --batch 用的批次 Geocoding 端點（預設 Mapbox v6 batch；測試時可指向本機替身伺服器）
+  GEOCODE_BATCH_SIZE  - --batch 每個請求的地址數（預設 100，Mapbox 上限 1000）
+  ECPAY_STORE_LIST_URL - 綠界 GetStoreList 端點（預設測試環境；測試時可指向本機替身伺服器）
+  GEOCODE_CACHE_PATH  - Geocoding 快取 SQLite 路徑（預設 scripts/geocode_cache.sqlite3，設為空字串停用）
+  GEOCODE_NEGATIVE_TTL_DAYS - 查無結果的快取天數（預設 7）
 
 執行: python3 scripts/ecpay_store_list.py
-依賴: 無（Python 內建 urllib, hashlib）
+      python3 scripts/ecpay_store_list.py --incremental   # 只處理與上次相比有變動的門市
+      python3 scripts/ecpay_store_list.py --batch         # 地址去重後以批次端點查詢，一個請求多筆
+      python3 scripts/ecpay_store_list.py --bin           # 另寫出 .bin
+      （--metrics PATH / --profile STAGE：各階段耗時、請求／快取／丟棄計數寫入 metrics JSON，見 pipeline_metrics.py）
+依賴: 無（Python 內建 urllib, hashlib, http.client）
+HTTP 皆走 http_pool.HttpPool（keep-alive、重試、回應大小／延遲統計）。
 """
 
+import argparse
 import hashlib
-import json
-import math
 import os
-import time
-import urllib.error
 import urllib.parse
-import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from ecpay_incremental import (
+    RefreshJournal,
+    incremental_merge,
+    load_state,
+    plan_geocoding,
+    save_state,
+    store_key,
+)
+from geocode_cache import DEFAULT_NEGATIVE_TTL_S, GeocodeCache
+from geocoder import DEFAULT_BATCH_SIZE, DEFAULT_QPS, DEFAULT_WORKERS, Geocoder
+from http_pool import HttpPool
+from pipeline_metrics import RunMetrics, add_metrics_args
+from store_binary import binary_path_for, remove_binary, write_store_binary
+from store_geo import GRID_DECIMALS, MERGE_RADIUS_M, cell_dedupe, distance_merge
+from store_io import write_json_atomic
+from store_linkage import brand_of
 
 # 綠界 API（測試環境）
-ECPAY_GET_STORE_LIST_URL = "https://logistics-stage.ecpay.com.tw/Helper/GetStoreList"
+ECPAY_GET_STORE_LIST_URL = os.environ.get("ECPAY_STORE_LIST_URL", "https://logistics-stage.ecpay.com.tw/Helper/GetStoreList")
 # 預設測試廠商編號（正式請改為你的 MerchantID）
 ECPAY_MERCHANT_ID = os.environ.get("ECPAY_MERCHANT_ID", "2000132")
 ECPAY_HASH_KEY = os.environ.get("ECPAY_HASH_KEY", "5294y06JbISpM5x9")
@@ -33,10 +62,21 @@ CVS_TYPES = ["UNIMART", "FAMI", "HILIFE", "OKMART"]
 CVS_EMOJI = {"UNIMART": "🥤", "FAMI": "🏪", "HILIFE": "🏪", "OKMART": "🏪"}
 
 MAPBOX_ACCESS_TOKEN = os.environ.get("MAPBOX_ACCESS_TOKEN", "pk.eyJ1Ijoic3R1NTczNyIsImEiOiJjbDNnZTdqdGswcWFtM2NreWVsanAwM2EyIn0.uSN5Ylk5k1Zl3MwkH8HKTw")
-MAPBOX_GEOCODE_URL = "https://api.mapbox.com/geocoding/v5/mapbox.places/{query}.json"
+MAPBOX_GEOCODE_URL = os.environ.get("MAPBOX_GEOCODE_URL", "https://api.mapbox.com/geocoding/v5/mapbox.places/{query}.json")
+MAPBOX_BATCH_GEOCODE_URL = os.environ.get("MAPBOX_BATCH_GEOCODE_URL", "https://api.mapbox.com/search/geocode/v6/batch")
+GEOCODE_BATCH_SIZE = int(os.environ.get("GEOCODE_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+GEOCODE_QPS = float(os.environ.get("GEOCODE_QPS", DEFAULT_QPS))
+GEOCODE_WORKERS = int(os.environ.get("GEOCODE_WORKERS", DEFAULT_WORKERS))
+GEOCODE_CACHE_PATH = os.environ.get(
+    "GEOCODE_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "geocode_cache.sqlite3"),
+)
+GEOCODE_NEGATIVE_TTL_S = float(os.environ.get("GEOCODE_NEGATIVE_TTL_DAYS", DEFAULT_NEGATIVE_TTL_S / 86400)) * 86400
 
-MERGE_RADIUS_M = 30
-GRID_DECIMALS = 5
+# 增量更新用：上次所有門市的地址/座標/保留狀態，以及中斷續跑用的日誌
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_PATH = os.path.join(SCRIPT_DIR, "ecpay_store_state.json")
+JOURNAL_PATH = os.path.join(SCRIPT_DIR, "ecpay_refresh.journal.jsonl")
 
 
 def check_mac_value(params: dict, hash_key: str, hash_iv: str) -> str:
@@ -52,7 +92,7 @@ def check_mac_value(params: dict, hash_key: str, hash_iv: str) -> str:
     return md5_hex.upper()
 
 
-def fetch_ecpay_store_list(cvs_type: str) -> list:
+def fetch_ecpay_store_list(cvs_type: str, pool: HttpPool = None) -> list:
     """呼叫綠界 GetStoreList，回傳該超商類別的 StoreInfo 列表"""
     if not ECPAY_HASH_KEY or not ECPAY_HASH_IV:
         print("請設定 ECPAY_HASH_KEY 與 ECPAY_HASH_IV 環境變數（向綠界索取）")
@@ -60,14 +100,18 @@ def fetch_ecpay_store_list(cvs_type: str) -> list:
     params = {"MerchantID": ECPAY_MERCHANT_ID, "CvsType": cvs_type}
     params["CheckMacValue"] = check_mac_value(params, ECPAY_HASH_KEY, ECPAY_HASH_IV)
     body = urllib.parse.urlencode(params)
-    req = urllib.request.Request(
+    pool = pool or HttpPool()
+    resp = pool.request(
+        "POST",
         ECPAY_GET_STORE_LIST_URL,
-        data=body.encode("utf-8"),
-        method="POST",
+        body=body.encode("utf-8"),
         headers={"Content-Type": "application/x-www-form-urlencoded"},
+        timeout=60,
     )
-    with urllib.request.urlopen(req, timeout=60) as resp:
-        data = json.loads(resp.read().decode("utf-8"))
+    if resp.status != 200:
+        print(f"綠界 API HTTP {resp.status}: {cvs_type}")
+        return []
+    data = resp.json()
     if data.get("RtnCode") != 1:
         print(f"綠界 API 錯誤 {cvs_type}: {data.get('RtnMsg', '')}")
         return []
@@ -86,110 +130,218 @@ def fetch_ecpay_store_list(cvs_type: str) -> list:
     return out
 
 
+def make_geocoder(pool: HttpPool = None, batch: bool = False) -> Geocoder:
+    """依環境變數建立併發、限速、帶持久快取的 Mapbox Geocoder；batch 時走批次端點"""
+    cache = GeocodeCache(GEOCODE_CACHE_PATH, GEOCODE_NEGATIVE_TTL_S) if GEOCODE_CACHE_PATH else None
+    return Geocoder(
+        MAPBOX_ACCESS_TOKEN, MAPBOX_GEOCODE_URL, qps=GEOCODE_QPS, workers=GEOCODE_WORKERS, cache=cache, pool=pool,
+        batch_url=MAPBOX_BATCH_GEOCODE_URL if batch else None, batch_size=GEOCODE_BATCH_SIZE,
+    )
+
+
+_geocoder = None
+
+
 def geocode_address(address: str) -> tuple:
     """Mapbox Geocoding：台灣地址 → (lat, lon)，失敗回傳 (None, None)"""
-    if not MAPBOX_ACCESS_TOKEN:
-        return None, None
-    q = urllib.parse.quote(address)
-    url = f"{MAPBOX_GEOCODE_URL.format(query=q)}?access_token={MAPBOX_ACCESS_TOKEN}&country=TW&limit=1"
-    try:
-        req = urllib.request.Request(url, method="GET")
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            data = json.loads(resp.read().decode("utf-8"))
-        features = data.get("features", [])
-        if not features:
-            return None, None
-        lon, lat = features[0].get("center", [None, None])
-        return lat, lon
-    except Exception:
-        return None, None
-
-
-def haversine_m(lat1, lon1, lat2, lon2):
-    R = 6371000
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlam = math.radians(lon2 - lon1)
-    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlam / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
-
-
-def main():
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    root = os.path.dirname(script_dir)
-    out_dir = os.path.join(root, "assets", "data")
-    out_path = os.path.join(out_dir, "ecpay_convenience_stores.json")
-    os.makedirs(out_dir, exist_ok=True)
+    global _geocoder
+    if _geocoder is None:
+        _geocoder = make_geocoder()
+    return _geocoder.geocode(address)
 
-    if not MAPBOX_ACCESS_TOKEN:
-        print("請設定 MAPBOX_ACCESS_TOKEN 環境變數（或改腳本內預設）")
-        print("例: export MAPBOX_ACCESS_TOKEN=pk.eyJ1...")
 
+def store_to_point(s: dict, index: int, lat: float, lon: float) -> dict:
+    """綠界門市 + 經緯度 → RestaurantPoint（另帶 lat/lon 供去重用）"""
+    cvs = s.get("CvsType", "UNIMART")
+    title = s.get("StoreName", "") or f"{cvs}"
+    return {
+        "id": f"ecpay-{cvs}-{s.get('StoreId', index)}",
+        "coord": [round(lon, 6), round(lat, 6)],
+        "lat": lat,
+        "lon": lon,
+        "title": title,
+        "emoji": CVS_EMOJI.get(cvs, "🏪"),
+    }
+
+
+def fetch_all_stores(pool: HttpPool = None) -> list:
+    """併發取得所有超商類別的門市清單（總耗時約等於最慢的一家），輸出依 CVS_TYPES 順序"""
+    pool = pool or HttpPool()
+    print(f"取得 {', '.join(CVS_TYPES)} 門市清單...")
+    with ThreadPoolExecutor(max_workers=len(CVS_TYPES)) as executor:
+        results = list(executor.map(lambda cvs: fetch_ecpay_store_list(cvs, pool), CVS_TYPES))
     all_stores = []
-    for cvs in CVS_TYPES:
-        print(f"取得 {cvs} 門市清單...")
-        stores = fetch_ecpay_store_list(cvs)
-        print(f"  {len(stores)} 筆")
+    for cvs, stores in zip(CVS_TYPES, results):
+        print(f"  {cvs}: {len(stores)} 筆")
         for s in stores:
             s["CvsType"] = cvs
             all_stores.append(s)
+    return all_stores
+
+
+def geocode_stores(all_stores, pool, metrics, prev=None, journal=None, report_changes=False, batch=False) -> dict:
+    """
+    地址 → 經緯度（Mapbox，併發 + 限速，相同地址只查一次）；有 prev（上次狀態）時只查新增/地址變更的門市。
+    batch 時以批次端點一個請求查多筆。回傳 {store_key: (lat, lon)}。
+    """
+    coords, todo, changes = plan_geocoding(all_stores, prev or {}, journal)
+    for key, n in changes.items():
+        metrics.count(f"changes.{key}", n)
+    if report_changes:
+        print(
+            f"  與上次相比：新增 {changes['added']}、地址變更 {changes['address_changed']}、"
+            f"改名 {changes['renamed']}、移除 {changes['removed']}、未變 {changes['unchanged']}；"
+            f"需 Geocoding {len(todo)} 筆"
+        )
+
+    def on_result(j, result):
+        _, key, addr = todo[j]
+        if journal is not None:
+            journal.record_geocode(key, addr, *result)
+
+    geocoder = make_geocoder(pool, batch)
+    with metrics.stage("geocode"):
+        results = geocoder.geocode_many([addr for _, _, addr in todo], on_result=on_result)
+    metrics.count("geocode.requested", len(todo))
+    metrics.record_geocoder(geocoder)
+    metrics.record_http(pool)
+    for (_, key, _), result in zip(todo, results):
+        coords[key] = result
+    gs = geocoder.stats
+    batches = f"、批次請求 {gs['batches']} 個" if batch else ""
+    print(f"  Geocoding 失敗 {gs['failed']} 筆、相同地址合併 {gs['deduped']} 筆{batches}；{pool.summary()}")
+    if geocoder.cache is not None:
+        cs = geocoder.cache.stats
+        print(f"  快取命中 {cs['hits']}（查無結果 {cs['negative_hits']}），未命中 {cs['misses']}")
+        geocoder.cache.close()
+    return coords
 
-    if not all_stores:
-        print("未取得任何門市，請檢查 ECPAY_HASH_KEY / ECPAY_HASH_IV 是否正確")
-        return
 
-    # 地址 → 經緯度（Mapbox），並轉成 RestaurantPoint 格式
+def stores_to_points(all_stores, coords):
+    """轉成 RestaurantPoint 格式（保持門市清單順序，略過沒有座標的），回傳 (points, store_keys)"""
     raw = []
+    keys = []
     for i, s in enumerate(all_stores):
-        addr = s.get("StoreAddr", "").strip()
-        if not addr:
-            continue
-        lat, lon = geocode_address(addr)
+        key = store_key(s, i)
+        lat, lon = coords.get(key, (None, None))
         if lat is None or lon is None:
             continue
-        cvs = s.get("CvsType", "UNIMART")
-        title = s.get("StoreName", "") or f"{cvs}"
-        raw.append({
-            "id": f"ecpay-{cvs}-{s.get('StoreId', i)}",
-            "coord": [round(lon, 6), round(lat, 6)],
+        raw.append(store_to_point(s, i, lat, lon))
+        keys.append(key)
+    return raw, keys
+
+
+def point_brand(p):
+    """RestaurantPoint → 品牌（store_linkage.brand_of；7-ELEVEN、全家、萊爾富、OK 各自不同）"""
+    return brand_of(p["id"])
+
+
+def dedupe_points(raw, keys, prev, metrics):
+    """
+    距離合併（有上次狀態 prev 時只重算受影響區塊）+ 同格去重（與 overpass 腳本一致）。
+    兩者都只在同品牌內比較：7-ELEVEN 隔壁的全家不會被當成重複點丟掉。
+    回傳 (輸出列表 id / coord / title / emoji, 每筆 raw 是否在距離合併後保留)。
+    """
+    with metrics.stage("distance_merge"):
+        if prev:
+            flags, n_affected = incremental_merge(raw, keys, prev, MERGE_RADIUS_M, point_brand)
+            print(f"  距離合併重算 {n_affected}/{len(raw)} 筆")
+            metrics.count("merge.recomputed", n_affected)
+        else:
+            kept_ids = set(id(p) for p in distance_merge(raw, MERGE_RADIUS_M, point_brand))
+            flags = [id(p) in kept_ids for p in raw]
+        kept = [p for p, k in zip(raw, flags) if k]
+    metrics.count("dropped.distance_merge", len(raw) - len(kept))
+
+    with metrics.stage("cell_dedupe"):
+        final = cell_dedupe(kept, GRID_DECIMALS, point_brand)
+    metrics.count("dropped.cell_dedupe", len(kept) - len(final))
+    metrics.count("output.stores", len(final))
+    return [{"id": p["id"], "coord": p["coord"], "title": p["title"], "emoji": p["emoji"]} for p in final], flags
+
+
+def build_state(all_stores, coords, keys, flags):
+    """下次 --incremental 比對用的狀態：每家門市的地址、座標與是否保留"""
+    kept_by_key = dict(zip(keys, flags))
+    state = []
+    for i, s in enumerate(all_stores):
+        key = store_key(s, i)
+        lat, lon = coords.get(key, (None, None))
+        state.append({
+            "key": key,
+            "name": s.get("StoreName", ""),
+            "addr": s.get("StoreAddr", "").strip(),
             "lat": lat,
             "lon": lon,
-            "title": title,
-            "emoji": CVS_EMOJI.get(cvs, "🏪"),
+            "kept": kept_by_key.get(key, False),
         })
-        if (i + 1) % 100 == 0:
-            print(f"  已 Geocoding {i + 1}/{len(all_stores)}...")
-        time.sleep(0.06)
-
-    # 距離合併 + 同格去重（與 overpass 腳本一致）
-    kept = []
-    for p in raw:
-        lat, lon = p["lat"], p["lon"]
-        is_dup = False
-        for k in kept:
-            if haversine_m(lat, lon, k["lat"], k["lon"]) < MERGE_RADIUS_M:
-                is_dup = True
-                break
-        if is_dup:
-            continue
-        kept.append({"lat": lat, "lon": lon, "id": p["id"], "coord": p["coord"], "title": p["title"], "emoji": p["emoji"]})
+    return state
 
-    seen_cell = set()
-    final = []
-    for p in kept:
-        cell = (round(p["lat"], GRID_DECIMALS), round(p["lon"], GRID_DECIMALS))
-        if cell in seen_cell:
-            continue
-        seen_cell.add(cell)
-        final.append(p)
 
-    out_export = [{"id": p["id"], "coord": p["coord"], "title": p["title"], "emoji": p["emoji"]} for p in final]
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="綠界門市清單 → Mapbox Geocoding → App 餐廳格式")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="與上次狀態比對，只 Geocoding 新增/地址變更的門市，只在受影響區塊重算去重；中斷可續跑",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help=f"以批次端點查詢（每個請求 {GEOCODE_BATCH_SIZE} 筆地址，見 MAPBOX_BATCH_GEOCODE_URL）",
+    )
+    parser.add_argument("--bin", action="store_true", help="另寫出同內容的 .bin（見 store_binary.py）")
+    add_metrics_args(parser)
+    args = parser.parse_args(argv)
+    metrics = RunMetrics.from_args("ecpay_store_list", args)
+
+    root = os.path.dirname(SCRIPT_DIR)
+    out_dir = os.path.join(root, "assets", "data")
+    out_path = os.path.join(out_dir, "ecpay_convenience_stores.json")
+    os.makedirs(out_dir, exist_ok=True)
+
+    if not MAPBOX_ACCESS_TOKEN:
+        print("請設定 MAPBOX_ACCESS_TOKEN 環境變數（或改腳本內預設）")
+        print("例: export MAPBOX_ACCESS_TOKEN=pk.eyJ1...")
+
+    pool = HttpPool(max_per_host=max(GEOCODE_WORKERS, len(CVS_TYPES)))
+    prev = load_state(STATE_PATH) if args.incremental else {}
+    journal = RefreshJournal(JOURNAL_PATH) if args.incremental else None
+    if journal is not None and journal.stores:
+        all_stores = journal.stores
+        print(f"從上次中斷處繼續：{len(all_stores)} 筆門市，已 Geocoding {len(journal.geocoded)} 筆")
+    else:
+        with metrics.stage("fetch"):
+            all_stores = fetch_all_stores(pool)
+        if journal is not None and all_stores:
+            journal.record_fetch(all_stores)
+    metrics.count("input.stores", len(all_stores))
+
+    if not all_stores:
+        print("未取得任何門市，請檢查 ECPAY_HASH_KEY / ECPAY_HASH_IV 是否正確")
+        metrics.record_http(pool)
+        metrics.finish()
+        return
+
+    coords = geocode_stores(all_stores, pool, metrics, prev, journal, report_changes=args.incremental, batch=args.batch)
+    raw, keys = stores_to_points(all_stores, coords)
+
+    metrics.count("dropped.no_coord", len(all_stores) - len(raw))
+    out_export, flags = dedupe_points(raw, keys, prev, metrics)
+
+    with metrics.stage("write"):
+        write_json_atomic(out_path, out_export, indent=2)
+        if args.bin:
+            write_store_binary(binary_path_for(out_path), out_export)
+        else:
+            remove_binary(out_path)
 
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(out_export, f, ensure_ascii=False, indent=2)
+    save_state(STATE_PATH, build_state(all_stores, coords, keys, flags))
+    if journal is not None:
+        journal.finish()
 
-    print(f"綠界 {len(all_stores)} 筆 → Geocoding 成功 {len(raw)} 筆 → 去重後 {len(final)} 筆，儲存至 {out_path}")
+    print(f"綠界 {len(all_stores)} 筆 → Geocoding 成功 {len(raw)} 筆 → 去重後 {len(out_export)} 筆，儲存至 {out_path}")
+    metrics.finish()
 
 
 if __name__ == "__main__":
@@ -3,16 +3,18 @@
 抓取全台灣 7-Eleven 座標（Overpass API）
 輸出: taiwan_711_full.json（原始 Overpass 格式）
 執行: python3 scripts/fetch_711_taiwan.py
-依賴: 無（使用 Python 內建 urllib）
+      python3 scripts/fetch_711_taiwan.py --center   # 只要門市本身 + center，不下載 way / relation 的成員節點
+依賴: 無（使用 Python 內建 urllib / http.client，經 http_pool.HttpPool 連線）
 """
 
-import json
+import argparse
 import os
-import urllib.request
-import urllib.error
 import urllib.parse
 
-OVERPASS_URL = "http://overpass-api.de/api/interpreter"
+from http_pool import HttpError, HttpPool
+from store_io import write_json_atomic
+
+OVERPASS_URL = os.environ.get("OVERPASS_URL", "http://overpass-api.de/api/interpreter")
 QUERY = """
 [out:json][timeout:90];
 area["name:en"="Taiwan"]->.searchArea;
@@ -25,28 +27,48 @@ out body;
 >;
 out skel qt;
 """
+# way / relation 由 Overpass 直接附上 center（外框中心），不輸出成員節點，傳輸與解析量小很多
+QUERY_CENTER = """
+[out:json][timeout:90];
+area["name:en"="Taiwan"]->.searchArea;
+(
+  node["brand:en"="7-Eleven"](area.searchArea);
+  way["brand:en"="7-Eleven"](area.searchArea);
+  relation["brand:en"="7-Eleven"](area.searchArea);
+);
+out center;
+"""
+
 
+def fetch_overpass_json(pool: HttpPool = None, center: bool = False) -> dict:
+    """送出全台 7-Eleven 查詢，回傳 Overpass JSON（dict）；失敗拋出 HttpError"""
+    pool = pool or HttpPool()
+    resp = pool.request(
+        "POST",
+        OVERPASS_URL,
+        body=urllib.parse.urlencode({"data": QUERY_CENTER if center else QUERY}).encode("utf-8"),
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+        timeout=120,
+    )
+    if resp.status != 200:
+        raise HttpError(f"Overpass HTTP {resp.status}: {resp.body[:200]!r}")
+    return resp.json()
 
-def fetch_711_taiwan():
+
+def fetch_711_taiwan(pool: HttpPool = None, center: bool = False):
     script_dir = os.path.dirname(os.path.abspath(__file__))
     out_path = os.path.join(script_dir, "taiwan_711_full.json")
 
     print("正在請求全台灣 7-Eleven 數據，請稍候...")
+    pool = pool or HttpPool()
     try:
-        req = urllib.request.Request(
-            OVERPASS_URL,
-            data=urllib.parse.urlencode({"data": QUERY}).encode("utf-8"),
-            method="POST",
-            headers={"Content-Type": "application/x-www-form-urlencoded"},
-        )
-        with urllib.request.urlopen(req, timeout=120) as response:
-            data = json.loads(response.read().decode("utf-8"))
-        with open(out_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        data = fetch_overpass_json(pool, center)
+        write_json_atomic(out_path, data, indent=2)
         count = len(data.get("elements", []))
         print(f"成功！已抓取 {count} 筆資料，儲存至 {out_path}")
+        print(pool.summary())
         return out_path
-    except urllib.error.URLError as e:
+    except HttpError as e:
         print(f"網路錯誤（請確認網路連線）: {e}")
         raise
     except Exception as e:
@@ -54,5 +76,12 @@ def fetch_711_taiwan():
         raise
 
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="抓取全台灣 7-Eleven（Overpass API）")
+    parser.add_argument("--center", action="store_true", help="以 out center 取得 way / relation 中心，不下載成員節點")
+    args = parser.parse_args(argv)
+    fetch_711_taiwan(center=args.center)
+
+
 if __name__ == "__main__":
-    fetch_711_taiwan()
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+分塊、併發、可續跑的 Overpass 抓取（全台多品牌）。
+
+- 一次查詢涵蓋多個品牌（brand:en 不分大小寫比對）
+- 把台灣範圍切成經緯度方格 tile，以有限併發數同時抓取
+- 每個 tile 的回應直接串流寫入檢查點目錄（先寫 .part 再 rename），完成的 tile 重跑時略過；
+  中斷或部分 tile 失敗後再執行同一指令，只會重抓未完成的 tile
+- 回應含 Overpass 的 runtime error（逾時、記憶體不足）時視為失敗，不留檢查點
+- 全部完成後合併為單一 Overpass 格式 JSON（依 (type, id) 去除跨 tile 的重複元素），
+  可直接交給 overpass_to_restaurants.py（依 brand:en 區分品牌，見其 OSM_BRANDS）
+
+檢查點目錄依查詢內容（品牌、範圍、tile 大小、輸出模式）分開，改參數不會誤用舊 tile。
+
+執行: python3 scripts/fetch_overpass_tiles.py                       # 7-Eleven → scripts/taiwan_711_full.json
+      python3 scripts/fetch_overpass_tiles.py --brands 7-Eleven FamilyMart Hi-Life "OK mart" \\
+          --output scripts/taiwan_stores_full.json
+      python3 scripts/overpass_to_restaurants.py --input scripts/taiwan_stores_full.json \\
+          --output assets/data/taiwan_stores_restaurants.json
+      OVERPASS_URL=http://127.0.0.1:8000/api/interpreter python3 scripts/fetch_overpass_tiles.py   # 本機替身伺服器
+      （替身見 scripts/tests/standins.py；分塊、續跑、重試的測試在 scripts/tests/test_fetch_overpass_tiles.py）
+依賴: 無（經 http_pool.HttpPool 連線）
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from fetch_711_taiwan import OVERPASS_URL
+from http_pool import HttpError, HttpPool
+from store_io import iter_json_array
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BRANDS = ("7-Eleven",)
+# 含金門、馬祖、澎湖；tile 查詢另以 area 限定在台灣境內
+TAIWAN_BBOX = (21.8, 118.1, 26.4, 122.1)  # south, west, north, east
+DEFAULT_TILE_DEG = 0.5
+DEFAULT_PARALLEL = 2
+# 每個 tile 的伺服器端逾時（秒）
+TILE_TIMEOUT_S = 60
+DEFAULT_OUT_MODE = "center"
+CHECKPOINT_ROOT = os.path.join(SCRIPT_DIR, "overpass_tiles")
+# 檢查回應尾端是否有 Overpass 的 runtime error
+_REMARK_TAIL_BYTES = 4096
+_REMARK = re.compile(r'"remark"\s*:\s*("(?:[^"\\]|\\.)*")')
+_REGEX_SPECIAL = set(".^$*+?()[]{}|\\")
+
+_OUT_STATEMENTS = {
+    # 門市本身 + way / relation 的 center（外框中心）
+    "center": "out center;",
+    # 門市本身 + 所有成員節點（overpass_to_restaurants.py 以成員節點定位）
+    "skel": "out body;\n>;\nout skel qt;",
+}
+
+
+def _brand_regex(brands):
+    """品牌清單 → Overpass QL 字串中的正規表示式 ^(a|b)$"""
+    def escape(name):
+        return "".join(f"\\\\{ch}" if ch in _REGEX_SPECIAL else ch for ch in name).replace('"', '\\"')
+    return "^(" + "|".join(escape(b) for b in brands) + ")$"
+
+
+def build_query(brands, bbox, out_mode=DEFAULT_OUT_MODE, timeout_s=TILE_TIMEOUT_S):
+    south, west, north, east = bbox
+    box = f"({south},{west},{north},{east})"
+    selector = f'["brand:en"~"{_brand_regex(brands)}",i](area.searchArea){box}'
+    return (
+        f"[out:json][timeout:{timeout_s}];\n"
+        'area["name:en"="Taiwan"]->.searchArea;\n'
+        "(\n"
+        f"  node{selector};\n"
+        f"  way{selector};\n"
+        f"  relation{selector};\n"
+        ");\n"
+        f"{_OUT_STATEMENTS[out_mode]}\n"
+    )
+
+
+def split_bbox(bbox, tile_deg=DEFAULT_TILE_DEG):
+    """bbox → [(key, tile_bbox)]，由南到北、由西到東"""
+    south, west, north, east = bbox
+    rows = max(1, math.ceil(round((north - south) / tile_deg, 9)))
+    cols = max(1, math.ceil(round((east - west) / tile_deg, 9)))
+    tiles = []
+    for i in range(rows):
+        for j in range(cols):
+            s = round(south + i * tile_deg, 6)
+            w = round(west + j * tile_deg, 6)
+            tiles.append((f"{i:03d}_{j:03d}", (s, w, round(min(s + tile_deg, north), 6), round(min(w + tile_deg, east), 6))))
+    return tiles
+
+
+def checkpoint_dir_for(brands, bbox, tile_deg, out_mode, root=CHECKPOINT_ROOT):
+    spec = json.dumps({"brands": list(brands), "bbox": list(bbox), "tile_deg": tile_deg, "out": out_mode})
+    return os.path.join(root, hashlib.sha256(spec.encode("utf-8")).hexdigest()[:12])
+
+
+def _runtime_error(path):
+    """Overpass 在逾時等情況仍回 200，錯誤放在 JSON 尾端的 remark；回傳該訊息或 None"""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - _REMARK_TAIL_BYTES))
+        tail = f.read().decode("utf-8", errors="replace")
+    m = _REMARK.search(tail)
+    if m is None:
+        return None
+    remark = json.loads(m.group(1))
+    return remark if "error" in remark.lower() else None
+
+
+def fetch_tile(pool, url, key, bbox, brands, out_mode, tile_path):
+    """抓一個 tile 並串流寫入 tile_path；失敗拋出 HttpError"""
+    query = build_query(brands, bbox, out_mode)
+    tmp_path = f"{tile_path}.download"
+    resp = pool.request(
+        "POST",
+        url,
+        body=urllib.parse.urlencode({"data": query}).encode("utf-8"),
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+        timeout=TILE_TIMEOUT_S + 30,
+        out_path=tmp_path,
+    )
+    if resp.status != 200:
+        raise HttpError(f"tile {key}: Overpass HTTP {resp.status}: {resp.body[:200]!r}")
+    error = _runtime_error(tmp_path)
+    if error:
+        os.remove(tmp_path)
+        raise HttpError(f"tile {key}: {error}")
+    os.replace(tmp_path, tile_path)
+
+
+def merge_tiles(tile_paths, out_path):
+    """
+    依序串流讀取各 tile 的 elements，去除 (type, id) 重複後寫成單一 Overpass JSON。
+    回傳寫出的元素數。
+    """
+    seen = set()
+    count = 0
+    tmp_path = f"{out_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as out:
+        out.write('{"elements": [')
+        for path in tile_paths:
+            with open(path, "r", encoding="utf-8") as f:
+                for elem in iter_json_array(f, "elements"):
+                    # skel 與 body 可能各出現一次同一元素（無 tags / 有 tags），兩者都要保留
+                    ident = (elem.get("type"), elem.get("id"), bool(elem.get("tags")))
+                    if ident in seen:
+                        continue
+                    seen.add(ident)
+                    out.write(",\n" if count else "\n")
+                    out.write(json.dumps(elem, ensure_ascii=False))
+                    count += 1
+        out.write("\n]}\n")
+    os.replace(tmp_path, out_path)
+    return count
+
+
+def fetch_tiles(brands=DEFAULT_BRANDS, out_path=None, bbox=TAIWAN_BBOX, tile_deg=DEFAULT_TILE_DEG,
+                parallel=DEFAULT_PARALLEL, out_mode=DEFAULT_OUT_MODE, url=None, checkpoint_root=CHECKPOINT_ROOT,
+                pool=None):
+    """
+    抓取所有 tile（略過已完成者）並合併輸出。
+    回傳 (完成的 tile 數, 失敗的 [(key, 錯誤)])；有失敗時不寫合併檔。
+    """
+    url = url or OVERPASS_URL
+    out_path = out_path or os.path.join(SCRIPT_DIR, "taiwan_711_full.json")
+    ckpt_dir = checkpoint_dir_for(brands, bbox, tile_deg, out_mode, checkpoint_root)
+    os.makedirs(ckpt_dir, exist_ok=True)
+    tiles = split_bbox(bbox, tile_deg)
+    paths = {key: os.path.join(ckpt_dir, f"{key}.json") for key, _ in tiles}
+    todo = [(key, tb) for key, tb in tiles if not os.path.isfile(paths[key])]
+    print(f"{len(tiles)} 個 tile（{tile_deg}°），已完成 {len(tiles) - len(todo)}，待抓 {len(todo)}；檢查點 {ckpt_dir}")
+
+    pool = pool or HttpPool(max_per_host=parallel, timeout=TILE_TIMEOUT_S + 30)
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, parallel)) as executor:
+        futures = {
+            executor.submit(fetch_tile, pool, url, key, tb, brands, out_mode, paths[key]): key
+            for key, tb in todo
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            key = futures[future]
+            try:
+                future.result()
+            except (HttpError, OSError, ValueError) as e:
+                failed.append((key, str(e)))
+                print(f"  tile {key} 失敗: {e}")
+            else:
+                print(f"  [{done}/{len(todo)}] tile {key} 完成（{os.path.getsize(paths[key]) / 1024:.0f} KB）")
+    print(pool.summary())
+
+    if failed:
+        print(f"{len(failed)} 個 tile 失敗，重新執行同一指令即可只重抓這些 tile")
+        return len(tiles) - len(failed), sorted(failed)
+    count = merge_tiles([paths[key] for key, _ in tiles], out_path)
+    print(f"合併 {len(tiles)} 個 tile → {count} 筆元素 → {out_path}")
+    return len(tiles), []
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="分塊、併發、可續跑的 Overpass 多品牌抓取")
+    parser.add_argument("--brands", nargs="+", default=list(DEFAULT_BRANDS), help="brand:en（不分大小寫）")
+    parser.add_argument("--output", help="合併輸出（預設 scripts/taiwan_711_full.json）")
+    parser.add_argument("--bbox", type=float, nargs=4, metavar=("S", "W", "N", "E"), default=list(TAIWAN_BBOX))
+    parser.add_argument("--tile-deg", type=float, default=DEFAULT_TILE_DEG, help="tile 邊長（度）")
+    parser.add_argument("--parallel", type=int, default=DEFAULT_PARALLEL, help="同時抓取的 tile 數")
+    parser.add_argument("--out", choices=sorted(_OUT_STATEMENTS), default=DEFAULT_OUT_MODE,
+                        help="center：只要 way / relation 中心；skel：另下載成員節點")
+    parser.add_argument("--url", help="Overpass 端點（預設 OVERPASS_URL 環境變數）")
+    args = parser.parse_args(argv)
+
+    _, failed = fetch_tiles(
+        brands=args.brands,
+        out_path=args.output,
+        bbox=tuple(args.bbox),
+        tile_deg=args.tile_deg,
+        parallel=args.parallel,
+        out_mode=args.out,
+        url=args.url,
+    )
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
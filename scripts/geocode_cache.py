@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Geocoding 結果的本機持久快取（SQLite），以正規化後的地址為 key。
+
+- 正規化：全形→半形（NFKC）、臺→台、去除所有空白
+- 成功結果永久保留；查無結果（features 為空）也會記下，但只在 TTL 內有效
+- 網路錯誤／重試用盡不寫入快取，下次執行會再查
+- stats 記錄命中／未命中次數
+
+依賴: 無（Python 內建 sqlite3）
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+# 查無結果的快取有效期（秒），過期後重新查詢
+DEFAULT_NEGATIVE_TTL_S = 7 * 24 * 3600
+
+
+def normalize_address(address: str) -> str:
+    """地址正規化：全形數字/英文/符號轉半形、臺→台、移除空白"""
+    s = unicodedata.normalize("NFKC", address or "")
+    s = s.replace("臺", "台")
+    return "".join(s.split())
+
+
+class GeocodeCache:
+    """執行緒安全的 SQLite geocode 快取"""
+
+    def __init__(self, path, negative_ttl_s=DEFAULT_NEGATIVE_TTL_S):
+        self.path = path
+        self.negative_ttl_s = negative_ttl_s
+        self.stats = {"hits": 0, "negative_hits": 0, "misses": 0, "writes": 0}
+        self._lock = threading.Lock()
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL + NORMAL：每筆寫入不必等 fsync，中斷時最多遺失最後幾筆
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS geocode ("
+            " key TEXT PRIMARY KEY,"
+            " address TEXT NOT NULL,"
+            " lat REAL,"
+            " lon REAL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, address):
+        """
+        回傳 (found, lat, lon)：
+        found=False 表示未快取（或查無結果已過期），需要重新查詢；
+        found=True 且 lat 為 None 表示 TTL 內查無結果。
+        """
+        key = normalize_address(address)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT lat, lon, updated_at FROM geocode WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return False, None, None
+            lat, lon, updated_at = row
+            if lat is None or lon is None:
+                if time.time() - updated_at > self.negative_ttl_s:
+                    self.stats["misses"] += 1
+                    return False, None, None
+                self.stats["negative_hits"] += 1
+                return True, None, None
+            self.stats["hits"] += 1
+            return True, lat, lon
+
+    def put(self, address, lat, lon):
+        """寫入結果；lat/lon 為 None 代表查無結果"""
+        key = normalize_address(address)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocode (key, address, lat, lon, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (key, address, lat, lon, time.time()),
+            )
+            self._conn.commit()
+            self.stats["writes"] += 1
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
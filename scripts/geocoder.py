@@ -0,0 +1,233 @@
+"""
+併發、限速的 Mapbox Geocoding 引擎（供 ecpay_store_list.py 使用）。
+
+- 執行緒池併發查詢，輸出順序與輸入相同
+- Token bucket 限速（每秒請求數可設定）
+- 透過 http_pool.HttpPool 共用 keep-alive 連線，429 / 5xx / 連線錯誤自動退避重試
+- 可選用 GeocodeCache（geocode_cache.py），命中快取時不發網路請求
+- 同一批內正規化後相同的地址（商場、車站內的多家門市）只查一次，結果分給每一筆
+- 設定 batch_url 時改走 Mapbox 批次端點（v6 /search/geocode/v6/batch）：一個 POST 帶多筆查詢，
+  請求數約為 唯一地址數 / batch_size
+
+MAPBOX_GEOCODE_URL / MAPBOX_BATCH_GEOCODE_URL 可用環境變數改成本機替身伺服器（scripts/tests/standins.py，兩種端點都有）。
+依賴: 無（Python 內建 http.client, concurrent.futures）
+"""
+
+import json
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from geocode_cache import normalize_address
+from http_pool import DEFAULT_MAX_RETRIES, HttpError, HttpPool, TokenBucket
+
+# 預設每秒請求數（Mapbox Geocoding 免費方案上限約 600 次/分鐘）
+DEFAULT_QPS = 10
+DEFAULT_WORKERS = 8
+# 批次端點每個請求的查詢數（Mapbox 上限 1000；太大時單一請求失敗的重試成本高）
+DEFAULT_BATCH_SIZE = 100
+
+
+class GeocodeError(Exception):
+    """重試用盡或回應無法解析（與「查無結果」不同，不寫入快取）"""
+
+
+class Geocoder:
+    """
+    Mapbox 正向地理編碼：地址 → (lat, lon)，失敗回傳 (None, None)。
+    url_template 形如 https://api.mapbox.com/geocoding/v5/mapbox.places/{query}.json
+    """
+
+    def __init__(self, access_token, url_template, qps=DEFAULT_QPS, workers=DEFAULT_WORKERS,
+                 max_retries=DEFAULT_MAX_RETRIES, timeout=10, cache=None, pool=None,
+                 batch_url=None, batch_size=DEFAULT_BATCH_SIZE):
+        self.access_token = access_token
+        self.cache = cache
+        self.url_template = url_template
+        self.batch_url = batch_url or None
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.pool = pool if pool is not None else HttpPool(max_per_host=self.workers)
+        self.limiter = TokenBucket(qps, burst=self.workers)
+        self.stats = {"failed": 0, "deduped": 0, "batches": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def _url_for(self, address):
+        q = urllib.parse.quote(address)
+        params = urllib.parse.urlencode({"access_token": self.access_token, "country": "TW", "limit": 1})
+        return f"{self.url_template.format(query=q)}?{params}"
+
+    def geocode(self, address):
+        """單筆地址 → (lat, lon)，失敗回傳 (None, None)"""
+        if not address:
+            return None, None
+        if self.cache is not None:
+            found, lat, lon = self.cache.get(address)
+            if found:
+                return lat, lon
+        if not self.access_token:
+            return None, None
+        try:
+            lat, lon = self._fetch(address)
+        except GeocodeError:
+            self._count("failed")
+            return None, None
+        if self.cache is not None:
+            self.cache.put(address, lat, lon)
+        return lat, lon
+
+    def _fetch(self, address):
+        """查詢 Mapbox；查無結果回傳 (None, None)，重試用盡則拋出 GeocodeError"""
+        try:
+            resp = self.pool.request(
+                "GET", self._url_for(address), timeout=self.timeout,
+                limiter=self.limiter, max_retries=self.max_retries,
+            )
+        except HttpError as e:
+            raise GeocodeError(str(e)) from e
+        if resp.status != 200:
+            raise GeocodeError(f"HTTP {resp.status}: {address}")
+        try:
+            features = resp.json().get("features", [])
+        except ValueError:
+            raise GeocodeError(f"無法解析回應: {address}")
+        if not features:
+            return None, None
+        lon, lat = features[0].get("center", [None, None])
+        return lat, lon
+
+    def geocode_many(self, addresses, progress_every=100, on_result=None):
+        """
+        多筆 geocoding，回傳與 addresses 同順序的 [(lat, lon), ...]。
+        正規化後相同的地址只查一次；有 batch_url 時走批次端點（見 geocode_batch）。
+        on_result(i, (lat, lon)) 會在主執行緒呼叫，每個 i 一次（可用來寫進度日誌）；
+        非批次模式依 i 順序，批次模式依完成順序。
+        """
+        addresses = list(addresses)
+        if self.batch_url:
+            return self.geocode_batch(addresses, progress_every, on_result)
+        unique, owners = self._dedupe(addresses)
+        total = len(addresses)
+        out = [(None, None)] * total
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for address, result in zip(unique, executor.map(self.geocode, unique)):
+                for i in owners[address]:
+                    out[i] = result
+                    if on_result is not None:
+                        on_result(i, result)
+                    done += 1
+                    if progress_every and done % progress_every == 0:
+                        print(f"  已 Geocoding {done}/{total}...")
+        return out
+
+    def _dedupe(self, addresses):
+        """
+        回傳 (unique, owners)：unique 為每個正規化地址第一次出現的原字串（依出現順序），
+        owners[原字串] 為共用該地址的輸入索引。空地址不查詢、直接得到 (None, None)。
+        """
+        first = {}
+        owners = {}
+        for i, address in enumerate(addresses):
+            if not address:
+                continue
+            key = normalize_address(address)
+            if key not in first:
+                first[key] = address
+                owners[address] = []
+            owners[first[key]].append(i)
+        unique = list(owners)
+        self._count("deduped", sum(len(v) for v in owners.values()) - len(unique))
+        return unique, owners
+
+    def geocode_batch(self, addresses, progress_every=100, on_result=None):
+        """
+        批次端點模式：去重 → 查快取 → 未命中的地址每 batch_size 筆一個 POST（多個請求併發、同樣限速）
+        → 結果寫回快取並分給共用地址的每一筆。回傳與 addresses 同順序的 [(lat, lon), ...]。
+        整批請求失敗時該批每個地址都記為失敗（不寫入快取）。
+        """
+        addresses = list(addresses)
+        unique, owners = self._dedupe(addresses)
+        total = len(addresses)
+        out = [(None, None)] * total
+        done = 0
+
+        def deliver(address, result):
+            nonlocal done
+            for i in owners[address]:
+                out[i] = result
+                if on_result is not None:
+                    on_result(i, result)
+                done += 1
+                if progress_every and done % progress_every == 0:
+                    print(f"  已 Geocoding {done}/{total}...")
+
+        todo = []
+        for address in unique:
+            if self.cache is not None:
+                found, lat, lon = self.cache.get(address)
+                if found:
+                    deliver(address, (lat, lon))
+                    continue
+            todo.append(address)
+        if not self.access_token:
+            for address in todo:
+                deliver(address, (None, None))
+            return out
+
+        chunks = [todo[k:k + self.batch_size] for k in range(0, len(todo), self.batch_size)]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self._fetch_batch, chunk): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                chunk = futures[future]
+                self._count("batches")
+                try:
+                    results = future.result()
+                except GeocodeError as e:
+                    print(f"  批次 Geocoding 失敗（{len(chunk)} 筆）: {e}")
+                    self._count("failed", len(chunk))
+                    results = [(None, None)] * len(chunk)
+                else:
+                    if self.cache is not None:
+                        for address, (lat, lon) in zip(chunk, results):
+                            self.cache.put(address, lat, lon)
+                for address, result in zip(chunk, results):
+                    deliver(address, result)
+        return out
+
+    def _fetch_batch(self, chunk):
+        """一個批次請求；回傳與 chunk 同順序的 [(lat, lon)]，查無結果為 (None, None)，失敗拋出 GeocodeError"""
+        params = urllib.parse.urlencode({"access_token": self.access_token})
+        body = json.dumps([{"q": address, "country": "tw", "limit": 1} for address in chunk], ensure_ascii=False)
+        try:
+            resp = self.pool.request(
+                "POST", f"{self.batch_url}?{params}", body=body.encode("utf-8"),
+                headers={"Content-Type": "application/json"},
+                timeout=self.timeout * 3, limiter=self.limiter, max_retries=self.max_retries,
+            )
+        except HttpError as e:
+            raise GeocodeError(str(e)) from e
+        if resp.status != 200:
+            raise GeocodeError(f"HTTP {resp.status}: 批次 {len(chunk)} 筆")
+        try:
+            collections = resp.json().get("batch", [])
+        except ValueError:
+            raise GeocodeError(f"無法解析批次回應（{len(chunk)} 筆）")
+        if len(collections) != len(chunk):
+            raise GeocodeError(f"批次回應筆數不符：送出 {len(chunk)}、收到 {len(collections)}")
+        return [_first_lat_lon(c.get("features") or []) for c in collections]
+
+
+def _first_lat_lon(features):
+    """FeatureCollection 的第一個結果 → (lat, lon)；v6 為 geometry.coordinates，v5 為 center"""
+    if not features:
+        return None, None
+    f = features[0]
+    lon, lat = (f.get("geometry") or {}).get("coordinates") or f.get("center") or (None, None)
+    return lat, lon
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+門市圖資腳本共用的 HTTP 連線池（綠界 GetStoreList、Mapbox Geocoding、Overpass）。
+
+- 每個 host 保留 keep-alive 連線重複使用，並以 max_per_host 限制同時連線數
+- 429 / 5xx / 連線錯誤以指數退避重試（有 Retry-After 時依其秒數）
+- 可選 TokenBucket 限速（每次實際送出的請求都會取 token，包含重試）
+- 記錄請求數、重試、錯誤、回應大小與延遲，供執行結束時印出
+- out_path：200 回應以分塊串流寫入檔案（先寫 .part 再 rename），不把整個回應讀進記憶體
+
+依賴: 無（Python 內建 http.client）
+"""
+
+import http.client
+import json
+import os
+import threading
+import time
+import urllib.parse
+
+DEFAULT_MAX_PER_HOST = 8
+DEFAULT_TIMEOUT_S = 30
+DEFAULT_MAX_RETRIES = 3
+# 第 n 次重試前等待 BACKOFF_BASE_S * 2**n 秒
+BACKOFF_BASE_S = 0.5
+RETRY_STATUS = {429, 500, 502, 503, 504}
+STREAM_CHUNK = 1 << 16
+
+
+class HttpError(Exception):
+    """連線錯誤且重試用盡"""
+
+
+class TokenBucket:
+    """執行緒安全的 token bucket：平均每秒 rate 個 token，最多累積 burst 個。rate <= 0 表示不限速。"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class HttpResponse:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body.decode("utf-8"))
+
+
+def _retry_after_s(value):
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def _stream_to_file(resp, path):
+    """把回應本文分塊寫入 path（經 path.part），回傳位元組數"""
+    part_path = f"{path}.part"
+    size = 0
+    try:
+        with open(part_path, "wb") as f:
+            for chunk in iter(lambda: resp.read(STREAM_CHUNK), b""):
+                f.write(chunk)
+                size += len(chunk)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    os.replace(part_path, path)
+    return size
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class HttpPool:
+    """執行緒安全的 keep-alive 連線池"""
+
+    def __init__(self, max_per_host=DEFAULT_MAX_PER_HOST, timeout=DEFAULT_TIMEOUT_S,
+                 max_retries=DEFAULT_MAX_RETRIES):
+        self.max_per_host = max(1, max_per_host)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._idle = {}
+        self._slots = {}
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "retries": 0, "errors": 0, "bytes": 0, "connections": 0}
+        self._latencies = []
+
+    def _slot(self, origin):
+        with self._lock:
+            if origin not in self._slots:
+                self._slots[origin] = threading.BoundedSemaphore(self.max_per_host)
+                self._idle[origin] = []
+            return self._slots[origin]
+
+    def _checkout(self, origin):
+        """取得一條連線；回傳 (conn, 是否為重複使用的舊連線)"""
+        with self._lock:
+            idle = self._idle[origin]
+            if idle:
+                return idle.pop(), True
+            self._stats["connections"] += 1
+        scheme, netloc = origin
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return cls(netloc, timeout=self.timeout), False
+
+    def _checkin(self, origin, conn, reusable):
+        if reusable:
+            with self._lock:
+                self._idle[origin].append(conn)
+        else:
+            conn.close()
+
+    def _record(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def request(self, method, url, body=None, headers=None, timeout=None, limiter=None, max_retries=None,
+                out_path=None):
+        """
+        送出請求並讀完回應。429/5xx 重試用盡時回傳最後一次的回應；
+        連線錯誤重試用盡時拋出 HttpError。
+        指定 out_path 時，200 回應的本文串流寫入該檔（回傳的 body 為空），其他狀態照常讀進 body。
+        """
+        split = urllib.parse.urlsplit(url)
+        origin = (split.scheme, split.netloc)
+        path = split.path or "/"
+        if split.query:
+            path = f"{path}?{split.query}"
+        headers = dict(headers or {})
+        headers.setdefault("Connection", "keep-alive")
+        max_retries = self.max_retries if max_retries is None else max_retries
+        slot = self._slot(origin)
+
+        attempt = 0
+        while True:
+            if limiter is not None:
+                limiter.acquire()
+            with slot:
+                conn, reused = self._checkout(origin)
+                conn.timeout = timeout or self.timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(conn.timeout)
+                started = time.monotonic()
+                self._record("requests")
+                try:
+                    conn.request(method, path, body=body, headers=headers)
+                    resp = conn.getresponse()
+                    if out_path is not None and resp.status == 200:
+                        size = _stream_to_file(resp, out_path)
+                        data = b""
+                    else:
+                        data = resp.read()
+                        size = len(data)
+                except (OSError, http.client.HTTPException) as e:
+                    conn.close()
+                    if reused:
+                        # 閒置的 keep-alive 連線被伺服器關掉，換新連線立即重送，不算重試
+                        continue
+                    self._record("errors")
+                    error, resp = e, None
+                else:
+                    error = None
+                    elapsed = time.monotonic() - started
+                    with self._lock:
+                        self._stats["bytes"] += size
+                        self._latencies.append(elapsed)
+                    keep = resp.getheader("Connection", "").lower() != "close" and not resp.will_close
+                    self._checkin(origin, conn, keep)
+
+            if error is None and resp.status not in RETRY_STATUS:
+                return HttpResponse(resp.status, dict(resp.getheaders()), data)
+            if attempt >= max_retries:
+                if error is not None:
+                    raise HttpError(f"{method} {url}: {error}") from error
+                return HttpResponse(resp.status, dict(resp.getheaders()), data)
+            retry_after = _retry_after_s(resp.getheader("Retry-After")) if resp is not None else None
+            self._record("retries")
+            time.sleep(retry_after if retry_after is not None else BACKOFF_BASE_S * 2 ** attempt)
+            attempt += 1
+
+    def metrics(self) -> dict:
+        """請求數、重試、錯誤、新建連線數、回應總位元組與延遲分位數（毫秒）"""
+        with self._lock:
+            out = dict(self._stats)
+            lat = sorted(self._latencies)
+        out["latency_ms"] = {
+            "p50": round(_percentile(lat, 0.50) * 1000, 1),
+            "p95": round(_percentile(lat, 0.95) * 1000, 1),
+            "max": round((lat[-1] if lat else 0.0) * 1000, 1),
+        }
+        return out
+
+    def summary(self) -> str:
+        m = self.metrics()
+        return (
+            f"HTTP 請求 {m['requests']} 次（重試 {m['retries']}、錯誤 {m['errors']}、新連線 {m['connections']}），"
+            f"回應 {m['bytes'] / 1024:.0f} KB，延遲 p50 {m['latency_ms']['p50']} ms / "
+            f"p95 {m['latency_ms']['p95']} ms / max {m['latency_ms']['max']} ms"
+        )
+
+    def close(self):
+        with self._lock:
+            for conns in self._idle.values():
+                for conn in conns:
+                    conn.close()
+                conns.clear()
@@ -7,94 +7,169 @@ App 不再在登入/載入時做 merge 計算。
       assets/data/taiwan_711_restaurants.json
 輸出: assets/data/merged_convenience_stores.json（RestaurantPoint[]）
 
-執行: python3 scripts/merge_store_sources.py
+      --bin 時另輸出 assets/data/merged_convenience_stores.bin（同內容的精簡二進位格式，見 store_binary.py）
+      --tiles 時另輸出 assets/data/merged_tiles/（固定方格 tile + manifest.json，見 store_tiles.py）
+      --sort hilbert|z 時輸出依空間填充曲線排序，另輸出 merged_convenience_stores.index.json（key 範圍索引，見 store_curve.py）
+
+兩份來源逐筆讀進同一個欄式 StoreSet（store_set.py），各階段只改保留遮罩，不複製資料。
+預設以 store_linkage.py 做跨來源比對：同品牌、距離近且店名相近者合併為一筆，不同品牌的相鄰門市都保留
+（之後的同格去重也只在同品牌內；綠界來源本身的距離合併與同格去重同樣分品牌，見 ecpay_store_list.py）。
+--merge distance 改回舊規則（串接後與已保留點距離 < 30m 者丟棄，先出現者勝出，不分品牌）。
+排序在合併去重之後才做：兩份來源仍以原順序讀入，「先出現者勝出」的結果不受影響。
+
+執行: python3 scripts/merge_store_sources.py [--merge link|distance] [--sort input|hilbert|z] [--curve-key] [--tiles] [--tile-deg 0.05] [--bin] [--metrics PATH] [--profile STAGE]
+各階段耗時、丟棄筆數與記憶體峰值寫入 metrics JSON（見 pipeline_metrics.py）。
 """
 
-import json
-import math
+import argparse
 import os
 
-MERGE_RADIUS_M = 30
-GRID_DECIMALS = 5
+from pipeline_metrics import RunMetrics, add_metrics_args
+from store_binary import binary_path_for, remove_binary, write_store_binary_rows
+from store_curve import CURVES, DEFAULT_CURVE, remove_index, sort_stores, write_index
+from store_geo import GRID_DECIMALS, MERGE_RADIUS_M
+from store_io import JsonArrayWriter, iter_json_array
+from store_set import StoreSet
+from store_tiles import DEFAULT_TILE_DEG, write_tiles
 
+MERGE_METHODS = ("link", "distance")
+# input = 維持來源順序；其餘為 store_curve 的曲線
+SORT_ORDERS = ("input",) + CURVES
+DEFAULT_EMOJI = "🏪"
 
-def haversine_m(lat1, lon1, lat2, lon2):
-    R = 6371000
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlam = math.radians(lon2 - lon1)
-    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlam / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
 
-
-def load_json(path):
+def load_stores(stores, path):
+    """把 RestaurantPoint JSON 逐筆讀進 StoreSet（沒有座標的略過），回傳檔案中的筆數；檔案不存在回傳 0"""
     if not os.path.isfile(path):
-        return []
+        return 0
+    n = 0
     with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return data if isinstance(data, list) else []
-
+        for p in iter_json_array(f):
+            stores.add_point(p, DEFAULT_EMOJI)
+            n += 1
+    return n
+
+
+def merge_records(stores, metrics, method="link"):
+    """
+    兩份來源依序放進同一個 StoreSet 後合併去重，只改遮罩，回傳同一個 StoreSet。
+    method="link" 以 store_linkage 跨來源比對合併；"distance" 為距離合併（先出現者勝出）。
+    階段與計數記在 metrics。
+    """
+    n_in = stores.count()
+    if method == "link":
+        # 跨來源比對（空間分塊 + 品牌 / 距離 / 店名評分 + union-find 分群）
+        stats = {}
+        with metrics.stage("link"):
+            dropped = stores.link(stats=stats)
+        for key, n in stats.items():
+            metrics.count(f"link.{key}", n)
+        metrics.count("dropped.link", dropped)
+    else:
+        # 距離合併（格網索引，先出現者勝出）
+        with metrics.stage("distance_merge"):
+            dropped = stores.distance_merge(MERGE_RADIUS_M)
+        metrics.count("dropped.distance_merge", dropped)
+
+    # 同格去重（link 時只在同品牌內，與跨來源比對一致）
+    with metrics.stage("cell_dedupe"):
+        dropped = stores.cell_dedupe(GRID_DECIMALS, by_brand=method == "link")
+    metrics.count("dropped.cell_dedupe", dropped)
+    metrics.count("output.stores", stores.count())
+    return stores
+
+
+def sort_merged(stores, metrics, sort="input"):
+    """依 sort（input 或曲線名稱）重排 StoreSet；回傳每列的曲線 key，input 時回傳 None"""
+    if sort == "input":
+        return None
+    with metrics.stage("sort"):
+        return sort_stores(stores, sort)
+
+
+def write_merged(out_path, stores, keys=None, curve=DEFAULT_CURVE, emit_keys=False, binary=False):
+    """
+    寫出合併結果 JSON（逐筆），binary 時另寫出同內容的 .bin（否則刪除舊的 .bin）。
+    keys 為 sort_merged 的結果時另寫出索引（emit_keys 時每筆另附 curve_key）；否則刪除舊索引。
+    """
+    with JsonArrayWriter(out_path) as out:
+        records = stores.iter_export()
+        if keys is not None and emit_keys:
+            records = ({**p, "curve_key": k} for p, k in zip(records, keys))
+        for p in records:
+            out.write(p)
+    if binary:
+        write_store_binary_rows(binary_path_for(out_path), stores.iter_rows())
+    else:
+        remove_binary(out_path)
+    if keys is None:
+        remove_index(out_path)
+    else:
+        write_index(out_path, keys, curve)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="合併綠界 + Overpass 門市圖資並去重")
+    parser.add_argument(
+        "--merge",
+        choices=MERGE_METHODS,
+        default="link",
+        help="link = 跨來源比對（預設）；distance = 距離 < 30m 先出現者勝出",
+    )
+    parser.add_argument(
+        "--sort",
+        choices=SORT_ORDERS,
+        default="input",
+        help="input = 維持來源順序（預設）；hilbert / z = 依空間填充曲線排序並輸出 key 範圍索引",
+    )
+    parser.add_argument("--curve-key", action="store_true", help="每筆另附 curve_key（需搭配 --sort hilbert|z）")
+    parser.add_argument("--tiles", action="store_true", help="另輸出固定方格 tile 與 manifest（assets/data/merged_tiles/）")
+    parser.add_argument("--tile-deg", type=float, default=DEFAULT_TILE_DEG, help=f"tile 邊長（度，預設 {DEFAULT_TILE_DEG}）")
+    parser.add_argument("--bin", action="store_true", help="另寫出同內容的 .bin（見 store_binary.py）")
+    add_metrics_args(parser)
+    args = parser.parse_args(argv)
+    if args.curve_key and args.sort == "input":
+        parser.error("--curve-key 需搭配 --sort hilbert 或 --sort z")
+    metrics = RunMetrics.from_args("merge_store_sources", args)
 
-def main():
     root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     data_dir = os.path.join(root, "assets", "data")
     ecpay_path = os.path.join(data_dir, "ecpay_convenience_stores.json")
     overpass_path = os.path.join(data_dir, "taiwan_711_restaurants.json")
     out_path = os.path.join(data_dir, "merged_convenience_stores.json")
-
-    ecpay = load_json(ecpay_path)
-    overpass = load_json(overpass_path)
-    raw = ecpay + overpass
-
-    if not raw:
+    tiles_dir = os.path.join(data_dir, "merged_tiles")
+
+    # 兩份來源逐筆讀進同一個欄式 StoreSet（綠界在前），不為每筆建立中間 dict
+    stores = StoreSet()
+    with metrics.stage("load"):
+        n_ecpay = load_stores(stores, ecpay_path)
+        n_overpass = load_stores(stores, overpass_path)
+    metrics.count("input.ecpay", n_ecpay)
+    metrics.count("input.overpass", n_overpass)
+    metrics.count("dropped.no_coord", n_ecpay + n_overpass - len(stores))
+
+    if not len(stores):
         print("兩份來源皆無資料，請先執行 fetch_711 / ecpay_store_list 產生 JSON")
-        with open(out_path, "w", encoding="utf-8") as f:
-            json.dump([], f, ensure_ascii=False, indent=2)
+        write_merged(out_path, stores, binary=args.bin)
+        metrics.finish()
         return
 
-    # 每筆需有 coord [lng, lat]
-    with_latlon = []
-    for p in raw:
-        c = p.get("coord")
-        if not c or len(c) != 2:
-            continue
-        lon, lat = float(c[0]), float(c[1])
-        with_latlon.append({
-            "id": p.get("id", ""),
-            "coord": [round(lon, 6), round(lat, 6)],
-            "lat": lat,
-            "lon": lon,
-            "title": p.get("title", ""),
-            "emoji": p.get("emoji", "🏪"),
-        })
-
-    # 距離合併
-    kept = []
-    for p in with_latlon:
-        is_dup = False
-        for k in kept:
-            if haversine_m(p["lat"], p["lon"], k["lat"], k["lon"]) < MERGE_RADIUS_M:
-                is_dup = True
-                break
-        if is_dup:
-            continue
-        kept.append(p)
-
-    # 同格去重
-    seen = set()
-    final = []
-    for p in kept:
-        cell = (round(p["lat"], GRID_DECIMALS), round(p["lon"], GRID_DECIMALS))
-        if cell in seen:
-            continue
-        seen.add(cell)
-        final.append({"id": p["id"], "coord": p["coord"], "title": p["title"], "emoji": p["emoji"]})
-
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(final, f, ensure_ascii=False, indent=2)
-
-    print(f"綠界 {len(ecpay)} + Overpass {len(overpass)} → 合併去重後 {len(final)} 筆 → {out_path}")
+    merge_records(stores, metrics, args.merge)
+    keys = sort_merged(stores, metrics, args.sort)
+
+    with metrics.stage("write"):
+        write_merged(out_path, stores, keys, args.sort, args.curve_key, args.bin)
+
+    if args.tiles:
+        with metrics.stage("tiles"):
+            manifest, stats = write_tiles(list(stores.iter_export()), tiles_dir, args.tile_deg)
+        print(
+            f"tile {len(manifest['tiles'])} 個（新寫入 {stats['written']}、未變 {stats['unchanged']}、"
+            f"刪除 {stats['removed']}）→ {tiles_dir}"
+        )
+
+    print(f"綠界 {n_ecpay} + Overpass {n_overpass} → 合併去重後 {stores.count()} 筆 → {out_path}")
+    metrics.finish()
 
 
 if __name__ == "__main__":
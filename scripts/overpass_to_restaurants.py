@@ -2,32 +2,46 @@
 """
 將 Overpass 輸出的 taiwan_711_full.json 轉成 App 餐廳格式
 輸出: assets/data/taiwan_711_restaurants.json（RestaurantPoint[]）
-執行: python3 scripts/overpass_to_restaurants.py
-（請先執行 fetch_711_taiwan.py 產生 taiwan_711_full.json）
+      --bin 時另輸出 assets/data/taiwan_711_restaurants.bin（同內容的精簡二進位格式，見 store_binary.py）
+執行: python3 scripts/overpass_to_restaurants.py [--input PATH] [--output PATH] [--bin] [--metrics PATH] [--profile STAGE]
+（請先執行 fetch_711_taiwan.py 或 fetch_overpass_tiles.py 產生 taiwan_711_full.json）
+
+品牌依 tags 的 brand:en 判定（OSM_BRANDS）：id 前綴（7-Eleven 為 711-，全家為 osm-family- …）與 emoji 隨品牌而定，
+store_linkage 以 id 前綴辨認品牌；沒有 brand:en 的元素視為 7-Eleven。
 
 會自動合併「距離過近」的重複點（同一門市在 OSM 常有 node + way 多筆），
-只保留一筆代表點，避免地圖上重疊一堆 7-Eleven。
+只保留一筆代表點，避免地圖上重疊一堆 7-Eleven；只在同品牌內合併，7-Eleven 隔壁的全家會保留。
+
+門市只取有 tags 的元素；`out skel` 附帶的節點 / way（無 tags）只用來建 id → 座標索引，
+沒有 center / bounds 的 way / relation 以成員節點的外框中心定位（與 Overpass `out center` 相同算法）。
+以 fetch_711_taiwan.py --center 抓取時元素已帶 center，不需成員節點。
+
+輸入以串流方式逐筆讀取 elements，有效點存進欄式的 StoreSet（store_set.py），
+去重只改遮罩、輸出逐筆寫出，不為每筆門市建立 dict。
+
+各階段耗時、丟棄筆數與記憶體峰值寫入 metrics JSON（見 pipeline_metrics.py）。
 """
 
-import json
-import math
+import argparse
 import os
 
-# 兩點距離小於此值（米）視為同一家店，只保留一筆（調大一點可清掉「兩個座標」重疊）
-MERGE_RADIUS_M = 30
-# 同一格（小數第5位相同，約 1.1m）只留一筆，確保不會有兩個幾乎同位置的點
-GRID_DECIMALS = 5
-
+from pipeline_metrics import RunMetrics, add_metrics_args
+from store_binary import binary_path_for, remove_binary, write_store_binary, write_store_binary_rows
+from store_geo import GRID_DECIMALS, MERGE_RADIUS_M
+from store_io import JsonArrayWriter, iter_json_array
+from store_set import StoreSet
 
-def haversine_m(lat1, lon1, lat2, lon2):
-    """計算兩點距離（米）。"""
-    R = 6371000
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlam = math.radians(lon2 - lon1)
-    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlam / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
+# brand:en（小寫）→ (id 前綴, emoji)；7-Eleven 維持原本的 711- 前綴，與既有輸出、store_linkage 相同
+OSM_BRANDS = {
+    "7-eleven": ("711-", "🥤"),
+    "familymart": ("osm-family-", "🏪"),
+    "hi-life": ("osm-hilife-", "🏪"),
+    "ok mart": ("osm-ok-", "🏪"),
+}
+# 沒有 brand:en 的元素視為 7-Eleven（fetch_711_taiwan.py 只查 7-Eleven）
+DEFAULT_BRAND = "7-eleven"
+# 其他品牌：不判定品牌（store_linkage.brand_of 為 None）
+OTHER_BRAND = ("osm-", "🏪")
 
 
 def get_lat_lon(elem):
@@ -53,70 +67,195 @@ def get_lat_lon(elem):
     return None, None
 
 
-def overpass_to_restaurants():
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    root = os.path.dirname(script_dir)
-    in_path = os.path.join(script_dir, "taiwan_711_full.json")
-    out_dir = os.path.join(root, "assets", "data")
-    out_path = os.path.join(out_dir, "taiwan_711_restaurants.json")
+def _member_coords(kind, ref, nodes, ways, relations, seen):
+    """成員（node / way / relation）底下所有節點座標"""
+    if kind == "node":
+        if ref in nodes:
+            yield nodes[ref]
+    elif kind == "way":
+        for node_id in ways.get(ref, ()):
+            if node_id in nodes:
+                yield nodes[node_id]
+    elif kind == "relation" and ref not in seen:
+        seen.add(ref)
+        for m in relations.get(ref, ()):
+            yield from _member_coords(m.get("type"), m.get("ref"), nodes, ways, relations, seen)
 
-    if not os.path.isfile(in_path):
-        print(f"找不到 {in_path}，請先執行: python3 scripts/fetch_711_taiwan.py")
-        return
 
-    os.makedirs(out_dir, exist_ok=True)
+def resolve_center(elem, nodes, ways, relations):
+    """以成員節點座標的外框中心定位 way / relation；找不到任何成員節點時回傳 (None, None)"""
+    kind = elem.get("type")
+    if kind == "way":
+        coords = [nodes[n] for n in elem.get("nodes", ()) if n in nodes]
+    elif kind == "relation":
+        seen = {elem.get("id")}
+        coords = [
+            c for m in elem.get("members", ())
+            for c in _member_coords(m.get("type"), m.get("ref"), nodes, ways, relations, seen)
+        ]
+    else:
+        return None, None
+    if not coords:
+        return None, None
+    lats = [c[0] for c in coords]
+    lons = [c[1] for c in coords]
+    return (min(lats) + max(lats)) / 2, (min(lons) + max(lons)) / 2
 
-    with open(in_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
 
-    # 先收集所有有效點
-    raw = []
-    for elem in data.get("elements", []):
+def iter_store_elements(elements, stats=None):
+    """
+    逐筆產生 (元素, lat, lon)，只含有 tags 的門市元素，順序與輸入相同。
+    無 tags 的 skel 節點建成 id → 座標索引（way / relation 的成員清單也一併記下）；
+    一旦遇到需要成員節點才能定位的元素，其後的門市先暫存，讀完全部元素後依序定位輸出。
+    stats（dict）會累計 skel / from_center / from_members / unresolved 筆數。
+    """
+    stats = stats if stats is not None else {}
+    for key in ("skel", "from_center", "from_members", "unresolved"):
+        stats.setdefault(key, 0)
+    nodes = {}
+    ways = {}
+    relations = {}
+    pending = []
+    for elem in elements:
+        kind = elem.get("type")
+        if kind == "way" and "nodes" in elem:
+            ways[elem.get("id")] = elem["nodes"]
+        elif kind == "relation" and "members" in elem:
+            relations[elem.get("id")] = elem["members"]
+        if not elem.get("tags"):
+            stats["skel"] += 1
+            if kind == "node" and "lat" in elem and "lon" in elem:
+                nodes[elem.get("id")] = (elem["lat"], elem["lon"])
+            continue
         lat, lon = get_lat_lon(elem)
-        if lat is None or lon is None:
+        if pending or lat is None or lon is None:
+            pending.append(elem)
             continue
+        stats["from_center"] += 1
+        yield elem, lat, lon
+
+    for elem in pending:
+        lat, lon = get_lat_lon(elem)
+        if lat is not None and lon is not None:
+            stats["from_center"] += 1
+        else:
+            lat, lon = resolve_center(elem, nodes, ways, relations)
+            if lat is None:
+                stats["unresolved"] += 1
+                continue
+            stats["from_members"] += 1
+        yield elem, lat, lon
+
+
+def store_title(tags):
+    """門市顯示名稱；多數門市 name 只有品牌，分店名在 branch，併入店名供顯示與跨來源比對"""
+    name = tags.get("name") or tags.get("brand:en") or "7-Eleven"
+    branch = tags.get("branch")
+    if branch and branch not in name:
+        name = f"{name} {branch}"
+    return name
+
+
+def store_brand(tags):
+    """tags → (id 前綴, emoji)，依 brand:en 不分大小寫（與 fetch_overpass_tiles.py 的查詢相同）"""
+    brand = (tags.get("brand:en") or DEFAULT_BRAND).strip().lower()
+    return OSM_BRANDS.get(brand, OTHER_BRAND)
+
+
+def load_stores(elements, stats=None):
+    """Overpass 元素（可為串流）→ 有效點的 StoreSet（依元素順序，尚未去重）"""
+    stores = StoreSet()
+    for elem, lat, lon in iter_store_elements(elements, stats):
         tags = elem.get("tags") or {}
-        name = tags.get("name") or tags.get("brand:en") or "7-Eleven"
-        raw.append({
-            "id": f"711-{elem.get('type', 'n')}{elem.get('id')}",
-            "coord": [round(lon, 6), round(lat, 6)],
-            "lat": lat,
-            "lon": lon,
-            "title": name,
-            "emoji": "🥤",
-        })
-
-    # 1) 距離合併：與已保留點距離 < MERGE_RADIUS_M 的視為同一家店，只保留一筆
-    kept = []
-    for p in raw:
-        lat, lon = p["lat"], p["lon"]
-        is_duplicate = False
-        for k in kept:
-            if haversine_m(lat, lon, k["lat"], k["lon"]) < MERGE_RADIUS_M:
-                is_duplicate = True
-                break
-        if is_duplicate:
-            continue
-        kept.append({"lat": lat, "lon": lon, **{k: p[k] for k in ("id", "coord", "title", "emoji")}})
+        prefix, emoji = store_brand(tags)
+        store_id = f"{prefix}{elem.get('type', 'n')}{elem.get('id')}"
+        stores.append(store_id, lat, lon, store_title(tags), emoji)
+    return stores
+
+
+def convert_elements(elements, metrics):
+    """
+    Overpass 元素（可為串流）→ 去重後的 StoreSet（被丟棄的點只在遮罩中標記）。
+    階段與計數記在 metrics。
+    """
+    def counted(items, name):
+        for item in items:
+            metrics.count(name)
+            yield item
+
+    resolve_stats = {}
+    # 1) 距離合併：逐筆讀取有效點，與同品牌已保留點距離 < MERGE_RADIUS_M 的視為同一家店，只保留一筆
+    #    以格網索引只比對鄰近格的已保留點（先出現者勝出）；多品牌輸入時不同品牌的相鄰門市都保留
+    with metrics.stage("read_merge"):
+        stores = load_stores(counted(elements, "input.elements"), resolve_stats)
+        dropped = stores.distance_merge(MERGE_RADIUS_M, by_brand=True)
+    raw_count = len(stores)
+    metrics.count("input.points", raw_count)
+    metrics.count("input.skel", resolve_stats["skel"])
+    metrics.count("resolved.from_members", resolve_stats["from_members"])
+    metrics.count("dropped.no_coord", resolve_stats["unresolved"])
+    metrics.count("dropped.distance_merge", dropped)
+    n_kept = raw_count - dropped
 
     # 2) 同格只留一筆：小數第 GRID_DECIMALS 位相同視為同一座標，清掉殘留的雙點
-    seen_cell = set()
-    final = []
-    for p in kept:
-        cell = (round(p["lat"], GRID_DECIMALS), round(p["lon"], GRID_DECIMALS))
-        if cell in seen_cell:
-            continue
-        seen_cell.add(cell)
-        final.append(p)
+    with metrics.stage("cell_dedupe"):
+        dropped = stores.cell_dedupe(GRID_DECIMALS, by_brand=True)
+    metrics.count("dropped.cell_dedupe", dropped)
+    metrics.count("output.stores", stores.count())
+
+    if resolve_stats["from_members"]:
+        print(f"way / relation 以成員節點定位 {resolve_stats['from_members']} 筆（無法定位 {resolve_stats['unresolved']} 筆）")
+    print(f"原始 {raw_count} 筆 → 距離合併 {n_kept} 筆 → 同格去重 {stores.count()} 筆")
+    return stores
+
+
+def write_restaurants(out_path, stores, binary=False):
+    """寫出 JSON（逐筆），binary 時另寫出同內容的 .bin；stores 為 StoreSet 或 RestaurantPoint 列表"""
+    columnar = isinstance(stores, StoreSet)
+    with JsonArrayWriter(out_path) as out:
+        for p in stores.iter_export() if columnar else stores:
+            out.write(p)
+    if not binary:
+        remove_binary(out_path)
+    elif columnar:
+        write_store_binary_rows(binary_path_for(out_path), stores.iter_rows())
+    else:
+        write_store_binary(binary_path_for(out_path), stores)
+
+
+def overpass_to_restaurants(metrics=None, in_path=None, out_path=None, binary=False):
+    metrics = metrics or RunMetrics("overpass_to_restaurants")
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    root = os.path.dirname(script_dir)
+    in_path = in_path or os.path.join(script_dir, "taiwan_711_full.json")
+    out_path = out_path or os.path.join(root, "assets", "data", "taiwan_711_restaurants.json")
+
+    if not os.path.isfile(in_path):
+        print(f"找不到 {in_path}，請先執行: python3 scripts/fetch_711_taiwan.py")
+        return
+
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
 
-    out_export = [{"id": p["id"], "coord": p["coord"], "title": p["title"], "emoji": p["emoji"]} for p in final]
+    with open(in_path, "r", encoding="utf-8") as f:
+        stores = convert_elements(iter_json_array(f, "elements"), metrics)
 
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(out_export, f, ensure_ascii=False, indent=2)
+    with metrics.stage("write"):
+        write_restaurants(out_path, stores, binary)
 
-    print(f"原始 {len(raw)} 筆 → 距離合併 {len(kept)} 筆 → 同格去重 {len(final)} 筆，儲存至 {out_path}")
+    print(f"儲存至 {out_path}")
+    metrics.finish()
     return out_path
 
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Overpass 門市 → App 餐廳格式")
+    parser.add_argument("--input", help="Overpass JSON（預設 scripts/taiwan_711_full.json）")
+    parser.add_argument("--output", help="輸出 JSON（預設 assets/data/taiwan_711_restaurants.json）")
+    parser.add_argument("--bin", action="store_true", help="另寫出同內容的 .bin（見 store_binary.py）")
+    add_metrics_args(parser)
+    args = parser.parse_args(argv)
+    overpass_to_restaurants(RunMetrics.from_args("overpass_to_restaurants", args), args.input, args.output, args.bin)
+
+
 if __name__ == "__main__":
-    overpass_to_restaurants()
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+門市圖資腳本共用的執行量測：階段計時、計數器、記憶體峰值取樣、cProfile。
+
+    metrics = RunMetrics.from_args("merge_store_sources", args)
+    with metrics.stage("load"):
+        ...
+    metrics.count("dropped.distance_merge", n)
+    metrics.finish()   # 印出摘要並寫出 metrics JSON
+
+- 每個階段記錄耗時與期間的 RSS 峰值（背景執行緒每 RSS_SAMPLE_S 秒取樣一次）
+- 計數器以點號分組，例如 http.requests、geocode.cache_hits、dropped.cell_dedupe
+- --profile 指定的階段以 cProfile 執行，輸出 .prof（可用 snakeviz / pstats 檢視）並印出前幾名
+- 每次執行寫出一份 JSON 到 scripts/metrics/<腳本>-<時間>.json（--metrics 可改路徑）
+
+依賴: 無（Python 內建 cProfile、resource）
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from store_io import write_json_atomic
+
+try:
+    import resource
+except ImportError:  # Windows 沒有 resource
+    resource = None
+
+METRICS_VERSION = 1
+METRICS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "metrics")
+# RSS 取樣間隔（秒）
+RSS_SAMPLE_S = 0.05
+# --profile 時印出的函式數
+PROFILE_TOP_N = 15
+
+
+def current_rss_kb():
+    """目前的常駐記憶體（KB）；Linux 讀 /proc，其他平台退回程序至今的峰值"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        return peak_rss_kb()
+
+
+def peak_rss_kb():
+    """程序至今的 RSS 峰值（KB）"""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 單位為 bytes，Linux 為 KB
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+class _RssSampler(threading.Thread):
+    """背景取樣 RSS，記錄目前階段的峰值"""
+
+    def __init__(self, interval=RSS_SAMPLE_S):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.peak_kb = current_rss_kb()
+
+    def take(self):
+        rss = current_rss_kb()
+        with self._lock:
+            self.peak_kb = max(self.peak_kb, rss)
+            return self.peak_kb
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.take()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def add_metrics_args(parser):
+    """加上 --metrics / --profile 參數"""
+    parser.add_argument("--metrics", help="metrics JSON 輸出路徑（預設 scripts/metrics/<腳本>-<時間>.json）")
+    parser.add_argument(
+        "--profile",
+        metavar="STAGE[,STAGE]",
+        help="以 cProfile 執行指定階段（all = 全部），輸出 .prof 到 metrics JSON 旁",
+    )
+
+
+class RunMetrics:
+    def __init__(self, script, metrics_path=None, profile=None):
+        self.script = script
+        self.started_at = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        self.path = metrics_path or os.path.join(METRICS_DIR, f"{script}-{stamp}.json")
+        self.profile = set(profile.split(",")) if profile else set()
+        self.stages = []
+        self.counters = {}
+        self.extra = {}
+        self._t0 = time.perf_counter()
+        self._sampler = _RssSampler()
+        self._sampler.start()
+
+    @classmethod
+    def from_args(cls, script, args):
+        return cls(script, getattr(args, "metrics", None), getattr(args, "profile", None))
+
+    def _profile_path(self, name):
+        return f"{os.path.splitext(self.path)[0]}.{name}.prof"
+
+    @contextmanager
+    def stage(self, name):
+        """量測一個階段；同名階段可出現多次，各自記錄"""
+        profiler = cProfile.Profile() if ("all" in self.profile or name in self.profile) else None
+        self._sampler.reset()
+        t0 = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            entry = {
+                "name": name,
+                "seconds": round(time.perf_counter() - t0, 4),
+                "peak_rss_kb": self._sampler.take(),
+            }
+            if profiler is not None:
+                entry["profile"] = self._dump_profile(name, profiler)
+            self.stages.append(entry)
+
+    def _dump_profile(self, name, profiler):
+        path = self._profile_path(name)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        profiler.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+        print(f"[profile] {name} → {path}")
+        print(out.getvalue())
+        return path
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def note(self, name, value):
+        """記錄非計數的附加資訊（例如 HttpPool.metrics() 的延遲分位數）"""
+        self.extra[name] = value
+
+    def record_http(self, pool):
+        """把 HttpPool 的統計併入計數器"""
+        m = pool.metrics()
+        for key in ("requests", "retries", "errors", "connections", "bytes"):
+            self.count(f"http.{key}", m[key])
+        self.note("http.latency_ms", m["latency_ms"])
+
+    def record_geocoder(self, geocoder):
+        for key in ("failed", "deduped", "batches"):
+            self.count(f"geocode.{key}", geocoder.stats.get(key, 0))
+        if geocoder.cache is not None:
+            for key, value in geocoder.cache.stats.items():
+                self.count(f"geocode.cache_{key}", value)
+
+    def absorb(self, other, prefix):
+        """併入另一個 RunMetrics（例如同一行程內並行的分支）的階段、計數與附加資訊，名稱加上 prefix."""
+        other._sampler.stop()
+        self.stages.extend({**s, "name": f"{prefix}.{s['name']}"} for s in other.stages)
+        for name, n in other.counters.items():
+            self.count(f"{prefix}.{name}", n)
+        for name, value in other.extra.items():
+            self.note(f"{prefix}.{name}", value)
+
+    def to_dict(self):
+        return {
+            "version": METRICS_VERSION,
+            "script": self.script,
+            "argv": sys.argv[1:],
+            "started_at": self.started_at,
+            "total_s": round(time.perf_counter() - self._t0, 4),
+            "peak_rss_kb": peak_rss_kb(),
+            "stages": self.stages,
+            "counters": dict(sorted(self.counters.items())),
+            "extra": self.extra,
+        }
+
+    def summary(self) -> str:
+        d = self.to_dict()
+        parts = [f"{s['name']} {s['seconds']:.2f}s" for s in d["stages"]]
+        return f"耗時 {d['total_s']:.2f}s（{'、'.join(parts)}），RSS 峰值 {d['peak_rss_kb'] / 1024:.0f} MB"
+
+    def finish(self):
+        """停止取樣、印出摘要並寫出 metrics JSON；回傳寫出的路徑"""
+        self._sampler.stop()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        write_json_atomic(self.path, self.to_dict(), indent=2)
+        print(f"{self.summary()} → {self.path}")
+        return self.path
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+單一行程完成門市圖資更新：Overpass 與綠界兩條分支同時執行，記錄在記憶體中傳給合併，只寫出最終檔案。
+
+    Overpass 查詢 → convert_elements ─┐
+                                       ├→ merge_records → 寫出
+    綠界清單 → Geocoding → 去重 ───────┘
+
+與分別執行 fetch_711_taiwan → overpass_to_restaurants / ecpay_store_list → merge_store_sources 的結果相同，
+但不經過 scripts/taiwan_711_full.json 等中間檔，也不重複解析 JSON。
+兩條分支都是阻塞式 HTTP（http_pool.HttpPool），以 asyncio.to_thread 放到執行緒並行，總耗時約等於較慢的一條。
+
+輸出: assets/data/taiwan_711_restaurants.json
+      assets/data/ecpay_convenience_stores.json
+      assets/data/merged_convenience_stores.json
+      （--bin 時各另輸出同內容的 .bin；--merged-only 時只寫合併結果；--tiles 另輸出 merged_tiles/；
+       --sort hilbert|z 時合併結果依空間填充曲線排序，另輸出 merged_convenience_stores.index.json）
+任一分支失敗時不寫出任何檔案，結束碼 1；已存在的檔案保持原樣。
+
+執行: python3 scripts/refresh_stores.py [--center] [--incremental] [--batch] [--merge link|distance] [--sort input|hilbert|z] [--curve-key] [--merged-only] [--tiles] [--bin] [--metrics PATH]
+各分支的階段與計數以 overpass. / ecpay. / merge. 為前綴寫入同一份 metrics JSON（見 pipeline_metrics.py）。
+需要依檔案雜湊跳過未變更步驟時改用 store_pipeline.py。
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from ecpay_incremental import load_state, save_state
+from ecpay_store_list import (
+    CVS_TYPES,
+    GEOCODE_WORKERS,
+    STATE_PATH,
+    build_state,
+    dedupe_points,
+    fetch_all_stores,
+    geocode_stores,
+    stores_to_points,
+)
+from fetch_711_taiwan import fetch_overpass_json
+from http_pool import HttpPool
+from merge_store_sources import DEFAULT_EMOJI, MERGE_METHODS, SORT_ORDERS, merge_records, sort_merged, write_merged
+from overpass_to_restaurants import convert_elements, write_restaurants
+from pipeline_metrics import RunMetrics, add_metrics_args
+from store_binary import binary_path_for, remove_binary, write_store_binary
+from store_io import write_json_atomic
+from store_set import StoreSet
+from store_tiles import DEFAULT_TILE_DEG, write_tiles
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT, "assets", "data")
+OVERPASS_OUT = os.path.join(DATA_DIR, "taiwan_711_restaurants.json")
+ECPAY_OUT = os.path.join(DATA_DIR, "ecpay_convenience_stores.json")
+MERGED_OUT = os.path.join(DATA_DIR, "merged_convenience_stores.json")
+TILES_DIR = os.path.join(DATA_DIR, "merged_tiles")
+
+
+def run_overpass(metrics, center=False):
+    """Overpass 分支：查詢 → 去重後的 StoreSet（不落地原始 JSON）"""
+    pool = HttpPool()
+    with metrics.stage("fetch"):
+        data = fetch_overpass_json(pool, center)
+    metrics.record_http(pool)
+    return convert_elements(data.get("elements", []), metrics)
+
+
+def run_ecpay(metrics, incremental=False, batch=False):
+    """
+    綠界分支：門市清單 → Geocoding → 去重，回傳 (RestaurantPoint 列表, 下次 --incremental 用的狀態)。
+    incremental 時沿用上次狀態，只 Geocoding 新增/地址變更的門市（不支援中斷續跑，需要時用 ecpay_store_list.py）。
+    """
+    pool = HttpPool(max_per_host=max(GEOCODE_WORKERS, len(CVS_TYPES)))
+    prev = load_state(STATE_PATH) if incremental else {}
+    with metrics.stage("fetch"):
+        all_stores = fetch_all_stores(pool)
+    metrics.count("input.stores", len(all_stores))
+    if not all_stores:
+        raise RuntimeError("未取得任何綠界門市，請檢查 ECPAY_HASH_KEY / ECPAY_HASH_IV 是否正確")
+
+    coords = geocode_stores(all_stores, pool, metrics, prev, report_changes=incremental, batch=batch)
+    raw, keys = stores_to_points(all_stores, coords)
+    metrics.count("dropped.no_coord", len(all_stores) - len(raw))
+    out_export, flags = dedupe_points(raw, keys, prev, metrics)
+    print(f"綠界 {len(all_stores)} 筆 → Geocoding 成功 {len(raw)} 筆 → 去重後 {len(out_export)} 筆")
+    return out_export, build_state(all_stores, coords, keys, flags)
+
+
+async def gather_branches(args, overpass_metrics, ecpay_metrics):
+    """兩條分支並行；回傳 (overpass 結果, ecpay 結果)，失敗的分支以例外物件表示"""
+    return await asyncio.gather(
+        asyncio.to_thread(run_overpass, overpass_metrics, args.center),
+        asyncio.to_thread(run_ecpay, ecpay_metrics, args.incremental, args.batch),
+        return_exceptions=True,
+    )
+
+
+def write_outputs(args, overpass, ecpay, merged, keys, metrics):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    with metrics.stage("write"):
+        if not args.merged_only:
+            write_restaurants(OVERPASS_OUT, overpass, args.bin)
+            write_json_atomic(ECPAY_OUT, ecpay, indent=2)
+            if args.bin:
+                write_store_binary(binary_path_for(ECPAY_OUT), ecpay)
+            else:
+                remove_binary(ECPAY_OUT)
+        write_merged(MERGED_OUT, merged, keys, args.sort, args.curve_key, args.bin)
+
+    if args.tiles:
+        with metrics.stage("tiles"):
+            manifest, stats = write_tiles(list(merged.iter_export()), TILES_DIR, args.tile_deg)
+        print(
+            f"tile {len(manifest['tiles'])} 個（新寫入 {stats['written']}、未變 {stats['unchanged']}、"
+            f"刪除 {stats['removed']}）→ {TILES_DIR}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Overpass + 綠界 → 合併門市圖資（單一行程、兩分支並行）")
+    parser.add_argument("--center", action="store_true", help="Overpass 以 out center 取得 way / relation 中心")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="綠界只 Geocoding 新增/地址變更的門市，只在受影響區塊重算去重",
+    )
+    parser.add_argument("--batch", action="store_true", help="綠界地址以批次端點 Geocoding（見 ecpay_store_list.py）")
+    parser.add_argument(
+        "--merge",
+        choices=MERGE_METHODS,
+        default="link",
+        help="link = 跨來源比對（預設）；distance = 距離 < 30m 先出現者勝出",
+    )
+    parser.add_argument(
+        "--sort",
+        choices=SORT_ORDERS,
+        default="input",
+        help="合併結果的順序：input = 維持來源順序（預設）；hilbert / z = 依空間填充曲線排序並輸出 key 範圍索引",
+    )
+    parser.add_argument("--curve-key", action="store_true", help="合併結果每筆另附 curve_key（需搭配 --sort hilbert|z）")
+    parser.add_argument("--merged-only", action="store_true", help="只寫出合併結果，不更新兩份來源 JSON")
+    parser.add_argument("--tiles", action="store_true", help="另輸出固定方格 tile 與 manifest（assets/data/merged_tiles/）")
+    parser.add_argument("--tile-deg", type=float, default=DEFAULT_TILE_DEG, help=f"tile 邊長（度，預設 {DEFAULT_TILE_DEG}）")
+    parser.add_argument("--bin", action="store_true", help="各輸出另寫出同內容的 .bin（見 store_binary.py）")
+    add_metrics_args(parser)
+    args = parser.parse_args(argv)
+    if args.curve_key and args.sort == "input":
+        parser.error("--curve-key 需搭配 --sort hilbert 或 --sort z")
+    metrics = RunMetrics.from_args("refresh_stores", args)
+    overpass_metrics = RunMetrics("refresh_stores.overpass", profile=args.profile)
+    ecpay_metrics = RunMetrics("refresh_stores.ecpay", profile=args.profile)
+
+    t0 = time.perf_counter()
+    overpass, ecpay = asyncio.run(gather_branches(args, overpass_metrics, ecpay_metrics))
+    metrics.note("branches_s", round(time.perf_counter() - t0, 4))
+    metrics.absorb(overpass_metrics, "overpass")
+    metrics.absorb(ecpay_metrics, "ecpay")
+
+    failed = [(name, r) for name, r in (("Overpass", overpass), ("綠界", ecpay)) if isinstance(r, BaseException)]
+    if failed:
+        for name, exc in failed:
+            print(f"{name} 分支失敗: {exc}")
+        print("未寫出任何檔案")
+        metrics.finish()
+        return 1
+
+    ecpay, ecpay_state = ecpay
+    merge_metrics = RunMetrics("refresh_stores.merge", profile=args.profile)
+    # 與 merge_store_sources 讀回兩份 JSON 相同：綠界在前，座標取輸出精度
+    merged = StoreSet.from_points(ecpay, DEFAULT_EMOJI)
+    merged.extend(overpass)
+    merge_records(merged, merge_metrics, args.merge)
+    keys = sort_merged(merged, merge_metrics, args.sort)
+    metrics.absorb(merge_metrics, "merge")
+
+    write_outputs(args, overpass, ecpay, merged, keys, metrics)
+    save_state(STATE_PATH, ecpay_state)
+
+    print(f"綠界 {len(ecpay)} + Overpass {overpass.count()} → 合併去重後 {merged.count()} 筆 → {MERGED_OUT}")
+    metrics.finish()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
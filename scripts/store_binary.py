@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+門市圖資的精簡二進位格式（與 JSON 輸出並存，內容相同：RestaurantPoint[]）。
+
+格式（little-endian，版本 1）：
+  magic    b"SFST"
+  version  u8
+  flags    u8（保留，目前為 0）
+  字串表   varint 筆數，每筆 varint 長度 + UTF-8；title / emoji / id 前綴共用、去重
+  筆數 n   varint
+  經度     int32 × n（度 × 1e6，即 coord 的 6 位小數定點數）
+  緯度     int32 × n
+  參照寬度 u8（2 或 4 bytes）
+  title    uint × n（0 = 無，其餘為字串表索引 + 1）
+  emoji    uint × n（同上）
+  id 前綴  uint × n（字串表索引 × 2 + 是否有數字尾碼）
+  id 尾碼  varint，依序只寫有尾碼的那些筆
+
+id 拆成「前綴 + 數字尾碼」（例：711-node244453297 → "711-node" + 244453297），
+數字以 varint 儲存；尾碼不含前導 0，確保還原後字串完全相同。
+
+title / emoji 為 None（或缺少）時參照為 0，讀回一律為 None，欄位不會消失。
+
+檔案小很多（taiwan_711_restaurants 707 KB → 95 KB，ecpay 1244 KB → 240 KB），但以 Python 解碼
+不比 json.loads（C 實作）快：實測 5.1k 筆 10.0 ms 對 10.8 ms、8.8k 筆 41.9 ms 對 21.1 ms。
+App 目前只載入 JSON、沒有讀 .bin 的解碼器，因此各輸出腳本只在加 --bin 時才一併寫出 .bin
+（未加時刪除舊的 .bin，避免留下與 JSON 不一致的過期檔），且不進版控（見 .gitignore）。
+
+執行: python3 scripts/store_binary.py assets/data/taiwan_711_restaurants.json
+      （轉出 .bin，驗證來回轉換一致，並比較檔案大小與 Python 解析時間）
+依賴: 無（Python 內建 array）
+"""
+
+import json
+import os
+import re
+import sys
+import time
+from array import array
+
+MAGIC = b"SFST"
+FORMAT_VERSION = 1
+COORD_SCALE = 1_000_000
+BINARY_SUFFIX = ".bin"
+
+_ID_NUMBER = re.compile(r"^(.*?)([1-9][0-9]*|0)$", re.S)
+
+
+def binary_path_for(json_path):
+    """assets/data/x.json → assets/data/x.bin"""
+    return os.path.splitext(json_path)[0] + BINARY_SUFFIX
+
+
+def remove_binary(json_path):
+    """未輸出 .bin 時刪除舊檔，避免留下過期檔案"""
+    path = binary_path_for(json_path)
+    if os.path.isfile(path):
+        os.remove(path)
+
+
+def _put_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _get_varint(buf, pos):
+    result = 0
+    shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if b < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _pack(typecode, values):
+    a = array(typecode, values)
+    if sys.byteorder != "little":
+        a.byteswap()
+    return a.tobytes()
+
+
+def _unpack(typecode, buf, pos, n):
+    a = array(typecode)
+    end = pos + a.itemsize * n
+    a.frombytes(buf[pos:end])
+    if sys.byteorder != "little":
+        a.byteswap()
+    return a, end
+
+
+def encode_stores(points) -> bytes:
+    """RestaurantPoint 列表 → 二進位"""
+    return encode_rows((p["id"], p["coord"][0], p["coord"][1], p.get("title"), p.get("emoji")) for p in points)
+
+
+def encode_rows(rows) -> bytes:
+    """(id, lon, lat, title, emoji) 列（可為串流，例如 StoreSet.iter_rows()）→ 二進位；title / emoji 可為 None"""
+    strings = {}
+
+    def ref(s):
+        if s not in strings:
+            strings[s] = len(strings)
+        return strings[s]
+
+    lons = []
+    lats = []
+    title_refs = []
+    emoji_refs = []
+    id_refs = []
+    numbers = bytearray()
+    for store_id, lon, lat, title, emoji in rows:
+        lons.append(round(lon * COORD_SCALE))
+        lats.append(round(lat * COORD_SCALE))
+        title_refs.append(ref(title) + 1 if title is not None else 0)
+        emoji_refs.append(ref(emoji) + 1 if emoji is not None else 0)
+        m = _ID_NUMBER.match(store_id)
+        if m:
+            id_refs.append(ref(m.group(1)) * 2 + 1)
+            _put_varint(numbers, int(m.group(2)))
+        else:
+            id_refs.append(ref(store_id) * 2)
+
+    out = bytearray(MAGIC)
+    out.append(FORMAT_VERSION)
+    out.append(0)
+    _put_varint(out, len(strings))
+    for s in strings:
+        data = s.encode("utf-8")
+        _put_varint(out, len(data))
+        out += data
+    _put_varint(out, len(lons))
+    out += _pack("i", lons)
+    out += _pack("i", lats)
+    wide = max(title_refs + emoji_refs + id_refs, default=0) > 0xFFFF
+    typecode = "I" if wide else "H"
+    out.append(4 if wide else 2)
+    for refs in (title_refs, emoji_refs, id_refs):
+        out += _pack(typecode, refs)
+    out += numbers
+    return bytes(out)
+
+
+def decode_stores(buf) -> list:
+    """二進位 → RestaurantPoint 列表（與原 JSON 內容相同；無 title / emoji 時該欄為 None）"""
+    buf = memoryview(buf)
+    if bytes(buf[:4]) != MAGIC:
+        raise ValueError("不是門市二進位檔（magic 不符）")
+    version = buf[4]
+    if version != FORMAT_VERSION:
+        raise ValueError(f"不支援的門市二進位版本 {version}")
+    pos = 6
+    n_strings, pos = _get_varint(buf, pos)
+    strings = []
+    for _ in range(n_strings):
+        length, pos = _get_varint(buf, pos)
+        strings.append(str(buf[pos:pos + length], "utf-8"))
+        pos += length
+    n, pos = _get_varint(buf, pos)
+    lons, pos = _unpack("i", buf, pos, n)
+    lats, pos = _unpack("i", buf, pos, n)
+    typecode = "I" if buf[pos] == 4 else "H"
+    pos += 1
+    title_refs, pos = _unpack(typecode, buf, pos, n)
+    emoji_refs, pos = _unpack(typecode, buf, pos, n)
+    id_refs, pos = _unpack(typecode, buf, pos, n)
+
+    points = []
+    for lon, lat, title_ref, emoji_ref, id_ref in zip(lons, lats, title_refs, emoji_refs, id_refs):
+        if id_ref & 1:
+            number, pos = _get_varint(buf, pos)
+            store_id = f"{strings[id_ref >> 1]}{number}"
+        else:
+            store_id = strings[id_ref >> 1]
+        points.append({
+            "id": store_id,
+            "coord": [lon / COORD_SCALE, lat / COORD_SCALE],
+            "title": strings[title_ref - 1] if title_ref else None,
+            "emoji": strings[emoji_ref - 1] if emoji_ref else None,
+        })
+    return points
+
+
+def write_store_binary(path, points):
+    """寫出二進位檔（先寫暫存檔再 rename）"""
+    _write_atomic(path, encode_stores(points))
+
+
+def write_store_binary_rows(path, rows):
+    """同 write_store_binary，輸入為 encode_rows 的 (id, lon, lat, title, emoji) 列"""
+    _write_atomic(path, encode_rows(rows))
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def read_store_binary(path) -> list:
+    with open(path, "rb") as f:
+        return decode_stores(f.read())
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("用法: python3 scripts/store_binary.py <RestaurantPoint[] JSON> [...]")
+        sys.exit(1)
+    for json_path in sys.argv[1:]:
+        with open(json_path, "rb") as f:
+            raw = f.read()
+        t0 = time.perf_counter()
+        points = json.loads(raw.decode("utf-8"))
+        t_json = time.perf_counter() - t0
+
+        bin_path = binary_path_for(json_path)
+        write_store_binary(bin_path, points)
+        with open(bin_path, "rb") as f:
+            data = f.read()
+        t0 = time.perf_counter()
+        decoded = decode_stores(data)
+        t_bin = time.perf_counter() - t0
+
+        ok = decoded == points
+        print(f"{json_path}: {len(points)} 筆，來回轉換{'一致' if ok else '不一致！'}")
+        print(f"  JSON {len(raw) / 1024:.0f} KB，解析 {t_json * 1000:.1f} ms")
+        print(f"  BIN  {len(data) / 1024:.0f} KB，解析 {t_bin * 1000:.1f} ms → {bin_path}")
+        if not ok:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
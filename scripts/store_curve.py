@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+門市輸出依空間填充曲線（Hilbert / Z-order）排序，並產生 key 範圍索引，讓範圍查詢只讀連續的一段。
+
+原本輸出順序沿用來源（綠界依品牌與門市代碼、Overpass 依元素種類），相鄰的門市散落在整份檔案；
+依曲線 key 排序後，地理上相近的門市在檔案中也相近，bbox 查詢可先二分搜尋到少數幾段連續紀錄再精確過濾。
+
+- 座標以輸出的 coord（6 位小數定點整數）映射到全球 2^order × 2^order 格，key 與資料範圍無關，
+  不同次產生的檔案可直接比較；order 預設 20（約 38m × 17m 一格），key 最多 2 × order 位元（≤ 52，JS 可精確表示）
+- 同 key 維持原輸出順序（穩定排序），結果只取決於輸入
+- bbox → key 範圍：由粗到細拆四分樹，完全落在 bbox 內的格整段收錄，範圍數上限 MAX_QUERY_RANGES（只會多掃、不會漏）
+
+索引（預設 assets/data/<輸出檔名>.index.json，緊湊 JSON）：
+  {"version", "curve", "order", "block_size", "source", "source_sha256", "count",
+   "blocks": [[起始序號, 第一筆 key, 最後一筆 key], ...]}
+  每 block_size 筆一個區塊；JSON 與 .bin 的紀錄順序相同，兩者共用同一份索引。
+  source_sha256 為輸出 JSON 的雜湊；與檔案不符時索引已過期。
+
+查詢: python3 scripts/store_curve.py [assets/data/merged_convenience_stores.json] --bbox 121.5 25.0 121.6 25.1
+      python3 scripts/store_curve.py --check 1000   # 另以隨機 bbox 與全檔掃描比對驗證
+依賴: 無（numpy 為選用，與 store_geo.py 相同）
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+from bisect import bisect_left, bisect_right
+
+from store_geo import np
+from store_io import write_json_atomic
+from store_set import COORD_DECIMALS
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".index.json"
+CURVES = ("hilbert", "z")
+DEFAULT_CURVE = "hilbert"
+# 每軸 2^order 格；上限 26 使 key ≤ 52 位元
+DEFAULT_ORDER = 20
+MAX_ORDER = 26
+# 索引每區塊的紀錄數
+DEFAULT_BLOCK_SIZE = 128
+# 一次 bbox 查詢最多拆成的 key 範圍數
+MAX_QUERY_RANGES = 64
+COORD_SCALE = 1_000_000
+# 點數達此值才改走 numpy
+VECTORIZE_MIN_POINTS = 256
+
+
+def index_path_for(json_path):
+    """assets/data/x.json → assets/data/x.index.json"""
+    return os.path.splitext(json_path)[0] + INDEX_SUFFIX
+
+
+def grid_xy(lon, lat, order=DEFAULT_ORDER):
+    """coord（lon, lat）→ 全球格座標 (x, y)，0 ≤ x, y < 2^order；以 6 位小數定點整數計算"""
+    n = 1 << order
+    x = (round(lon * COORD_SCALE) + 180 * COORD_SCALE) * n // (360 * COORD_SCALE)
+    y = (round(lat * COORD_SCALE) + 90 * COORD_SCALE) * n // (180 * COORD_SCALE)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+# 查表一次處理的位元數（每軸）
+_CHUNK_BITS = 4
+_CHUNK_MASK = (1 << _CHUNK_BITS) - 1
+
+
+def _hilbert_table(bits=_CHUNK_BITS):
+    """
+    Hilbert 狀態機查表：[狀態, x 的 bits 位, y 的 bits 位] → (2 × bits 位序號 << 2) | 下一狀態。
+    狀態 bit 0 = 對調 x / y、bit 1 = x / y 取補數（兩者可交換，累積時以 XOR 合成）。
+    """
+    table = []
+    for state in range(4):
+        for cx in range(1 << bits):
+            for cy in range(1 << bits):
+                s, d = state, 0
+                for b in range(bits - 1, -1, -1):
+                    rx, ry = cx >> b & 1, cy >> b & 1
+                    if s & 2:
+                        rx, ry = rx ^ 1, ry ^ 1
+                    if s & 1:
+                        rx, ry = ry, rx
+                    d = d << 2 | ((3 * rx) ^ ry)
+                    if not ry:
+                        s ^= 3 if rx else 1
+                table.append(d << 2 | s)
+    return table
+
+
+def _spread_table(bits=_CHUNK_BITS):
+    """v 的各位元間隔一位展開（Morton 交錯用）"""
+    return [sum((v >> b & 1) << (2 * b) for b in range(bits)) for v in range(1 << bits)]
+
+
+_HILBERT = _hilbert_table()
+_SPREAD = _spread_table()
+
+
+def _chunks(order):
+    """(由高到低的位移量, 起始狀態)；order 不是 _CHUNK_BITS 倍數時最高位補 0，補的每一層會對調一次 x / y"""
+    n_chunks = -(-order // _CHUNK_BITS)
+    return range((n_chunks - 1) * _CHUNK_BITS, -1, -_CHUNK_BITS), (n_chunks * _CHUNK_BITS - order) & 1
+
+
+def hilbert_index(x, y, order=DEFAULT_ORDER):
+    """格座標 → Hilbert 曲線上的序號"""
+    shifts, state = _chunks(order)
+    table = _HILBERT
+    d = 0
+    for shift in shifts:
+        v = table[state << 2 * _CHUNK_BITS | (x >> shift & _CHUNK_MASK) << _CHUNK_BITS | (y >> shift & _CHUNK_MASK)]
+        d = d << 2 * _CHUNK_BITS | v >> 2
+        state = v & 3
+    return d
+
+
+def morton_index(x, y, order=DEFAULT_ORDER):
+    """格座標 → Z-order（Morton）序號：x 佔偶數位元、y 佔奇數位元"""
+    shifts, _ = _chunks(order)
+    spread = _SPREAD
+    d = 0
+    for shift in shifts:
+        d = d << 2 * _CHUNK_BITS | spread[x >> shift & _CHUNK_MASK] | spread[y >> shift & _CHUNK_MASK] << 1
+    return d
+
+
+_INDEX_FUNCS = {"hilbert": hilbert_index, "z": morton_index}
+
+
+def curve_key(lon, lat, curve=DEFAULT_CURVE, order=DEFAULT_ORDER):
+    """coord → 曲線 key"""
+    x, y = grid_xy(lon, lat, order)
+    return _INDEX_FUNCS[curve](x, y, order)
+
+
+def _curve_keys_numpy(lons, lats, curve, order):
+    n = 1 << order
+    x = (np.rint(np.asarray(lons, dtype=np.float64) * COORD_SCALE).astype(np.int64) + 180 * COORD_SCALE) * n
+    y = (np.rint(np.asarray(lats, dtype=np.float64) * COORD_SCALE).astype(np.int64) + 90 * COORD_SCALE) * n
+    x = np.clip(x // (360 * COORD_SCALE), 0, n - 1)
+    y = np.clip(y // (180 * COORD_SCALE), 0, n - 1)
+    shifts, state = _chunks(order)
+    d = np.zeros(len(x), dtype=np.int64)
+    if curve == "z":
+        spread = np.array(_SPREAD, dtype=np.int64)
+        for shift in shifts:
+            d = d << 2 * _CHUNK_BITS | spread[x >> shift & _CHUNK_MASK] | spread[y >> shift & _CHUNK_MASK] << 1
+        return d.tolist()
+    table = np.array(_HILBERT, dtype=np.int64)
+    state = np.full(len(x), state, dtype=np.int64)
+    for shift in shifts:
+        v = table[state << 2 * _CHUNK_BITS | (x >> shift & _CHUNK_MASK) << _CHUNK_BITS | (y >> shift & _CHUNK_MASK)]
+        d = d << 2 * _CHUNK_BITS | v >> 2
+        state = v & 3
+    return d.tolist()
+
+
+def curve_keys(lons, lats, curve=DEFAULT_CURVE, order=DEFAULT_ORDER):
+    """平行的 coord 序列 → key 列表（有 numpy 且點數夠多時向量化，結果相同）"""
+    if curve not in _INDEX_FUNCS:
+        raise ValueError(f"未知的曲線 {curve!r}（可用: {', '.join(CURVES)}）")
+    if not 1 <= order <= MAX_ORDER:
+        raise ValueError(f"order 需介於 1 ~ {MAX_ORDER}")
+    if np is not None and len(lons) >= VECTORIZE_MIN_POINTS:
+        return _curve_keys_numpy(lons, lats, curve, order)
+    index_of = _INDEX_FUNCS[curve]
+    n = 1 << order
+    lon0, lon_span = 180 * COORD_SCALE, 360 * COORD_SCALE
+    lat0, lat_span = 90 * COORD_SCALE, 180 * COORD_SCALE
+    keys = []
+    for lon, lat in zip(lons, lats):
+        x = (round(lon * COORD_SCALE) + lon0) * n // lon_span
+        y = (round(lat * COORD_SCALE) + lat0) * n // lat_span
+        keys.append(index_of(min(max(x, 0), n - 1), min(max(y, 0), n - 1), order))
+    return keys
+
+
+def sort_stores(stores, curve=DEFAULT_CURVE, order=DEFAULT_ORDER):
+    """StoreSet 的保留列依曲線 key 穩定排序（就地重排），回傳排序後每列的 key"""
+    rows = list(stores.kept())
+    all_lons, all_lats = stores.lons, stores.lats
+    # key 以輸出的 coord（6 位小數）計算，讀檔端由 coord 重算會得到同一個 key
+    keys = curve_keys(
+        [round(all_lons[i], COORD_DECIMALS) for i in rows], [round(all_lats[i], COORD_DECIMALS) for i in rows],
+        curve, order,
+    )
+    perm = sorted(range(len(rows)), key=keys.__getitem__)
+    stores.reorder([rows[p] for p in perm])
+    return [keys[p] for p in perm]
+
+
+def bbox_ranges(bbox, curve=DEFAULT_CURVE, order=DEFAULT_ORDER, max_ranges=MAX_QUERY_RANGES):
+    """
+    bbox [minLon, minLat, maxLon, maxLat] → 涵蓋它的 key 範圍 [(lo, hi), ...]（含兩端、遞增、不相鄰）。
+    四分樹的對齊格在曲線上是連續一段；由粗到細拆開與 bbox 部分相交的格，超過 max_ranges 時整格收錄。
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    x0, y0 = grid_xy(min_lon, min_lat, order)
+    x1, y1 = grid_xy(max_lon, max_lat, order)
+    index_of = _INDEX_FUNCS[curve]
+
+    def span(cx, cy, level):
+        start = index_of(cx << level, cy << level, order) >> (2 * level) << (2 * level)
+        return start, start + (1 << (2 * level)) - 1
+
+    ranges = []
+    cells = [(0, 0, order)]
+    while cells:
+        partial = []
+        for cx, cy, level in cells:
+            lx, ly = cx << level, cy << level
+            hx, hy = lx + (1 << level) - 1, ly + (1 << level) - 1
+            if hx < x0 or lx > x1 or hy < y0 or ly > y1:
+                continue
+            if level == 0 or (x0 <= lx and hx <= x1 and y0 <= ly and hy <= y1):
+                ranges.append(span(cx, cy, level))
+            else:
+                partial.append((cx, cy, level))
+        if len(ranges) + 4 * len(partial) > max_ranges:
+            ranges.extend(span(*c) for c in partial)
+            break
+        cells = [
+            (cx * 2 + dx, cy * 2 + dy, level - 1)
+            for cx, cy, level in partial for dx in (0, 1) for dy in (0, 1)
+        ]
+
+    merged = []
+    for lo, hi in sorted(ranges):
+        if merged and lo <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+def build_index(keys, curve=DEFAULT_CURVE, order=DEFAULT_ORDER, block_size=DEFAULT_BLOCK_SIZE):
+    """已排序的 key 列表 → 索引 dict（不含 source / source_sha256）"""
+    blocks = [
+        [start, keys[start], keys[min(start + block_size, len(keys)) - 1]]
+        for start in range(0, len(keys), block_size)
+    ]
+    return {
+        "version": INDEX_VERSION,
+        "curve": curve,
+        "order": order,
+        "block_size": block_size,
+        "count": len(keys),
+        "blocks": blocks,
+    }
+
+
+def _file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def write_index(json_path, keys, curve=DEFAULT_CURVE, order=DEFAULT_ORDER, block_size=DEFAULT_BLOCK_SIZE):
+    """為已寫出的排序後 JSON 寫出索引（記錄其 sha256），回傳索引路徑"""
+    index = build_index(keys, curve, order, block_size)
+    index["source"] = os.path.basename(json_path)
+    index["source_sha256"] = _file_sha256(json_path)
+    path = index_path_for(json_path)
+    write_json_atomic(path, index, separators=(",", ":"))
+    return path
+
+
+def remove_index(json_path):
+    """輸出改為未排序時刪除舊索引，避免留下過期檔案"""
+    path = index_path_for(json_path)
+    if os.path.isfile(path):
+        os.remove(path)
+
+
+def load_index(json_path):
+    with open(index_path_for(json_path), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def query_slices(index, bbox, max_ranges=MAX_QUERY_RANGES):
+    """bbox 可能包含的紀錄區段 [(start, stop), ...]（序號，不含 stop）；區段外的紀錄一定不在 bbox 內"""
+    blocks = index["blocks"]
+    starts = [b[0] for b in blocks] + [index["count"]]
+    firsts = [b[1] for b in blocks]
+    lasts = [b[2] for b in blocks]
+    slices = []
+    for lo, hi in bbox_ranges(bbox, index["curve"], index["order"], max_ranges):
+        b0 = bisect_left(lasts, lo)
+        b1 = bisect_right(firsts, hi)
+        if b0 >= b1:
+            continue
+        start, stop = starts[b0], starts[b1]
+        if slices and start <= slices[-1][1]:
+            slices[-1] = (slices[-1][0], max(slices[-1][1], stop))
+        else:
+            slices.append((start, stop))
+    return slices
+
+
+def in_bbox(p, bbox):
+    lon, lat = p["coord"]
+    return bbox[0] <= lon <= bbox[2] and bbox[1] <= lat <= bbox[3]
+
+
+def query_bbox(points, index, bbox):
+    """以索引查詢 bbox 內的門市；回傳 (門市列表, 掃描筆數)"""
+    found = []
+    scanned = 0
+    for start, stop in query_slices(index, bbox):
+        scanned += stop - start
+        found.extend(p for p in points[start:stop] if in_bbox(p, bbox))
+    return found, scanned
+
+
+def _check(points, index, samples, seed=0):
+    """隨機 bbox 與全檔掃描比對；回傳 (不一致次數, 平均掃描比例)"""
+    rng = random.Random(seed)
+    mismatched = 0
+    ratio = 0.0
+    for _ in range(samples):
+        lon, lat = rng.choice(points)["coord"]
+        w, h = rng.uniform(0.001, 0.2), rng.uniform(0.001, 0.2)
+        bbox = [lon - rng.uniform(0, w), lat - rng.uniform(0, h), lon + rng.uniform(0, w), lat + rng.uniform(0, h)]
+        found, scanned = query_bbox(points, index, bbox)
+        if found != [p for p in points if in_bbox(p, bbox)]:
+            mismatched += 1
+        ratio += scanned / len(points)
+    return mismatched, ratio / samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="以曲線 key 索引查詢 bbox 內的門市")
+    parser.add_argument("source", nargs="?", help="已排序的 RestaurantPoint[] JSON（預設 assets/data/merged_convenience_stores.json）")
+    parser.add_argument("--bbox", type=float, nargs=4, metavar=("MIN_LON", "MIN_LAT", "MAX_LON", "MAX_LAT"))
+    parser.add_argument("--check", type=int, default=0, metavar="N", help="以 N 個隨機 bbox 與全檔掃描比對驗證")
+    args = parser.parse_args(argv)
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    source = args.source or os.path.join(root, "assets", "data", "merged_convenience_stores.json")
+    if not os.path.isfile(index_path_for(source)):
+        print(f"找不到 {index_path_for(source)}，請以 merge_store_sources.py --sort hilbert 產生")
+        sys.exit(1)
+    index = load_index(source)
+    if index["source_sha256"] != _file_sha256(source):
+        print(f"{index_path_for(source)} 已過期（與 {os.path.basename(source)} 的 sha256 不符），請重新產生")
+        sys.exit(1)
+    with open(source, "r", encoding="utf-8") as f:
+        points = json.load(f)
+
+    print(
+        f"{len(points)} 筆，{index['curve']} order {index['order']}，"
+        f"{len(index['blocks'])} 個區塊（每塊 {index['block_size']} 筆）"
+    )
+    if args.bbox:
+        found, scanned = query_bbox(points, index, args.bbox)
+        print(f"bbox {args.bbox} → {len(found)} 筆（掃描 {scanned} 筆，{len(query_slices(index, args.bbox))} 段）")
+    if args.check and points:
+        mismatched, ratio = _check(points, index, args.check)
+        print(f"驗證 {args.check} 個隨機 bbox：{'全部一致' if not mismatched else f'{mismatched} 個不一致！'}，平均掃描全檔 {ratio:.2%}")
+        if mismatched:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+門市圖資共用的地理工具：距離計算、空間格網索引、距離合併、同格去重。
+供 overpass_to_restaurants.py / ecpay_store_list.py / merge_store_sources.py 共用。
+
+距離合併原本是「每一點對所有已保留點算 haversine」的 O(n²) 迴圈；
+改用經緯度格網分桶後，每一點只需比對鄰近格內的已保留點，近似線性時間，
+且保留「先出現者勝出」的語意，輸出與原本逐一比對完全相同。
+
+有安裝 numpy 時，批次距離（一對多、多對多分塊）與鄰近候選點多的距離判定走向量化；
+沒有則退回純 Python math，結果相同。
+"""
+
+import math
+
+try:
+    import numpy as np
+except ImportError:  # numpy 為選用依賴
+    np = None
+
+EARTH_RADIUS_M = 6371000
+# 兩點距離小於此值（米）視為同一家店，只保留一筆（調大一點可清掉「兩個座標」重疊）
+MERGE_RADIUS_M = 30
+# 同一格（小數第5位相同，約 1.1m）只留一筆，確保不會有兩個幾乎同位置的點
+GRID_DECIMALS = 5
+# 多對多距離矩陣每塊的列數（控制暫存記憶體）
+BLOCK_ROWS = 1024
+# 鄰近候選點數達此值才改走 numpy（太少時呼叫開銷比純 Python 還大）
+VECTORIZE_MIN_CANDIDATES = 32
+# 向量化結果與半徑差距在此範圍內時，改用 haversine_m 重算，確保與純 Python 判定一致
+_BOUNDARY_TOL_M = 1e-6
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """計算兩點距離（米）。"""
+    R = EARTH_RADIUS_M
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlam = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlam / 2) ** 2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return R * c
+
+
+def haversine_one_to_many(lat, lon, lats, lons):
+    """一點對多點距離（米）。有 numpy 時回傳 ndarray，否則回傳 list。"""
+    if np is None:
+        return [haversine_m(lat, lon, la, lo) for la, lo in zip(lats, lons)]
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    phi1 = math.radians(lat)
+    phi2 = np.radians(lats)
+    dphi = np.radians(lats - lat)
+    dlam = np.radians(lons - lon)
+    a = np.sin(dphi / 2) ** 2 + math.cos(phi1) * np.cos(phi2) * np.sin(dlam / 2) ** 2
+    return EARTH_RADIUS_M * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def iter_haversine_blocks(lats1, lons1, lats2, lons2, block_rows=BLOCK_ROWS):
+    """
+    多對多距離矩陣，按列分塊產生 (起始列, 距離矩陣)，避免一次配置 n×m 的大矩陣。
+    無 numpy 時每塊為 list of list。
+    """
+    n = len(lats1)
+    if np is None:
+        for start in range(0, n, block_rows):
+            rows = [
+                haversine_one_to_many(lats1[i], lons1[i], lats2, lons2)
+                for i in range(start, min(start + block_rows, n))
+            ]
+            yield start, rows
+        return
+    lats1 = np.asarray(lats1, dtype=np.float64)
+    lons1 = np.asarray(lons1, dtype=np.float64)
+    phi2 = np.radians(np.asarray(lats2, dtype=np.float64))[None, :]
+    lam2 = np.radians(np.asarray(lons2, dtype=np.float64))[None, :]
+    cos_phi2 = np.cos(phi2)
+    for start in range(0, n, block_rows):
+        phi1 = np.radians(lats1[start:start + block_rows])[:, None]
+        lam1 = np.radians(lons1[start:start + block_rows])[:, None]
+        a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * cos_phi2 * np.sin((lam2 - lam1) / 2) ** 2
+        yield start, EARTH_RADIUS_M * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def haversine_matrix(lats1, lons1, lats2, lons2, block_rows=BLOCK_ROWS):
+    """多對多距離矩陣（米），shape = (len(lats1), len(lats2))"""
+    blocks = [b for _, b in iter_haversine_blocks(lats1, lons1, lats2, lons2, block_rows)]
+    if np is None:
+        return [row for b in blocks for row in b]
+    if not blocks:
+        return np.zeros((0, len(lats2)))
+    return np.vstack(blocks)
+
+
+class SpatialGrid:
+    """
+    均勻經緯度格網：格邊長 = radius_m 對應的緯度度數。
+    查詢半徑內的點時只掃描鄰近格，再以 haversine_m 精確判定。
+    """
+
+    # 邊界用的浮點誤差餘裕（度），只會多掃、不會漏掃
+    _EPS_DEG = 1e-9
+
+    def __init__(self, radius_m):
+        self.radius_m = radius_m
+        self.cell_deg = math.degrees(radius_m / EARTH_RADIUS_M)
+        self._cells = {}
+
+    def _cell_of(self, lat, lon):
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    def _lon_span_deg(self, lat):
+        """
+        半徑內的點在經度上的最大差（度）。
+        haversine：sin²(d/2R) ≥ cosφ1·cosφ2·sin²(Δλ/2)，φ2 取 |φ1|+Δφ 的最壞情況。
+        """
+        dlat = self.radius_m / EARTH_RADIUS_M
+        phi = math.radians(abs(lat))
+        cos_prod = math.cos(phi) * math.cos(min(phi + dlat, math.pi / 2))
+        if cos_prod <= 0:
+            return 180.0
+        s = math.sin(dlat / 2) / math.sqrt(cos_prod)
+        if s >= 1:
+            return 180.0
+        return math.degrees(2 * math.asin(s))
+
+    def add(self, lat, lon, item=None):
+        self._cells.setdefault(self._cell_of(lat, lon), []).append((lat, lon, item))
+
+    def neighbours(self, lat, lon):
+        """回傳可能落在半徑內的 (lat, lon, item)（尚未做精確距離判定）"""
+        dlat = self.cell_deg + self._EPS_DEG
+        dlon = self._lon_span_deg(lat) + self._EPS_DEG
+        i0 = math.floor((lat - dlat) / self.cell_deg)
+        i1 = math.floor((lat + dlat) / self.cell_deg)
+        j0 = math.floor((lon - dlon) / self.cell_deg)
+        j1 = math.floor((lon + dlon) / self.cell_deg)
+        cells = self._cells
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                bucket = cells.get((i, j))
+                if bucket:
+                    yield from bucket
+
+    def any_within(self, lat, lon):
+        """是否已有點與 (lat, lon) 距離 < radius_m"""
+        candidates = list(self.neighbours(lat, lon))
+        if np is not None and len(candidates) >= VECTORIZE_MIN_CANDIDATES:
+            d = haversine_one_to_many(lat, lon, [c[0] for c in candidates], [c[1] for c in candidates])
+            if bool((d < self.radius_m - _BOUNDARY_TOL_M).any()):
+                return True
+            # 只有落在半徑邊界附近的候選點需要逐一精確重算
+            border = np.nonzero(np.abs(d - self.radius_m) <= _BOUNDARY_TOL_M)[0]
+            candidates = [candidates[i] for i in border]
+        for k_lat, k_lon, _ in candidates:
+            if haversine_m(lat, lon, k_lat, k_lon) < self.radius_m:
+                return True
+        return False
+
+
+def distance_merge(points, radius_m=MERGE_RADIUS_M, group_of=None):
+    """
+    距離合併：依輸入順序，與已保留點距離 < radius_m 的視為同一家店，只保留先出現者。
+    points 為含 "lat" / "lon" 的 dict 列表，回傳保留下來的原物件（順序不變）。
+    有 group_of(p)（例如品牌）時只和同一組的已保留點比較，不同組的相鄰點都保留。
+    """
+    grids = {}
+    kept = []
+    for p in points:
+        lat, lon = p["lat"], p["lon"]
+        g = group_of(p) if group_of is not None else None
+        grid = grids.get(g)
+        if grid is None:
+            grid = grids[g] = SpatialGrid(radius_m)
+        if grid.any_within(lat, lon):
+            continue
+        grid.add(lat, lon)
+        kept.append(p)
+    return kept
+
+
+def connected_neighbourhood(points, seeds, radius_m=MERGE_RADIUS_M):
+    """
+    回傳 points 中經由「距離 < radius_m」鏈結與 seeds（(lat, lon) 列表）相連的索引集合。
+    距離合併的結果只取決於同一連通區塊內的點（與其相對順序），增量更新時只需重算這些點。
+    不分組計算；分組合併時這是各組連通區塊的聯集，重算範圍只會偏大、結果不變。
+    """
+    grid = SpatialGrid(radius_m)
+    for i, p in enumerate(points):
+        grid.add(p["lat"], p["lon"], i)
+    found = set()
+    frontier = list(seeds)
+    while frontier:
+        lat, lon = frontier.pop()
+        for k_lat, k_lon, i in grid.neighbours(lat, lon):
+            if i not in found and haversine_m(lat, lon, k_lat, k_lon) < radius_m:
+                found.add(i)
+                frontier.append((k_lat, k_lon))
+    return found
+
+
+def cell_dedupe(points, decimals=GRID_DECIMALS, group_of=None):
+    """
+    同格去重：經緯度四捨五入到小數第 decimals 位後相同者，只保留先出現者。
+    有 group_of(p) 時只在同一組內去重（同 distance_merge）。
+    """
+    seen_cell = set()
+    out = []
+    for p in points:
+        g = group_of(p) if group_of is not None else None
+        cell = (g, round(p["lat"], decimals), round(p["lon"], decimals))
+        if cell in seen_cell:
+            continue
+        seen_cell.add(cell)
+        out.append(p)
+    return out
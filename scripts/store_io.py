@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+門市圖資的串流讀寫：不把整份 JSON 讀進記憶體。
+
+- iter_json_array：從檔案逐一產生頂層陣列（或頂層物件某個 key 的陣列，如 Overpass 的 "elements"）中的元素
+- JsonArrayWriter：逐筆寫出陣列，輸出與 json.dump(..., ensure_ascii=False, indent=2) 逐位元組相同
+- write_json_atomic：先寫暫存檔再 rename
+
+依賴: 無（Python 內建 json）
+"""
+
+import json
+import os
+import re
+
+READ_CHUNK = 1 << 16
+_WS = re.compile(r"\s*")
+# 合法 JSON 值之後只會接這些字元；遇到其他字元表示值（例如數字 0.6 的 "0."）被緩衝區截斷
+_VALUE_END = set(",]}: \t\r\n")
+
+
+class _Reader:
+    """以 raw_decode 在分塊緩衝區上逐個解析 JSON 值"""
+
+    def __init__(self, fp, chunk_size=READ_CHUNK):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        if self.pos > len(self.buf) // 2:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += chunk
+        return True
+
+    def peek(self):
+        """跳過空白，回傳下一個字元（檔尾回傳 ""）"""
+        while True:
+            self.pos = _WS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, ch):
+        got = self.peek()
+        if got != ch:
+            raise ValueError(f"JSON 格式錯誤：預期 {ch!r}，得到 {got!r}（位置 {self.pos}）")
+        self.pos += 1
+
+    def value(self):
+        """解析下一個完整的 JSON 值；值在緩衝區尾端或後接非分隔字元時多讀一塊，避免數字被截斷"""
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            if (end < len(self.buf) and self.buf[end] in _VALUE_END) or self.eof or not self._fill():
+                self.pos = end
+                return obj
+
+
+def iter_json_array(fp, key=None, chunk_size=READ_CHUNK):
+    """
+    逐一產生 JSON 陣列的元素。
+    key 為 None 時檔案本身須為陣列；否則檔案為物件，產生其 key 欄位陣列的元素（其餘欄位略過）。
+    """
+    r = _Reader(fp, chunk_size)
+    if key is not None:
+        r.expect("{")
+        while True:
+            if r.peek() == "}":
+                return
+            name = r.value()
+            r.expect(":")
+            if name == key:
+                break
+            r.value()
+            if r.peek() == ",":
+                r.pos += 1
+    r.expect("[")
+    if r.peek() == "]":
+        r.pos += 1
+        return
+    while True:
+        yield r.value()
+        ch = r.peek()
+        r.pos += 1
+        if ch == "]":
+            return
+        if ch != ",":
+            raise ValueError(f"JSON 格式錯誤：陣列元素後應為 ',' 或 ']'，得到 {ch!r}")
+
+
+class JsonArrayWriter:
+    """
+    串流寫出 JSON 陣列（先寫 path.tmp，close 時 rename 成 path）。
+    格式與 json.dump(items, f, ensure_ascii=False, indent=2) 相同。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.count = 0
+        self._f = open(self.tmp_path, "w", encoding="utf-8")
+        self._f.write("[")
+
+    def write(self, item):
+        text = json.dumps(item, ensure_ascii=False, indent=2)
+        self._f.write(",\n  " if self.count else "\n  ")
+        self._f.write(text.replace("\n", "\n  "))
+        self.count += 1
+
+    def close(self):
+        self._f.write("\n]" if self.count else "]")
+        self._f.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self._f.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def write_json_atomic(path, data, **dump_kwargs):
+    """先寫暫存檔再 rename，避免中斷時留下寫到一半的 JSON"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, **dump_kwargs)
+    os.replace(tmp_path, path)
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+跨來源門市比對（record linkage）：判斷綠界與 Overpass 兩份清單中哪些點是同一家店，合併成一筆。
+
+原本的合併是「兩份串接後，與已保留點距離 < 30m 者丟棄」：
+7-Eleven 隔壁的全家會被誤刪，同一家店兩邊座標差 35m 又會留下兩筆。這裡改為：
+
+1. 空間分塊：以 LINK_RADIUS_M 的格網（store_geo.SpatialGrid）只列出鄰近的候選配對，近似線性時間
+2. 配對評分：品牌（由 id 前綴 ecpay-{CvsType}- / 711- / osm-{品牌}- 判定）不同直接排除；
+   其餘以距離分數與店名相似度（正規化後單字 + 二字的 Dice 係數）加權，店名缺資訊時只看距離
+3. 分群：依分數由高到低以 union-find 合併，同一群每個來源最多一筆（各來源內部已先去重），
+   避免 A–B–C 鏈結把一整排店併成一家
+4. 屬性合併：id / 店名 / emoji 取來源優先序最高者（綠界，含門市代碼），
+   座標取 COORD_PRIORITY 最高者（Overpass，為實地標注；綠界座標由地址 Geocoding 而來）；
+   同來源以 id 排序，結果與配對的列舉順序無關
+
+依賴: 無
+"""
+
+import re
+import unicodedata
+
+from store_geo import SpatialGrid, haversine_m
+
+# 候選配對的最大距離（米）；超過視為不同店
+LINK_RADIUS_M = 80
+# 配對分數達此值才合併（0~1）；只有距離資訊時約等於 < 32m
+LINK_MIN_SCORE = 0.6
+# 有店名資訊時距離與店名的權重
+DISTANCE_WEIGHT = 0.5
+TITLE_WEIGHT = 0.5
+
+# id 前綴 → 品牌；綠界 UNIMART 與 Overpass 7-Eleven 為同一品牌（Overpass 前綴見 overpass_to_restaurants.OSM_BRANDS）
+BRAND_BY_PREFIX = {
+    "ecpay-UNIMART-": "711",
+    "ecpay-FAMI-": "family",
+    "ecpay-HILIFE-": "hilife",
+    "ecpay-OKMART-": "ok",
+    "711-": "711",
+    "osm-family-": "family",
+    "osm-hilife-": "hilife",
+    "osm-ok-": "ok",
+}
+# id 前綴 → 來源
+SOURCE_BY_PREFIX = {"ecpay-": "ecpay", "711-": "overpass", "osm-": "overpass"}
+# 屬性（id / 店名 / emoji）與座標各自的來源優先序，越前面越優先；未列出的來源排最後
+ATTR_PRIORITY = ("ecpay", "overpass")
+COORD_PRIORITY = ("overpass", "ecpay")
+
+# 正規化店名時移除的品牌字樣與通用字尾（已轉小寫、全形轉半形）
+_BRAND_WORDS = re.compile(
+    r"7-eleven|7-11|seven-eleven|統一超商|familymart|全家便利商店|全家|hi-life|萊爾富|ok-mart|okmart|ok超商"
+)
+_SUFFIX = re.compile(r"(門市|分店|店)$")
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def _by_prefix(table, record_id):
+    for prefix, value in table.items():
+        if record_id.startswith(prefix):
+            return value
+    return None
+
+
+def brand_of(record_id):
+    """由 id 前綴判定品牌；無法判定回傳 None（不以品牌排除）"""
+    return _by_prefix(BRAND_BY_PREFIX, record_id)
+
+
+def source_of(record_id):
+    """由 id 前綴判定來源；未知前綴以第一個 "-" 前的字串當來源"""
+    return _by_prefix(SOURCE_BY_PREFIX, record_id) or record_id.split("-", 1)[0]
+
+
+def normalize_title(title):
+    """店名正規化：全形轉半形、小寫、去掉品牌字樣、標點空白與「門市 / 店」字尾；剩下分店名本身"""
+    text = unicodedata.normalize("NFKC", title or "").lower().replace("臺", "台")
+    text = _BRAND_WORDS.sub("", text)
+    text = _NON_WORD.sub("", text)
+    return _SUFFIX.sub("", text)
+
+
+def _shingles(text):
+    """單字 + 相鄰二字；分店名多為 2~4 個字，只用二字時差一個字就完全不相似"""
+    return set(text) | {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def title_similarity(a, b):
+    """兩個已正規化店名的相似度（單字 + 二字 Dice 係數，0~1）；任一為空回傳 None（無資訊）"""
+    if not a or not b:
+        return None
+    if a == b:
+        return 1.0
+    ga, gb = _shingles(a), _shingles(b)
+    return 2 * len(ga & gb) / (len(ga) + len(gb))
+
+
+def pair_score(distance_m, similarity, radius_m=LINK_RADIUS_M):
+    """距離（米）與店名相似度（None = 無資訊）→ 配對分數 0~1"""
+    s_dist = max(0.0, 1.0 - distance_m / radius_m)
+    if similarity is None:
+        return s_dist
+    return DISTANCE_WEIGHT * s_dist + TITLE_WEIGHT * similarity
+
+
+class UnionFind:
+    """路徑壓縮 + 依大小合併；每群記錄成員的來源集合"""
+
+    def __init__(self, sources):
+        self.parent = list(range(len(sources)))
+        self.size = [1] * len(sources)
+        self.sources = [{s} for s in sources]
+
+    def find(self, i):
+        parent = self.parent
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    def union(self, i, j, exclusive_sources=True):
+        """合併 i、j 所在的群；exclusive_sources 時兩群來源重疊則不合併。回傳是否合併"""
+        ri, rj = self.find(i), self.find(j)
+        if ri == rj:
+            return False
+        if exclusive_sources and not self.sources[ri].isdisjoint(self.sources[rj]):
+            return False
+        if self.size[ri] < self.size[rj]:
+            ri, rj = rj, ri
+        self.parent[rj] = ri
+        self.size[ri] += self.size[rj]
+        self.sources[ri] |= self.sources[rj]
+        self.sources[rj] = None
+        return True
+
+
+def candidate_pairs(lats, lons, radius_m=LINK_RADIUS_M, stats=None):
+    """
+    以格網分塊列出距離 < radius_m 的配對，產生 (i, j, 距離)（i < j）。
+    lats / lons 為平行的座標序列（list、array 皆可）。
+    """
+    grid = SpatialGrid(radius_m)
+    for i, (lat, lon) in enumerate(zip(lats, lons)):
+        grid.add(lat, lon, i)
+    n = 0
+    for i, (lat, lon) in enumerate(zip(lats, lons)):
+        for k_lat, k_lon, j in grid.neighbours(lat, lon):
+            if j <= i:
+                continue
+            d = haversine_m(lat, lon, k_lat, k_lon)
+            if d < radius_m:
+                n += 1
+                yield i, j, d
+    if stats is not None:
+        stats["candidate_pairs"] = stats.get("candidate_pairs", 0) + n
+
+
+def link_columns(ids, titles, lats, lons, radius_m=LINK_RADIUS_M, min_score=LINK_MIN_SCORE, stats=None):
+    """
+    以平行欄位（id / 店名 / 緯度 / 經度）比對並分群，回傳每群的成員索引列表（群內與群間皆依輸入順序）。
+    stats 若給 dict，會累加 candidate_pairs / rejected_brand / below_score / rejected_source / linked。
+    """
+    stats = stats if stats is not None else {}
+    for key in ("rejected_brand", "below_score", "rejected_source", "linked"):
+        stats.setdefault(key, 0)
+    brands = [brand_of(i) for i in ids]
+    titles = [normalize_title(t) for t in titles]
+
+    scored = []
+    for i, j, d in candidate_pairs(lats, lons, radius_m, stats):
+        if brands[i] is not None and brands[j] is not None and brands[i] != brands[j]:
+            stats["rejected_brand"] += 1
+            continue
+        score = pair_score(d, title_similarity(titles[i], titles[j]), radius_m)
+        if score < min_score:
+            stats["below_score"] += 1
+            continue
+        scored.append((-score, i, j))
+    # 分數高者先合併；同分依索引，結果只取決於輸入
+    scored.sort()
+
+    uf = UnionFind([source_of(i) for i in ids])
+    for _, i, j in scored:
+        if uf.union(i, j):
+            stats["linked"] += 1
+        else:
+            stats["rejected_source"] += 1
+
+    groups = {}
+    for i in range(len(ids)):
+        groups.setdefault(uf.find(i), []).append(i)
+    return sorted(groups.values(), key=lambda members: members[0])
+
+
+def link_clusters(points, radius_m=LINK_RADIUS_M, min_score=LINK_MIN_SCORE, stats=None):
+    """同 link_columns，輸入為含 id / title / lat / lon 的 dict 列表"""
+    return link_columns(
+        [p.get("id", "") for p in points], [p.get("title") for p in points],
+        [p["lat"] for p in points], [p["lon"] for p in points], radius_m, min_score, stats,
+    )
+
+
+def _rank(priority, source):
+    return priority.index(source) if source in priority else len(priority)
+
+
+def representatives(ids, members):
+    """一群成員索引 → (取 id / 店名 / emoji 的索引, 取座標的索引)；同來源以 id 排序"""
+    by_attr = min(members, key=lambda i: (_rank(ATTR_PRIORITY, source_of(ids[i])), ids[i]))
+    by_coord = min(members, key=lambda i: (_rank(COORD_PRIORITY, source_of(ids[i])), ids[i]))
+    return by_attr, by_coord
+
+
+def merge_cluster(members):
+    """同一家店的多筆紀錄 → 一筆（id / title / emoji 依 ATTR_PRIORITY，座標依 COORD_PRIORITY）"""
+    if len(members) == 1:
+        return members[0]
+    a, c = representatives([p["id"] for p in members], range(len(members)))
+    by_attr, by_coord = members[a], members[c]
+    merged = dict(by_attr)
+    for key in ("coord", "lat", "lon"):
+        if key in by_coord:
+            merged[key] = by_coord[key]
+    merged["title"] = by_attr.get("title") or next((p["title"] for p in members if p.get("title")), "")
+    return merged
+
+
+def link_records(points, radius_m=LINK_RADIUS_M, min_score=LINK_MIN_SCORE, stats=None):
+    """
+    比對、分群並合併屬性，回傳合併後的列表（依每群第一筆在輸入中的位置排序）。
+    dict 版的參考實作；管線走欄式的 StoreSet.link，兩者結果相同（見 tests/test_store_set.py）。
+    """
+    clusters = link_clusters(points, radius_m, min_score, stats)
+    return [merge_cluster([points[i] for i in members]) for members in clusters]
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+門市圖資更新流程的增量執行器（類似 make）：只重跑輸入有變動的階段，兩條來源分支同時跑。
+
+    overpass_fetch ──→ overpass_convert ──┐
+                                           ├──→ merge
+    ecpay ─────────────────────────────────┘
+
+- 每個階段宣告輸入檔、輸出檔與依賴的階段；「配方」= 指令參數 + 腳本與其 import 的同目錄模組原始碼
+- 階段的輸入、配方雜湊（sha256）與上次成功時相同，且輸出檔都在、內容也沒被改過 → 略過
+- 上游重跑但輸出內容不變時，下游不會跟著重跑
+- 檔案雜湊依 (大小, mtime) 快取在狀態檔，沒變動的重跑只需 stat，幾乎瞬間完成
+- 沒有輸入檔的網路階段（Overpass、綠界）在輸出存在且未超過 --max-age 時略過；--force 可強制重跑
+- 互不依賴的階段以執行緒同時啟動子行程，輸出逐行加上 [階段] 前綴
+- 各腳本的輸出都是先寫暫存檔再 rename；階段失敗時不更新狀態，下次會重跑，其下游本次略過
+
+執行: python3 scripts/store_pipeline.py                   # 全部（需要時才跑）
+      python3 scripts/store_pipeline.py merge --tiles     # 只到 merge（含其上游），merge 另輸出 tile
+      python3 scripts/store_pipeline.py --sort hilbert    # merge 輸出依 Hilbert 曲線排序並輸出索引
+      python3 scripts/store_pipeline.py --bin             # 各階段另寫出 .bin（見 store_binary.py）
+      python3 scripts/store_pipeline.py --force ecpay     # 強制重跑綠界（及受影響的下游）
+      python3 scripts/store_pipeline.py --dry-run         # 只列出會跑哪些階段
+狀態檔: scripts/pipeline_state.json
+依賴: 無
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from store_binary import binary_path_for
+from store_curve import CURVES, index_path_for
+from store_io import write_json_atomic
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(SCRIPT_DIR)
+DATA_DIR = os.path.join(ROOT, "assets", "data")
+STATE_PATH = os.path.join(SCRIPT_DIR, "pipeline_state.json")
+STATE_VERSION = 1
+# 網路階段的輸出超過此秒數才重抓
+DEFAULT_MAX_AGE_S = 24 * 3600
+HASH_CHUNK = 1 << 20
+_IMPORT = re.compile(r"^\s*(?:from\s+(\w+)\s+import|import\s+(\w+))", re.M)
+
+
+class Stage:
+    def __init__(self, name, script, args=(), inputs=(), outputs=(), deps=(), network=False):
+        self.name = name
+        self.script = script
+        self.args = list(args)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.deps = list(deps)
+        # 沒有輸入檔、每次結果取決於遠端資料
+        self.network = network
+
+    def command(self):
+        return [sys.executable, "-u", os.path.join(SCRIPT_DIR, self.script), *self.args]
+
+
+def build_stages(tiles=False, incremental_ecpay=False, sort="input", binary=False):
+    """宣告各階段；路徑皆為絕對路徑"""
+    raw_overpass = os.path.join(SCRIPT_DIR, "taiwan_711_full.json")
+    overpass_json = os.path.join(DATA_DIR, "taiwan_711_restaurants.json")
+    ecpay_json = os.path.join(DATA_DIR, "ecpay_convenience_stores.json")
+    merged_json = os.path.join(DATA_DIR, "merged_convenience_stores.json")
+
+    bin_args = ["--bin"] if binary else []
+
+    def with_bin(path):
+        return [path, binary_path_for(path)] if binary else [path]
+
+    merge_args = (["--tiles"] if tiles else []) + bin_args
+    merge_outputs = with_bin(merged_json)
+    if tiles:
+        merge_outputs.append(os.path.join(DATA_DIR, "merged_tiles", "manifest.json"))
+    if sort != "input":
+        merge_args += ["--sort", sort]
+        merge_outputs.append(index_path_for(merged_json))
+    stages = [
+        Stage("overpass_fetch", "fetch_711_taiwan.py", outputs=[raw_overpass], network=True),
+        Stage("overpass_convert", "overpass_to_restaurants.py", args=bin_args, inputs=[raw_overpass],
+              outputs=with_bin(overpass_json), deps=["overpass_fetch"]),
+        Stage("ecpay", "ecpay_store_list.py", args=(["--incremental"] if incremental_ecpay else []) + bin_args,
+              outputs=with_bin(ecpay_json), network=True),
+        Stage("merge", "merge_store_sources.py", args=merge_args,
+              inputs=[ecpay_json, overpass_json], outputs=merge_outputs, deps=["overpass_convert", "ecpay"]),
+    ]
+    return {s.name: s for s in stages}
+
+
+def code_files(script, directory=SCRIPT_DIR):
+    """腳本與其（遞迴）import 的同目錄模組，依檔名排序"""
+    seen = set()
+    todo = [script]
+    while todo:
+        name = todo.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+            source = f.read()
+        for m in _IMPORT.finditer(source):
+            module = f"{m.group(1) or m.group(2)}.py"
+            if os.path.isfile(os.path.join(directory, module)):
+                todo.append(module)
+    return sorted(seen)
+
+
+class HashCache:
+    """檔案 sha256，依 (大小, mtime_ns) 快取；不存在的檔案為 None"""
+
+    def __init__(self, entries=None):
+        self.entries = dict(entries or {})
+        self._lock = threading.Lock()
+
+    def digest(self, path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        key = [st.st_size, st.st_mtime_ns]
+        name = _rel(path)
+        with self._lock:
+            cached = self.entries.get(name)
+        if cached and cached[:2] == key:
+            return cached[2]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with self._lock:
+            self.entries[name] = key + [digest]
+        return digest
+
+
+def _rel(path):
+    return os.path.relpath(path, ROOT)
+
+
+def recipe_hash(stage, hashes):
+    h = hashlib.sha256()
+    h.update("\0".join(stage.args).encode("utf-8"))
+    for name in code_files(stage.script):
+        h.update(f"\0{name}\0{hashes.digest(os.path.join(SCRIPT_DIR, name))}".encode("utf-8"))
+    return h.hexdigest()
+
+
+def fingerprint(stage, hashes):
+    return {
+        "recipe": recipe_hash(stage, hashes),
+        "inputs": {_rel(p): hashes.digest(p) for p in stage.inputs},
+    }
+
+
+def stale_reason(stage, record, hashes, forced, max_age_s, now=None):
+    """回傳需要重跑的原因；不需要則回傳 None"""
+    if forced:
+        return "--force"
+    if record is None:
+        return "沒有上次的紀錄"
+    for path in stage.outputs:
+        digest = hashes.digest(path)
+        if digest is None:
+            return f"缺少輸出 {_rel(path)}"
+        if record["outputs"].get(_rel(path)) != digest:
+            return f"輸出 {_rel(path)} 被改過"
+    current = fingerprint(stage, hashes)
+    if current["recipe"] != record["recipe"]:
+        return "腳本或參數有變動"
+    changed = [p for p, d in current["inputs"].items() if record["inputs"].get(p) != d]
+    if changed:
+        return f"輸入有變動：{', '.join(changed)}"
+    if stage.network and (now or time.time()) - record["finished_at"] > max_age_s:
+        return f"網路資料超過 {max_age_s / 3600:g} 小時"
+    return None
+
+
+def load_state(path=STATE_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {"version": STATE_VERSION, "stages": {}, "hashes": {}}
+    if state.get("version") != STATE_VERSION:
+        return {"version": STATE_VERSION, "stages": {}, "hashes": {}}
+    return state
+
+
+def select_stages(stages, targets):
+    """目標階段及其所有上游，依宣告順序"""
+    if not targets:
+        return list(stages)
+    needed = set()
+    todo = list(targets)
+    while todo:
+        name = todo.pop()
+        if name not in needed:
+            needed.add(name)
+            todo.extend(stages[name].deps)
+    return [name for name in stages if name in needed]
+
+
+_print_lock = threading.Lock()
+
+
+def _log(name, text):
+    with _print_lock:
+        print(f"[{name}] {text}", flush=True)
+
+
+def run_stage(stage):
+    """執行階段的子行程並逐行轉印輸出；回傳 (結束碼, 秒數)"""
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(stage.command(), cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            text=True, encoding="utf-8", errors="replace")
+    for line in proc.stdout:
+        _log(stage.name, line.rstrip("\n"))
+    return proc.wait(), time.perf_counter() - t0
+
+
+class Pipeline:
+    def __init__(self, stages, state_path=STATE_PATH, max_age_s=DEFAULT_MAX_AGE_S):
+        self.stages = stages
+        self.state_path = state_path
+        self.state = load_state(state_path)
+        self.hashes = HashCache(self.state.get("hashes"))
+        self.max_age_s = max_age_s
+        self._state_lock = threading.Lock()
+
+    def _save(self):
+        self.state["hashes"] = self.hashes.entries
+        write_json_atomic(self.state_path, self.state, indent=2)
+
+    def _record(self, stage, seconds):
+        record = fingerprint(stage, self.hashes)
+        record["outputs"] = {_rel(p): self.hashes.digest(p) for p in stage.outputs}
+        record["finished_at"] = time.time()
+        record["seconds"] = round(seconds, 3)
+        with self._state_lock:
+            self.state["stages"][stage.name] = record
+            self._save()
+
+    def plan(self, names, forced=()):
+        """不執行，依目前狀態列出每個階段的原因（上游會重跑的階段標為「上游可能變動」）"""
+        reasons = {}
+        for name in names:
+            stage = self.stages[name]
+            reason = stale_reason(stage, self.state["stages"].get(name), self.hashes,
+                                  name in forced or "all" in forced, self.max_age_s)
+            if reason is None and any(reasons.get(d) for d in stage.deps):
+                reason = "上游可能變動"
+            reasons[name] = reason
+        return reasons
+
+    def run(self, names, forced=(), jobs=None):
+        """
+        依相依關係執行；回傳 {階段: "ran" | "skipped" | "failed" | "blocked"}。
+        階段在上游全部完成後才判斷是否過期（上游輸出不變時可略過）。
+        """
+        status = {}
+        pending = list(names)
+        running = {}
+        with ThreadPoolExecutor(max_workers=jobs or len(names) or 1) as executor:
+            while pending or running:
+                for name in list(pending):
+                    stage = self.stages[name]
+                    deps = [d for d in stage.deps if d in names]
+                    if any(status.get(d) in ("failed", "blocked") for d in deps):
+                        status[name] = "blocked"
+                        pending.remove(name)
+                        _log(name, "上游失敗，略過")
+                        continue
+                    if not all(status.get(d) in ("ran", "skipped") for d in deps):
+                        continue
+                    pending.remove(name)
+                    reason = stale_reason(stage, self.state["stages"].get(name), self.hashes,
+                                          name in forced or "all" in forced, self.max_age_s)
+                    if reason is None:
+                        status[name] = "skipped"
+                        _log(name, "未變動，略過")
+                        continue
+                    _log(name, f"執行（{reason}）")
+                    running[executor.submit(run_stage, stage)] = name
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    code, seconds = future.result()
+                    if code == 0:
+                        self._record(self.stages[name], seconds)
+                        status[name] = "ran"
+                        _log(name, f"完成（{seconds:.1f} 秒）")
+                    else:
+                        status[name] = "failed"
+                        _log(name, f"失敗（結束碼 {code}）")
+        with self._state_lock:
+            self._save()
+        return status
+
+
+def main(argv=None):
+    stage_names = list(build_stages())
+    parser = argparse.ArgumentParser(description="門市圖資增量更新流程")
+    parser.add_argument("targets", nargs="*", metavar="STAGE",
+                        help=f"只跑到這些階段（含上游）：{', '.join(stage_names)}；預設全部")
+    parser.add_argument("--force", nargs="+", default=[], metavar="STAGE", help="強制重跑（all = 全部）")
+    parser.add_argument("--dry-run", action="store_true", help="只列出會跑的階段")
+    parser.add_argument("--jobs", type=int, default=None, help="同時執行的階段數上限")
+    parser.add_argument("--max-age", type=float, default=DEFAULT_MAX_AGE_S / 3600,
+                        help="網路階段的輸出超過幾小時才重抓（預設 24）")
+    parser.add_argument("--tiles", action="store_true", help="merge 另輸出 tile（assets/data/merged_tiles/）")
+    parser.add_argument("--incremental", action="store_true", help="綠界以 --incremental 執行")
+    parser.add_argument("--sort", choices=("input",) + CURVES, default="input",
+                        help="merge 輸出順序：input（預設）或 hilbert / z 曲線（另輸出索引）")
+    parser.add_argument("--bin", action="store_true", help="各階段另寫出同內容的 .bin（見 store_binary.py）")
+    args = parser.parse_args(argv)
+    unknown = [f for f in args.targets + args.force if f != "all" and f not in stage_names]
+    if unknown:
+        parser.error(f"未知的階段: {', '.join(unknown)}")
+
+    stages = build_stages(tiles=args.tiles, incremental_ecpay=args.incremental, sort=args.sort, binary=args.bin)
+    pipeline = Pipeline(stages, max_age_s=args.max_age * 3600)
+    names = select_stages(stages, args.targets)
+    t0 = time.perf_counter()
+    if args.dry_run:
+        for name, reason in pipeline.plan(names, set(args.force)).items():
+            print(f"{name}: {'執行（' + reason + '）' if reason else '略過'}")
+        return
+    status = pipeline.run(names, set(args.force), args.jobs)
+    counts = {key: sum(1 for v in status.values() if v == key) for key in ("ran", "skipped", "failed", "blocked")}
+    print(
+        f"執行 {counts['ran']}、略過 {counts['skipped']}、失敗 {counts['failed']}、未執行 {counts['blocked']}，"
+        f"耗時 {time.perf_counter() - t0:.2f} 秒"
+    )
+    if counts["failed"] or counts["blocked"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
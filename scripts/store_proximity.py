@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+離線預先計算「H3 格 → 20m 內門市」對照表，讓 App 每次 GPS 更新只需查表，
+不必對全部門市算距離（NEAR_RESTAURANT_RADIUS_M，見 src/config/restaurants.ts）。
+
+- 解析度與 App 相同（H3_RESOLUTION = 11，見 src/core/math/h3.ts）
+- 一格收錄「格內任一點到門市距離 <= 半徑」的所有門市，查表結果是候選集合：
+  App 端仍以實際位置對這幾筆候選算一次距離即可得到精確判定
+- 每間門市從所在格往外擴張，只要鄰格與門市距離仍在半徑內就收錄（格與圓相交必連通）
+- 依門市分塊，以多行程平行計算
+
+輸出（預設 assets/data/<來源檔名>.proximity.json，緊湊 JSON）：
+  {"version", "resolution", "radius_m", "source", "source_sha256", "count",
+   "cells": {H3 index: [門市在來源 JSON 中的序號, ...]}}
+  source_sha256 為來源 JSON 的雜湊；來源更新後需重新產生。
+
+執行: python3 scripts/store_proximity.py [assets/data/merged_convenience_stores.json]
+      python3 scripts/store_proximity.py --check 2000   # 另以隨機點與逐一比對驗證
+依賴: h3（pip install h3，4.x）
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from store_geo import EARTH_RADIUS_M, haversine_m
+from store_io import write_json_atomic
+
+try:
+    import h3
+except ImportError:  # h3 只有這支腳本需要
+    h3 = None
+
+TABLE_VERSION = 1
+# 與 src/core/math/h3.ts 的 H3_RESOLUTION 一致
+H3_RESOLUTION = 11
+# 與 src/config/restaurants.ts 的 NEAR_RESTAURANT_RADIUS_M 一致
+NEAR_RESTAURANT_RADIUS_M = 20
+PROXIMITY_SUFFIX = ".proximity.json"
+# 每個工作行程一次處理的門市數
+CHUNK_SIZE = 2000
+# 平面近似的誤差容許（米），寧可多收一格也不漏
+_EDGE_TOL_M = 0.01
+
+_M_PER_DEG = math.pi * EARTH_RADIUS_M / 180
+
+
+def proximity_path_for(json_path):
+    """assets/data/x.json → assets/data/x.proximity.json"""
+    return os.path.splitext(json_path)[0] + PROXIMITY_SUFFIX
+
+
+def _cell_distance_m(cell, lat, lon):
+    """(lat, lon) 到 H3 格（多邊形）的最短距離（米）；點在格內為 0。以點為中心的平面近似，適用數十米尺度。"""
+    kx = _M_PER_DEG * math.cos(math.radians(lat))
+    pts = [((v_lon - lon) * kx, (v_lat - lat) * _M_PER_DEG) for v_lat, v_lon in h3.cell_to_boundary(cell)]
+    inside = False
+    best = math.inf
+    for (x1, y1), (x2, y2) in zip(pts, pts[1:] + pts[:1]):
+        if (y1 > 0) != (y2 > 0) and 0 < x1 + (0 - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+        dx, dy = x2 - x1, y2 - y1
+        seg = dx * dx + dy * dy
+        t = 0.0 if seg == 0 else max(0.0, min(1.0, -(x1 * dx + y1 * dy) / seg))
+        best = min(best, math.hypot(x1 + t * dx, y1 + t * dy))
+    return 0.0 if inside else best
+
+
+def cells_near(lat, lon, radius_m=NEAR_RESTAURANT_RADIUS_M, resolution=H3_RESOLUTION):
+    """與以 (lat, lon) 為圓心、radius_m 為半徑的圓相交的所有 H3 格"""
+    start = h3.latlng_to_cell(lat, lon, resolution)
+    found = {start}
+    frontier = [start]
+    seen = {start}
+    while frontier:
+        nxt = []
+        for cell in frontier:
+            for nb in h3.grid_disk(cell, 1):
+                if nb in seen:
+                    continue
+                seen.add(nb)
+                if _cell_distance_m(nb, lat, lon) <= radius_m + _EDGE_TOL_M:
+                    found.add(nb)
+                    nxt.append(nb)
+        frontier = nxt
+    return found
+
+
+def _chunk_pairs(args):
+    """工作行程：一批門市 → [(cell, 門市序號)]"""
+    start, coords, radius_m, resolution = args
+    pairs = []
+    for offset, (lon, lat) in enumerate(coords):
+        for cell in cells_near(lat, lon, radius_m, resolution):
+            pairs.append((cell, start + offset))
+    return pairs
+
+
+def build_table(points, radius_m=NEAR_RESTAURANT_RADIUS_M, resolution=H3_RESOLUTION, workers=None):
+    """RestaurantPoint 列表 → {cell: [門市序號遞增]}（cell 依字典序）"""
+    tasks = [
+        (start, [tuple(p["coord"]) for p in points[start:start + CHUNK_SIZE]], radius_m, resolution)
+        for start in range(0, len(points), CHUNK_SIZE)
+    ]
+    if workers == 1 or len(tasks) <= 1:
+        results = [_chunk_pairs(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_chunk_pairs, tasks))
+    cells = {}
+    for pairs in results:
+        for cell, idx in pairs:
+            cells.setdefault(cell, []).append(idx)
+    return {cell: sorted(cells[cell]) for cell in sorted(cells)}
+
+
+def lookup(table, lat, lon):
+    """查表：回傳 (lat, lon) 所在格的候選門市序號"""
+    return table["cells"].get(h3.latlng_to_cell(lat, lon, table["resolution"]), [])
+
+
+def _check(table, points, samples, seed=0):
+    """隨機取門市附近的點，確認半徑內的門市都在查表結果中；回傳漏掉的次數"""
+    rng = random.Random(seed)
+    radius_m = table["radius_m"]
+    dlat = math.degrees(radius_m * 2 / EARTH_RADIUS_M)
+    missed = 0
+    for _ in range(samples):
+        lon, lat = rng.choice(points)["coord"]
+        lat += rng.uniform(-dlat, dlat)
+        lon += rng.uniform(-dlat, dlat) / math.cos(math.radians(lat))
+        candidates = set(lookup(table, lat, lon))
+        for i, p in enumerate(points):
+            if i not in candidates and haversine_m(lat, lon, p["coord"][1], p["coord"][0]) <= radius_m:
+                missed += 1
+    return missed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="預先計算 H3 格 → 附近門市對照表")
+    parser.add_argument("source", nargs="?", help="RestaurantPoint[] JSON（預設 assets/data/merged_convenience_stores.json）")
+    parser.add_argument("-o", "--output", help="輸出路徑（預設 <來源>.proximity.json）")
+    parser.add_argument("--radius", type=float, default=NEAR_RESTAURANT_RADIUS_M, help="半徑（米）")
+    parser.add_argument("--resolution", type=int, default=H3_RESOLUTION, help="H3 解析度")
+    parser.add_argument("--workers", type=int, default=None, help="平行行程數（預設 CPU 核心數）")
+    parser.add_argument("--check", type=int, default=0, metavar="N", help="以 N 個隨機點逐一比對驗證")
+    args = parser.parse_args(argv)
+
+    if h3 is None:
+        print("需要 h3 套件：pip install h3")
+        sys.exit(1)
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    source = args.source or os.path.join(root, "assets", "data", "merged_convenience_stores.json")
+    out_path = args.output or proximity_path_for(source)
+    with open(source, "rb") as f:
+        raw = f.read()
+    points = json.loads(raw.decode("utf-8"))
+
+    t0 = time.perf_counter()
+    cells = build_table(points, args.radius, args.resolution, args.workers)
+    elapsed = time.perf_counter() - t0
+    table = {
+        "version": TABLE_VERSION,
+        "resolution": args.resolution,
+        "radius_m": args.radius,
+        "source": os.path.basename(source),
+        "source_sha256": hashlib.sha256(raw).hexdigest(),
+        "count": len(points),
+        "cells": cells,
+    }
+    write_json_atomic(out_path, table, separators=(",", ":"))
+
+    n_refs = sum(len(v) for v in cells.values())
+    print(
+        f"{len(points)} 間門市 → {len(cells)} 格（平均每格 {n_refs / max(len(cells), 1):.2f} 筆，"
+        f"最多 {max((len(v) for v in cells.values()), default=0)} 筆），{elapsed:.1f} 秒，"
+        f"{os.path.getsize(out_path) / 1024:.0f} KB → {out_path}"
+    )
+    if args.check:
+        missed = _check(table, points, args.check)
+        print(f"驗證 {args.check} 個隨機點：{'全部一致' if not missed else f'漏掉 {missed} 筆！'}")
+        if missed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+門市集合的欄式（columnar）記憶體表示，取代「每筆一個 dict、每個階段複製一份列表」。
+
+    stores = StoreSet.from_points(iter_json_array(f))
+    stores.distance_merge()          # 只改 keep 遮罩，不複製資料
+    stores.cell_dedupe()
+    write_store_binary_rows(path, stores.iter_rows())
+
+- 座標只存一份：lat / lon 各為 array("d")（每筆 8 bytes），輸出時才四捨五入成 coord
+- id 為字串列表；title / emoji 經字串表去重，每筆只存 array("I") 索引（0 = 無）
+- keep 為 bytearray 遮罩：距離合併、同格去重、跨來源比對都只把被丟棄的列設為 0，
+  各階段結果與 store_geo / store_linkage 的 dict 版本完全相同（順序、座標、屬性）
+
+依賴: 無（numpy 為選用，與 store_geo.py 相同）
+"""
+
+from array import array
+from itertools import compress
+
+from store_geo import GRID_DECIMALS, MERGE_RADIUS_M, SpatialGrid
+from store_linkage import LINK_MIN_SCORE, LINK_RADIUS_M, brand_of, link_columns, representatives
+
+# 輸出 coord 的小數位數（與各腳本的 round(x, 6) 相同）
+COORD_DECIMALS = 6
+
+
+class StoreSet:
+    def __init__(self):
+        self.ids = []
+        self.lats = array("d")
+        self.lons = array("d")
+        self.title_refs = array("I")
+        self.emoji_refs = array("I")
+        self.strings = []
+        self._string_index = {}
+        self.keep = bytearray()
+
+    def _intern(self, s):
+        if s is None:
+            return 0
+        ref = self._string_index.get(s)
+        if ref is None:
+            self.strings.append(s)
+            ref = self._string_index[s] = len(self.strings)
+        return ref
+
+    def _string(self, ref):
+        return self.strings[ref - 1] if ref else None
+
+    def append(self, store_id, lat, lon, title=None, emoji=None):
+        self.ids.append(store_id)
+        self.lats.append(lat)
+        self.lons.append(lon)
+        self.title_refs.append(self._intern(title))
+        self.emoji_refs.append(self._intern(emoji))
+        self.keep.append(1)
+
+    def add_point(self, p, default_emoji=None):
+        """
+        加入一筆 RestaurantPoint（有 lat / lon 時直接採用，否則取 coord [lng, lat]）。
+        沒有座標的略過，回傳是否加入。
+        """
+        lat, lon = p.get("lat"), p.get("lon")
+        if lat is None or lon is None:
+            c = p.get("coord")
+            if not c or len(c) != 2:
+                return False
+            lon, lat = float(c[0]), float(c[1])
+        self.append(p.get("id", ""), lat, lon, p.get("title", ""), p.get("emoji", default_emoji))
+        return True
+
+    @classmethod
+    def from_points(cls, points, default_emoji=None):
+        """RestaurantPoint（可為串流）→ StoreSet；沒有座標的略過"""
+        stores = cls()
+        for p in points:
+            stores.add_point(p, default_emoji)
+        return stores
+
+    def extend(self, other):
+        """
+        把另一個 StoreSet 的保留列依序接在後面。座標取輸出精度（coord），
+        與寫出 JSON 再讀回的結果相同。
+        """
+        for i in other.kept():
+            lon, lat = other.coord(i)
+            self.append(other.ids[i], lat, lon, other.title(i), other.emoji(i))
+
+    def reorder(self, rows):
+        """只留下 rows（列索引序列）並依其順序重排各欄；未列出的列直接移除，之後全部為保留"""
+        rows = list(rows)
+        self.ids = [self.ids[i] for i in rows]
+        self.lats = array("d", [self.lats[i] for i in rows])
+        self.lons = array("d", [self.lons[i] for i in rows])
+        self.title_refs = array("I", [self.title_refs[i] for i in rows])
+        self.emoji_refs = array("I", [self.emoji_refs[i] for i in rows])
+        self.keep = bytearray(b"\x01") * len(rows)
+
+    def __len__(self):
+        """總列數（含已被遮罩丟棄的）"""
+        return len(self.ids)
+
+    def count(self):
+        """保留的列數"""
+        return self.keep.count(1)
+
+    def kept(self):
+        """保留列的索引（依輸入順序）"""
+        return compress(range(len(self.keep)), self.keep)
+
+    def title(self, i):
+        return self._string(self.title_refs[i])
+
+    def emoji(self, i):
+        return self._string(self.emoji_refs[i])
+
+    def coord(self, i):
+        return [round(self.lons[i], COORD_DECIMALS), round(self.lats[i], COORD_DECIMALS)]
+
+    def export(self, i):
+        """第 i 列 → 輸出用 RestaurantPoint（id / coord / title / emoji）"""
+        return {"id": self.ids[i], "coord": self.coord(i), "title": self.title(i), "emoji": self.emoji(i)}
+
+    def iter_export(self):
+        """逐筆產生保留列的輸出 dict（寫檔時才建立，用完即丟）"""
+        ids, lats, lons = self.ids, self.lats, self.lons
+        strings = [None] + self.strings
+        title_refs, emoji_refs = self.title_refs, self.emoji_refs
+        for i in self.kept():
+            yield {
+                "id": ids[i],
+                "coord": [round(lons[i], COORD_DECIMALS), round(lats[i], COORD_DECIMALS)],
+                "title": strings[title_refs[i]],
+                "emoji": strings[emoji_refs[i]],
+            }
+
+    def iter_rows(self):
+        """逐筆產生保留列的 (id, lon, lat, title, emoji)，座標為輸出精度（供 store_binary.encode_rows）"""
+        ids, lats, lons = self.ids, self.lats, self.lons
+        strings = [None] + self.strings
+        title_refs, emoji_refs = self.title_refs, self.emoji_refs
+        for i in self.kept():
+            yield (ids[i], round(lons[i], COORD_DECIMALS), round(lats[i], COORD_DECIMALS),
+                   strings[title_refs[i]], strings[emoji_refs[i]])
+
+    def distance_merge(self, radius_m=MERGE_RADIUS_M, by_brand=False):
+        """
+        距離合併（同 store_geo.distance_merge，先出現者勝出），只改遮罩；回傳丟棄筆數。
+        by_brand 時只和同品牌（store_linkage.brand_of）的已保留點比較。
+        """
+        grids = {}
+        ids, lats, lons, keep = self.ids, self.lats, self.lons, self.keep
+        dropped = 0
+        for i in self.kept():
+            lat, lon = lats[i], lons[i]
+            brand = brand_of(ids[i]) if by_brand else None
+            grid = grids.get(brand)
+            if grid is None:
+                grid = grids[brand] = SpatialGrid(radius_m)
+            if grid.any_within(lat, lon):
+                keep[i] = 0
+                dropped += 1
+            else:
+                grid.add(lat, lon)
+        return dropped
+
+    def cell_dedupe(self, decimals=GRID_DECIMALS, by_brand=False):
+        """
+        同格去重（同 store_geo.cell_dedupe），只改遮罩；回傳丟棄筆數。
+        by_brand 時只在同品牌（store_linkage.brand_of）內去重。
+        """
+        seen_cell = set()
+        ids, lats, lons, keep = self.ids, self.lats, self.lons, self.keep
+        dropped = 0
+        for i in self.kept():
+            cell = (brand_of(ids[i]) if by_brand else None, round(lats[i], decimals), round(lons[i], decimals))
+            if cell in seen_cell:
+                keep[i] = 0
+                dropped += 1
+            else:
+                seen_cell.add(cell)
+        return dropped
+
+    def link(self, radius_m=LINK_RADIUS_M, min_score=LINK_MIN_SCORE, stats=None):
+        """
+        跨來源比對（同 store_linkage.link_records）：每群合併後的屬性寫回該群第一列，其餘列遮罩掉。
+        回傳丟棄筆數。
+        """
+        rows = list(self.kept())
+        ids = [self.ids[i] for i in rows]
+        clusters = link_columns(
+            ids, [self.title(i) for i in rows], [self.lats[i] for i in rows], [self.lons[i] for i in rows],
+            radius_m, min_score, stats,
+        )
+        dropped = 0
+        for members in clusters:
+            if len(members) == 1:
+                continue
+            a, c = representatives(ids, members)
+            first, by_attr, by_coord = rows[members[0]], rows[a], rows[c]
+            title = self.title(by_attr) or next((self.title(rows[m]) for m in members if self.title(rows[m])), "")
+            self.ids[first] = self.ids[by_attr]
+            self.title_refs[first] = self._intern(title)
+            self.emoji_refs[first] = self.emoji_refs[by_attr]
+            self.lats[first] = self.lats[by_coord]
+            self.lons[first] = self.lons[by_coord]
+            for m in members[1:]:
+                self.keep[rows[m]] = 0
+            dropped += len(members) - 1
+        return dropped
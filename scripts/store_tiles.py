@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+把門市圖資（RestaurantPoint[]）切成固定經緯度方格的 tile，並產生 manifest，
+讓 App / 工具只載入目前位置附近的 tile。
+
+- tile 以 coord 的 6 位小數定點整數計算格號，邊界判定不受浮點誤差影響
+- tile 內保留原輸出順序、固定序列化格式：內容不變的 tile 雜湊也不變，可直接沿用快取
+- 重新產生時只覆寫內容有變的 tile，並刪除已不存在的 tile
+
+輸出（out_dir）：
+  manifest.json   {"version", "tile_deg", "count", "tiles": [{"key", "x", "y", "bbox", "count", "hash", "file"}]}
+                  bbox = [minLon, minLat, maxLon, maxLat]（tile 內實際資料範圍），hash = 檔案內容 sha256
+  {x}_{y}.json    該 tile 的 RestaurantPoint[]
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+
+from store_geo import EARTH_RADIUS_M
+from store_io import write_json_atomic
+
+MANIFEST_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+# 預設 tile 邊長（度），約 5.5 km
+DEFAULT_TILE_DEG = 0.05
+COORD_SCALE = 1_000_000
+_TILE_FILE = re.compile(r"^-?\d+_-?\d+\.json$")
+
+
+def tile_of(lon, lat, tile_deg=DEFAULT_TILE_DEG):
+    """(lon, lat) → 格號 (x, y)"""
+    step = round(tile_deg * COORD_SCALE)
+    return round(lon * COORD_SCALE) // step, round(lat * COORD_SCALE) // step
+
+
+def tile_bounds(x, y, tile_deg=DEFAULT_TILE_DEG):
+    """格號 → 格線範圍 [minLon, minLat, maxLon, maxLat]"""
+    step = round(tile_deg * COORD_SCALE)
+    return [x * step / COORD_SCALE, y * step / COORD_SCALE, (x + 1) * step / COORD_SCALE, (y + 1) * step / COORD_SCALE]
+
+
+def split_into_tiles(points, tile_deg=DEFAULT_TILE_DEG):
+    """回傳 {(x, y): [points...]}，tile 內維持輸入順序"""
+    tiles = {}
+    for p in points:
+        lon, lat = p["coord"]
+        tiles.setdefault(tile_of(lon, lat, tile_deg), []).append(p)
+    return tiles
+
+
+def _encode_tile(points) -> bytes:
+    return json.dumps(points, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def write_tiles(points, out_dir, tile_deg=DEFAULT_TILE_DEG):
+    """
+    寫出 tiles 與 manifest。回傳 (manifest, stats)，stats 為 written / unchanged / removed 筆數。
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    stats = {"written": 0, "unchanged": 0, "removed": 0}
+    entries = []
+    for (x, y), tile_points in sorted(split_into_tiles(points, tile_deg).items(), key=lambda kv: (kv[0][1], kv[0][0])):
+        data = _encode_tile(tile_points)
+        digest = hashlib.sha256(data).hexdigest()
+        name = f"{x}_{y}.json"
+        path = os.path.join(out_dir, name)
+        if os.path.isfile(path) and _file_sha256(path) == digest:
+            stats["unchanged"] += 1
+        else:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            stats["written"] += 1
+        lons = [p["coord"][0] for p in tile_points]
+        lats = [p["coord"][1] for p in tile_points]
+        entries.append({
+            "key": f"{x}_{y}",
+            "x": x,
+            "y": y,
+            "bbox": [min(lons), min(lats), max(lons), max(lats)],
+            "count": len(tile_points),
+            "hash": digest,
+            "file": name,
+        })
+
+    keep = {e["file"] for e in entries} | {MANIFEST_NAME}
+    for name in os.listdir(out_dir):
+        if _TILE_FILE.match(name) and name not in keep:
+            os.remove(os.path.join(out_dir, name))
+            stats["removed"] += 1
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "tile_deg": tile_deg,
+        "count": sum(e["count"] for e in entries),
+        "tiles": entries,
+    }
+    write_json_atomic(os.path.join(out_dir, MANIFEST_NAME), manifest, indent=2)
+    return manifest, stats
+
+
+def _file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_manifest(out_dir):
+    with open(os.path.join(out_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def tiles_in_bbox(manifest, bbox):
+    """manifest 中資料範圍與 bbox [minLon, minLat, maxLon, maxLat] 相交的 tile"""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    return [
+        t for t in manifest["tiles"]
+        if t["bbox"][0] <= max_lon and t["bbox"][2] >= min_lon and t["bbox"][1] <= max_lat and t["bbox"][3] >= min_lat
+    ]
+
+
+def load_points_near(out_dir, lat, lon, radius_m, manifest=None):
+    """只讀取 (lat, lon) 半徑 radius_m 內可能有點的 tile，回傳這些 tile 的所有點"""
+    manifest = manifest or load_manifest(out_dir)
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+    points = []
+    for t in tiles_in_bbox(manifest, [lon - dlon, lat - dlat, lon + dlon, lat + dlat]):
+        with open(os.path.join(out_dir, t["file"]), "r", encoding="utf-8") as f:
+            points.extend(json.load(f))
+    return points
@@ -0,0 +1,8 @@
+"""門市圖資腳本的測試：腳本之間以同目錄 import，測試時把 scripts/ 加進 sys.path"""
+
+import os
+import sys
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+本機替身伺服器（http.server）：讓 Geocoding / 綠界 / Overpass 的用戶端不連外網也能測試。
+
+    with MapboxStandIn(latency=0.02, throttle_every=10) as mapbox:
+        geocoder = Geocoder("token", mapbox.geocode_url, ...)
+        ...
+        mapbox.max_in_flight, mapbox.queries   # 最大同時請求數、收到的查詢
+
+- latency：每個請求回應前等待的秒數
+- throttle_every=N：每第 N 個請求回 429（Retry-After: 0），約 1/N 的請求需要重試
+- 請求數、同時處理中的最大請求數與每個請求的開始時間都有記錄，可用來檢查併發與限速
+
+單獨執行時啟動全部替身並印出可 source 的環境變數，供手動執行各腳本：
+    python3 scripts/tests/standins.py > /tmp/standins.env &
+依賴: 無（Python 內建 http.server）
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StandIn:
+    """替身伺服器基底；子類別實作 handle(method, path, body) → (status, body bytes)"""
+
+    def __init__(self, latency=0.0, throttle_every=0):
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.requests = 0
+        self.throttled = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.started = []
+        self.lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(self))
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _begin(self):
+        with self.lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.started.append(time.monotonic())
+            n = self.requests
+        throttle = bool(self.throttle_every) and n % self.throttle_every == 0
+        if throttle:
+            with self.lock:
+                self.throttled += 1
+        return throttle
+
+    def _end(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def handle(self, method, path, body):
+        raise NotImplementedError
+
+
+def _make_handler(standin):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _serve(self, method):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            throttle = standin._begin()
+            try:
+                if standin.latency:
+                    time.sleep(standin.latency)
+                if throttle:
+                    status, data, headers = 429, b"{}", {"Retry-After": "0"}
+                else:
+                    status, data = standin.handle(method, self.path, body)
+                    headers = {}
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+            finally:
+                standin._end()
+
+        def do_GET(self):
+            self._serve("GET")
+
+        def do_POST(self):
+            self._serve("POST")
+
+    return Handler
+
+
+def _json(data):
+    return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+class MapboxStandIn(StandIn):
+    """
+    Mapbox Geocoding 替身：GET /geocoding/v5/mapbox.places/{query}.json（v5，座標在 center），
+    以及 POST /search/geocode/v6/batch（v6 批次，座標在 geometry.coordinates）。
+    座標由地址雜湊決定（同地址每次相同），約 1/17 的地址查無結果；expected(address) 回傳應得的 (lat, lon)。
+    收到的地址依序記在 queries（兩種端點共用），每個批次請求的筆數記在 batch_sizes。
+    """
+
+    GEOCODE_PATH = "/geocoding/v5/mapbox.places/"
+    BATCH_PATH = "/search/geocode/v6/batch"
+
+    def __init__(self, latency=0.0, throttle_every=0):
+        super().__init__(latency, throttle_every)
+        self.queries = []
+        self.batch_sizes = []
+
+    @property
+    def geocode_url(self):
+        return f"{self.url}{self.GEOCODE_PATH}{{query}}.json"
+
+    @property
+    def batch_url(self):
+        return f"{self.url}{self.BATCH_PATH}"
+
+    @staticmethod
+    def expected(address):
+        h = int(hashlib.md5(address.encode("utf-8")).hexdigest(), 16)
+        if h % 17 == 0:
+            return None, None
+        return round(22.0 + (h % 300000) / 1e5, 6), round(120.0 + (h // 300000 % 200000) / 1e5, 6)
+
+    def _feature(self, address):
+        lat, lon = self.expected(address)
+        return [] if lat is None else [{"center": [lon, lat]}]
+
+    def _batch_feature(self, address):
+        lat, lon = self.expected(address)
+        return [] if lat is None else [{"type": "Feature", "geometry": {"type": "Point", "coordinates": [lon, lat]}}]
+
+    def handle(self, method, path, body):
+        path = urllib.parse.urlsplit(path).path
+        if method == "GET" and path.startswith(self.GEOCODE_PATH) and path.endswith(".json"):
+            address = urllib.parse.unquote(path[len(self.GEOCODE_PATH):-len(".json")])
+            with self.lock:
+                self.queries.append(address)
+            return 200, _json({"type": "FeatureCollection", "features": self._feature(address)})
+        if method == "POST" and path == self.BATCH_PATH:
+            addresses = [q["q"] for q in json.loads(body.decode("utf-8"))]
+            with self.lock:
+                self.queries.extend(addresses)
+                self.batch_sizes.append(len(addresses))
+            return 200, _json({"batch": [
+                {"type": "FeatureCollection", "features": self._batch_feature(address)} for address in addresses
+            ]})
+        return 404, b"{}"
+
+
+class ECPayStandIn(StandIn):
+    """
+    綠界 GetStoreList 替身：POST 表單（MerchantID / CvsType / CheckMacValue）。
+    stores = {CvsType: [StoreInfo]}；delays = {CvsType: 秒}；
+    errors = {CvsType: HTTP 狀態碼（回該狀態）或 "rtn"（回 RtnCode 0）}。收到的表單記在 forms。
+    """
+
+    def __init__(self, stores=None, delays=None, errors=None, latency=0.0, throttle_every=0):
+        super().__init__(latency, throttle_every)
+        self.stores = stores or {}
+        self.delays = delays or {}
+        self.errors = errors or {}
+        self.forms = []
+
+    def handle(self, method, path, body):
+        if method != "POST":
+            return 405, b"{}"
+        form = {k: v[0] for k, v in urllib.parse.parse_qs(body.decode("utf-8")).items()}
+        with self.lock:
+            self.forms.append(form)
+        cvs = form.get("CvsType", "")
+        time.sleep(self.delays.get(cvs, 0))
+        error = self.errors.get(cvs)
+        if error == "rtn":
+            return 200, _json({"RtnCode": 0, "RtnMsg": "CheckMacValue Error"})
+        if error is not None:
+            return error, b"{}"
+        return 200, _json({"RtnCode": 1, "StoreList": [{"CvsType": cvs, "StoreInfo": self.stores.get(cvs, [])}]})
+
+
+class OverpassStandIn(StandIn):
+    """
+    Overpass interpreter 替身：POST 表單 data=<Overpass QL>。
+    回傳 elements 中落在查詢 bbox（含邊界，與 Overpass 相同）內的元素；查詢沒有 bbox 時回傳全部。
+    failures = {bbox: 次數}：該 bbox 前幾次回 200 但尾端帶 runtime error remark（模擬伺服器端逾時）。
+    收到的 bbox 依序記在 bboxes。
+    """
+
+    _BBOX = re.compile(r"\)\((-?[\d.]+),(-?[\d.]+),(-?[\d.]+),(-?[\d.]+)\)")
+
+    def __init__(self, elements=(), failures=None, latency=0.0, throttle_every=0):
+        super().__init__(latency, throttle_every)
+        self.elements = list(elements)
+        self.failures = dict(failures or {})
+        self.bboxes = []
+
+    @staticmethod
+    def _inside(elem, bbox):
+        south, west, north, east = bbox
+        pos = elem.get("center", elem)
+        return south <= pos["lat"] <= north and west <= pos["lon"] <= east
+
+    def handle(self, method, path, body):
+        if method != "POST":
+            return 405, b"{}"
+        query = urllib.parse.parse_qs(body.decode("utf-8")).get("data", [""])[0]
+        m = self._BBOX.search(query)
+        bbox = tuple(float(x) for x in m.groups()) if m else None
+        with self.lock:
+            self.bboxes.append(bbox)
+            fail = self.failures.get(bbox, 0) > 0
+            if fail:
+                self.failures[bbox] -= 1
+        elements = [e for e in self.elements if bbox is None or self._inside(e, bbox)]
+        data = {"version": 0.6, "elements": elements}
+        if fail:
+            data["remark"] = "runtime error: Query timed out in \"query\" at line 4 after 61 seconds."
+        return 200, _json(data)
+
+
+def sample_elements(bbox, step):
+    """替身用的 Overpass 元素：bbox 內每 step 度一個 7-Eleven node（含 tile 邊界上的點），另加一個 way"""
+    south, west, north, east = bbox
+    elements = []
+    rows, cols = round((north - south) / step), round((east - west) / step)
+    for i in range(rows + 1):
+        for j in range(cols + 1):
+            elements.append({
+                "type": "node", "id": 1000 + i * (cols + 1) + j,
+                "lat": round(south + i * step, 6), "lon": round(west + j * step, 6),
+                "tags": {"brand:en": "7-Eleven", "name": "7-Eleven", "branch": f"測試{i}-{j}門市"},
+            })
+    elements.append({
+        "type": "way", "id": 1, "center": {"lat": south + step / 3, "lon": west + step / 3},
+        "tags": {"brand:en": "7-Eleven", "name": "7-Eleven"},
+    })
+    return elements
+
+
+def sample_stores(cvs_types, per_type):
+    """替身用的門市清單：每個超商類別 per_type 筆，地址各不相同"""
+    return {
+        cvs: [
+            {"StoreId": str(100000 + i), "StoreName": f"{cvs}{i}", "StoreAddr": f"台北市{cvs}路{i}號",
+             "StorePhone": "02-0000000"}
+            for i in range(per_type)
+        ]
+        for cvs in cvs_types
+    }
+
+
+def main():
+    mapbox = MapboxStandIn().start()
+    ecpay = ECPayStandIn(sample_stores(["UNIMART", "FAMI", "HILIFE", "OKMART"], 200)).start()
+    overpass = OverpassStandIn(sample_elements((21.8, 118.1, 26.4, 122.1), 0.1)).start()
+    print(f"export MAPBOX_GEOCODE_URL='{mapbox.geocode_url}'", flush=True)
+    print(f"export MAPBOX_BATCH_GEOCODE_URL='{mapbox.batch_url}'", flush=True)
+    print(f"export ECPAY_STORE_LIST_URL='{ecpay.url}/Helper/GetStoreList'", flush=True)
+    print(f"export OVERPASS_URL='{overpass.url}/api/interpreter'", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
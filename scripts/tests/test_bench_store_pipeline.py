@@ -0,0 +1,29 @@
+from bench_store_pipeline import DEFAULT_DUP_RATE, DEFAULT_SEED, STAGES, compare
+
+
+def _results(seconds, numpy=False, columnar=False, final=90):
+    stages = {name: {"seconds": seconds, "peak_kb": 100} for name in STAGES}
+    return {
+        "seed": DEFAULT_SEED, "dup_rate": DEFAULT_DUP_RATE, "numpy": numpy, "columnar": columnar,
+        "sizes": {"1000": {"loaded": 100, "kept": 95, "final": final, "stages": stages}},
+    }
+
+
+def test_same_config_detects_regression():
+    assert compare(_results(1.0), _results(1.0)) == []
+    problems = compare(_results(2.0), _results(1.0))
+    assert len(problems) == len(STAGES)
+    assert compare(_results(1.0, final=91), _results(1.0)) == ["1000 筆：final 91 ≠ 基準 90（去重結果改變）"]
+
+
+def test_refuses_baseline_with_other_config():
+    for cur in (_results(0.1, numpy=True), _results(0.1, columnar=True)):
+        (problem,) = compare(cur, _results(1.0))
+        assert "無法比較" in problem
+
+
+def test_old_baseline_without_columnar_is_dict_mode():
+    baseline = _results(1.0)
+    del baseline["columnar"]
+    assert compare(_results(1.0), baseline) == []
+    assert "columnar" in compare(_results(1.0, columnar=True), baseline)[0]
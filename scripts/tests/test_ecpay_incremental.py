@@ -0,0 +1,64 @@
+import random
+
+from ecpay_incremental import RefreshJournal, incremental_merge, plan_geocoding, store_key
+from ecpay_store_list import point_brand, store_to_point
+from store_geo import distance_merge
+
+
+def _store(store_id, addr, name="店"):
+    return {"CvsType": "UNIMART", "StoreId": store_id, "StoreAddr": addr, "StoreName": name}
+
+
+def _state(stores, coords):
+    return {
+        store_key(s, i): {"addr": s["StoreAddr"], "name": s["StoreName"], "lat": lat, "lon": lon}
+        for i, (s, (lat, lon)) in enumerate(zip(stores, coords))
+    }
+
+
+def test_unchanged_address_reuses_coordinates():
+    stores = [_store("1", "台北市信義路1號")]
+    coords, todo, changes = plan_geocoding(stores, _state(stores, [(25.0, 121.5)]))
+    assert coords == {store_key(stores[0], 0): (25.0, 121.5)}
+    assert todo == []
+    assert changes["unchanged"] == 1
+
+
+def test_previous_failure_is_retried():
+    stores = [_store("1", "台北市信義路1號"), _store("2", "台北市信義路2號")]
+    coords, todo, _ = plan_geocoding(stores, _state(stores, [(25.0, 121.5), (None, None)]))
+    assert list(coords) == [store_key(stores[0], 0)]
+    assert todo == [(1, store_key(stores[1], 1), "台北市信義路2號")]
+
+
+def test_journal_failure_is_retried_on_resume(tmp_path):
+    stores = [_store("1", "台北市信義路1號"), _store("2", "台北市信義路2號")]
+    journal = RefreshJournal(str(tmp_path / "journal.jsonl"))
+    journal.record_fetch(stores)
+    journal.record_geocode(store_key(stores[0], 0), "台北市信義路1號", 25.0, 121.5)
+    journal.record_geocode(store_key(stores[1], 1), "台北市信義路2號", None, None)
+    coords, todo, changes = plan_geocoding(stores, {}, RefreshJournal(journal.path))
+    assert coords == {store_key(stores[0], 0): (25.0, 121.5)}
+    assert [key for _, key, _ in todo] == [store_key(stores[1], 1)]
+    assert changes["resumed"] == 1
+
+
+def _brand_points(n, seed):
+    rng = random.Random(seed)
+    stores = [{"CvsType": rng.choice(["UNIMART", "FAMI", "HILIFE"]), "StoreId": str(i)} for i in range(n)]
+    return [store_to_point(s, i, 25.03 + rng.uniform(0, 0.004), 121.56 + rng.uniform(0, 0.004))
+            for i, s in enumerate(stores)], [store_key(s, i) for i, s in enumerate(stores)]
+
+
+def test_incremental_merge_by_brand_matches_full_merge():
+    raw, keys = _brand_points(400, seed=1)
+    kept = set(id(p) for p in distance_merge(raw, 30, point_brand))
+    prev = {key: {"lat": p["lat"], "lon": p["lon"], "kept": id(p) in kept} for p, key in zip(raw, keys)}
+
+    # 移動一家、刪除一家
+    raw[10] = dict(raw[10], lat=raw[10]["lat"] + 0.0002)
+    del raw[200], keys[200]
+    flags, n_affected = incremental_merge(raw, keys, prev, 30, point_brand)
+    full = set(id(p) for p in distance_merge(raw, 30, point_brand))
+    assert flags == [id(p) in full for p in raw]
+    assert n_affected < len(raw)
@@ -0,0 +1,79 @@
+import os
+import time
+
+import pytest
+
+import ecpay_store_list
+from ecpay_incremental import store_key
+from ecpay_store_list import (
+    CVS_TYPES,
+    ECPAY_HASH_IV,
+    ECPAY_HASH_KEY,
+    check_mac_value,
+    dedupe_points,
+    fetch_all_stores,
+    store_to_point,
+)
+from http_pool import HttpError, HttpPool
+from pipeline_metrics import RunMetrics
+from standins import ECPayStandIn, sample_stores
+
+
+@pytest.fixture
+def ecpay(monkeypatch):
+    server = ECPayStandIn(sample_stores(CVS_TYPES, 3)).start()
+    monkeypatch.setattr(ecpay_store_list, "ECPAY_GET_STORE_LIST_URL", f"{server.url}/Helper/GetStoreList")
+    yield server
+    server.stop()
+
+
+def test_fetches_every_cvs_concurrently(ecpay):
+    ecpay.delays = {cvs: 0.3 for cvs in CVS_TYPES}
+    t0 = time.monotonic()
+    stores = fetch_all_stores(HttpPool())
+    elapsed = time.monotonic() - t0
+    assert elapsed < 0.3 * 2
+    assert ecpay.max_in_flight == len(CVS_TYPES)
+    # 輸出依 CVS_TYPES 順序，與請求完成順序無關
+    assert [s["CvsType"] for s in stores] == [cvs for cvs in CVS_TYPES for _ in range(3)]
+    assert stores[0] == {"StoreId": "100000", "StoreName": "UNIMART0", "StoreAddr": "台北市UNIMART路0號",
+                         "StorePhone": "02-0000000", "CvsType": "UNIMART"}
+
+
+def test_requests_are_signed(ecpay):
+    fetch_all_stores(HttpPool())
+    assert sorted(f["CvsType"] for f in ecpay.forms) == sorted(CVS_TYPES)
+    for form in ecpay.forms:
+        params = {k: v for k, v in form.items() if k != "CheckMacValue"}
+        assert form["CheckMacValue"] == check_mac_value(params, ECPAY_HASH_KEY, ECPAY_HASH_IV)
+
+
+def test_failed_cvs_is_skipped(ecpay):
+    ecpay.errors = {"FAMI": 400, "HILIFE": "rtn"}
+    stores = fetch_all_stores(HttpPool())
+    assert {s["CvsType"] for s in stores} == {"UNIMART", "OKMART"}
+
+
+def test_server_errors_are_retried(ecpay):
+    ecpay.throttle_every = 2
+    stores = fetch_all_stores(HttpPool())
+    assert len(stores) == 3 * len(CVS_TYPES)
+    assert ecpay.throttled >= 2
+    assert ecpay.requests == len(CVS_TYPES) + ecpay.throttled
+
+
+def test_unreachable_endpoint_raises(ecpay):
+    ecpay.stop()
+    with pytest.raises(HttpError):
+        fetch_all_stores(HttpPool(max_retries=0))
+    ecpay.start()
+
+
+def test_dedupe_keeps_neighbours_of_other_brands():
+    stores = [{"CvsType": cvs, "StoreId": str(i)} for i, cvs in enumerate(["UNIMART", "FAMI", "UNIMART", "HILIFE"])]
+    # 依序相距約 11m：兩家 7-ELEVEN 合併，中間的全家與最後的萊爾富都保留
+    raw = [store_to_point(s, i, 25.0 + i * 0.0001, 121.5) for i, s in enumerate(stores)]
+    keys = [store_key(s, i) for i, s in enumerate(stores)]
+    out, flags = dedupe_points(raw, keys, {}, RunMetrics("test", metrics_path=os.devnull))
+    assert [p["id"] for p in out] == ["ecpay-UNIMART-0", "ecpay-FAMI-1", "ecpay-HILIFE-3"]
+    assert flags == [True, True, False, True]
@@ -0,0 +1,93 @@
+import json
+import os
+
+import pytest
+
+import fetch_711_taiwan
+from fetch_overpass_tiles import checkpoint_dir_for, fetch_tiles, split_bbox
+from http_pool import HttpPool
+from standins import OverpassStandIn, sample_elements
+
+BBOX = (25.0, 121.0, 26.0, 122.0)
+TILE_DEG = 0.5
+ELEMENTS = sample_elements(BBOX, 0.25)
+
+
+@pytest.fixture
+def overpass():
+    # 每個請求延遲 50ms，併發抓取時多個 tile 必定同時處理中
+    with OverpassStandIn(ELEMENTS, latency=0.05) as server:
+        yield server
+
+
+def _fetch(server, tmp_path, **kwargs):
+    return fetch_tiles(
+        out_path=str(tmp_path / "merged.json"), bbox=BBOX, tile_deg=TILE_DEG, url=f"{server.url}/api/interpreter",
+        checkpoint_root=str(tmp_path / "tiles"), **kwargs,
+    )
+
+
+def _merged(tmp_path):
+    with open(tmp_path / "merged.json", encoding="utf-8") as f:
+        return json.load(f)["elements"]
+
+
+def test_split_bbox_covers_bbox_without_gaps():
+    tiles = split_bbox((25.0, 121.0, 26.2, 122.0), 0.5)
+    assert [key for key, _ in tiles] == [f"{i:03d}_{j:03d}" for i in range(3) for j in range(2)]
+    assert tiles[0][1] == (25.0, 121.0, 25.5, 121.5)
+    # 最後一列截在 bbox 北界
+    assert tiles[-1][1] == (26.0, 121.5, 26.2, 122.0)
+
+
+def test_tiles_are_fetched_and_merged(overpass, tmp_path):
+    done, failed = _fetch(overpass, tmp_path, parallel=4)
+    assert (done, failed) == (4, [])
+    assert sorted(overpass.bboxes) == sorted(tb for _, tb in split_bbox(BBOX, TILE_DEG))
+    assert overpass.max_in_flight > 1
+    # tile 邊界上的點會出現在相鄰的 tile，合併時只留一筆
+    merged = _merged(tmp_path)
+    assert sorted((e["type"], e["id"]) for e in merged) == sorted((e["type"], e["id"]) for e in ELEMENTS)
+
+
+def test_failed_tile_is_refetched_on_resume(overpass, tmp_path):
+    failing = split_bbox(BBOX, TILE_DEG)[1]
+    overpass.failures = {failing[1]: 1}
+    done, failed = _fetch(overpass, tmp_path)
+    assert done == 3
+    assert [key for key, _ in failed] == [failing[0]]
+    assert "runtime error" in failed[0][1]
+    # 有失敗時不寫合併檔，失敗的 tile 不留檢查點
+    assert not os.path.exists(tmp_path / "merged.json")
+    ckpt_dir = checkpoint_dir_for(("7-Eleven",), BBOX, TILE_DEG, "center", str(tmp_path / "tiles"))
+    assert sorted(os.listdir(ckpt_dir)) == sorted(f"{key}.json" for key, _ in split_bbox(BBOX, TILE_DEG)
+                                                  if key != failing[0])
+
+    overpass.bboxes.clear()
+    assert _fetch(overpass, tmp_path) == (4, [])
+    assert overpass.bboxes == [failing[1]]
+    assert len(_merged(tmp_path)) == len(ELEMENTS)
+
+
+def test_completed_run_is_not_refetched(overpass, tmp_path):
+    _fetch(overpass, tmp_path)
+    requests = overpass.requests
+    assert _fetch(overpass, tmp_path) == (4, [])
+    assert overpass.requests == requests
+
+
+def test_throttled_tiles_are_retried(tmp_path):
+    with OverpassStandIn(ELEMENTS, throttle_every=2) as server:
+        pool = HttpPool(max_per_host=2)
+        assert _fetch(server, tmp_path, pool=pool) == (4, [])
+        assert server.throttled >= 2
+        assert pool.metrics()["retries"] == server.throttled
+        assert len(_merged(tmp_path)) == len(ELEMENTS)
+
+
+def test_single_query_fetch(overpass, monkeypatch):
+    monkeypatch.setattr(fetch_711_taiwan, "OVERPASS_URL", f"{overpass.url}/api/interpreter")
+    data = fetch_711_taiwan.fetch_overpass_json(HttpPool(), center=True)
+    # 全台查詢沒有 bbox
+    assert overpass.bboxes == [None]
+    assert data["elements"] == ELEMENTS
@@ -0,0 +1,77 @@
+import pytest
+
+import geocode_cache
+from geocode_cache import DEFAULT_NEGATIVE_TTL_S, GeocodeCache, normalize_address
+
+
+class _Clock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = _Clock()
+    monkeypatch.setattr(geocode_cache.time, "time", c)
+    return c
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = GeocodeCache(str(tmp_path / "geocode.sqlite"))
+    yield c
+    c.close()
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("臺北市信義區市府路１號", "台北市信義區市府路1號"),
+    ("台北市 信義區　市府路 1 號", "台北市信義區市府路1號"),
+    ("ＡＢＣ大樓１２Ｆ－３", "ABC大樓12F-3"),
+    ("臺中市西屯區臺灣大道三段９９號", "台中市西屯區台灣大道三段99號"),
+    ("", ""),
+    (None, ""),
+])
+def test_normalize_address(raw, expected):
+    assert normalize_address(raw) == expected
+
+
+def test_variants_share_one_entry(cache, clock):
+    cache.put("臺北市信義區市府路１號", 25.0375, 121.5637)
+    assert cache.get("台北市 信義區 市府路1號") == (True, 25.0375, 121.5637)
+    assert cache.stats["hits"] == 1
+
+
+def test_negative_result_expires_after_ttl(cache, clock):
+    cache.put("查無此處路1號", None, None)
+
+    clock.now += DEFAULT_NEGATIVE_TTL_S
+    assert cache.get("查無此處路1號") == (True, None, None)
+    assert cache.stats["negative_hits"] == 1
+
+    clock.now += 1
+    assert cache.get("查無此處路1號") == (False, None, None)
+    assert cache.stats["misses"] == 1
+
+
+def test_positive_result_never_expires(cache, clock):
+    cache.put("台北市信義區市府路1號", 25.0375, 121.5637)
+    clock.now += DEFAULT_NEGATIVE_TTL_S * 100
+    assert cache.get("台北市信義區市府路1號") == (True, 25.0375, 121.5637)
+
+
+def test_results_persist_across_reopen(tmp_path, clock):
+    path = str(tmp_path / "geocode.sqlite")
+    first = GeocodeCache(path)
+    first.put("台北市信義區市府路1號", 25.0375, 121.5637)
+    first.put("查無此處路1號", None, None)
+    first.close()
+
+    second = GeocodeCache(path)
+    try:
+        assert second.get("臺北市信義區市府路１號") == (True, 25.0375, 121.5637)
+        assert second.get("查無此處路1號") == (True, None, None)
+    finally:
+        second.close()
@@ -0,0 +1,125 @@
+import time
+
+import pytest
+
+from geocoder import Geocoder
+from http_pool import HttpPool
+from standins import MapboxStandIn
+
+ADDRESSES = [f"台北市信義區松仁路{i}號" for i in range(24)]
+
+
+@pytest.fixture
+def mapbox():
+    with MapboxStandIn(latency=0.05) as server:
+        yield server
+
+
+def _geocoder(server, **kwargs):
+    kwargs.setdefault("qps", 0)
+    if kwargs.pop("batch", False):
+        kwargs["batch_url"] = server.batch_url
+    return Geocoder("token", server.geocode_url, pool=HttpPool(max_per_host=kwargs.get("workers", 8)), **kwargs)
+
+
+def test_concurrent_results_keep_input_order(mapbox):
+    geocoder = _geocoder(mapbox, workers=4)
+    t0 = time.monotonic()
+    results = geocoder.geocode_many(ADDRESSES, progress_every=0)
+    elapsed = time.monotonic() - t0
+    assert results == [MapboxStandIn.expected(a) for a in ADDRESSES]
+    assert 1 < mapbox.max_in_flight <= 4
+    # 逐筆查詢至少要 24 × 50ms
+    assert elapsed < len(ADDRESSES) * mapbox.latency * 0.6
+
+
+def test_rate_limit_caps_request_rate():
+    with MapboxStandIn() as server:
+        geocoder = _geocoder(server, workers=4, qps=20)
+        t0 = time.monotonic()
+        geocoder.geocode_many(ADDRESSES + [f"{a}之1" for a in ADDRESSES[:6]], progress_every=0)
+        elapsed = time.monotonic() - t0
+        # token bucket 容量 = workers：前 4 個立即送出，其餘 26 個每秒 20 個
+        assert elapsed >= (30 - 4) / 20 * 0.9
+        starts = server.started
+        for i, t in enumerate(starts):
+            assert sum(1 for s in starts[i:] if s - t < 1.0) <= 20 + 4
+
+
+def test_throttled_requests_are_retried():
+    with MapboxStandIn(throttle_every=5) as server:
+        geocoder = _geocoder(server, workers=4)
+        results = geocoder.geocode_many(ADDRESSES, progress_every=0)
+        assert results == [MapboxStandIn.expected(a) for a in ADDRESSES]
+        assert server.throttled >= len(ADDRESSES) // 5
+        assert geocoder.pool.metrics()["retries"] == server.throttled
+        assert geocoder.stats["failed"] == 0
+
+
+def test_retries_exhausted_counts_failure():
+    with MapboxStandIn(throttle_every=1) as server:
+        geocoder = _geocoder(server, workers=2, max_retries=1)
+        assert geocoder.geocode_many(ADDRESSES[:3], progress_every=0) == [(None, None)] * 3
+        assert geocoder.stats["failed"] == 3
+        assert server.requests == 6
+
+
+def test_duplicate_addresses_queried_once(mapbox):
+    addresses = ["台北市信義路五段7號", "臺北市信義路五段７號", "台北市信義路五段7號", ""]
+    geocoder = _geocoder(mapbox)
+    results = geocoder.geocode_many(addresses, progress_every=0)
+    assert mapbox.queries == ["台北市信義路五段7號"]
+    assert results[:3] == [MapboxStandIn.expected("台北市信義路五段7號")] * 3
+    assert results[3] == (None, None)
+    assert geocoder.stats["deduped"] == 2
+
+
+def test_batch_matches_single_mode(mapbox):
+    # ADDRESSES 中有查無結果的地址（6、18 號）
+    assert (None, None) in [MapboxStandIn.expected(a) for a in ADDRESSES]
+    single = _geocoder(mapbox, workers=4).geocode_many(ADDRESSES, progress_every=0)
+    batch = _geocoder(mapbox, workers=4, batch=True, batch_size=10).geocode_many(ADDRESSES, progress_every=0)
+    assert batch == single == [MapboxStandIn.expected(a) for a in ADDRESSES]
+
+
+def test_batch_splits_unique_addresses(mapbox):
+    geocoder = _geocoder(mapbox, workers=4, batch=True, batch_size=5)
+    seen = []
+    geocoder.geocode_many(ADDRESSES, progress_every=0, on_result=lambda i, result: seen.append(i))
+    assert sorted(mapbox.batch_sizes) == [4, 5, 5, 5, 5]
+    assert mapbox.requests == geocoder.stats["batches"] == 5
+    assert sorted(mapbox.queries) == sorted(ADDRESSES)
+    assert 1 < mapbox.max_in_flight <= 4
+    # on_result 每個輸入索引各一次（依完成順序）
+    assert sorted(seen) == list(range(len(ADDRESSES)))
+
+
+def test_batch_duplicates_fan_out(mapbox):
+    addresses = ["台北市信義路五段7號", "臺北市信義路五段７號", "", "台北市信義路五段7號"] + ADDRESSES[:3]
+    geocoder = _geocoder(mapbox, batch=True, batch_size=2)
+    results = geocoder.geocode_many(addresses, progress_every=0)
+    assert sorted(mapbox.queries) == sorted(["台北市信義路五段7號"] + ADDRESSES[:3])
+    assert sorted(mapbox.batch_sizes) == [2, 2]
+    assert results == [MapboxStandIn.expected("台北市信義路五段7號")] * 2 + [(None, None)] + \
+        [MapboxStandIn.expected(a) for a in ["台北市信義路五段7號"] + ADDRESSES[:3]]
+    assert geocoder.stats["deduped"] == 2
+
+
+def test_batch_throttled_requests_are_retried():
+    with MapboxStandIn(throttle_every=2) as server:
+        # 單一執行緒：每個被擋的請求重試時必定輪到奇數序號，不會連續被擋到重試用盡
+        geocoder = _geocoder(server, workers=1, batch=True, batch_size=4)
+        results = geocoder.geocode_many(ADDRESSES, progress_every=0)
+        assert results == [MapboxStandIn.expected(a) for a in ADDRESSES]
+        assert server.throttled >= 3
+        assert geocoder.pool.metrics()["retries"] == server.throttled
+        assert geocoder.stats["batches"] == 6
+        assert geocoder.stats["failed"] == 0
+
+
+def test_batch_retries_exhausted_fails_whole_batch():
+    with MapboxStandIn(throttle_every=1) as server:
+        geocoder = _geocoder(server, batch=True, batch_size=2, max_retries=1)
+        assert geocoder.geocode_many(ADDRESSES[:3], progress_every=0) == [(None, None)] * 3
+        assert geocoder.stats["failed"] == 3
+        assert server.requests == 4
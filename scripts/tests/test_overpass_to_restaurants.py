@@ -0,0 +1,130 @@
+import os
+
+import pytest
+
+from overpass_to_restaurants import convert_elements, iter_store_elements, write_restaurants
+from pipeline_metrics import RunMetrics
+from store_binary import binary_path_for, read_store_binary
+from store_linkage import brand_of
+from store_set import StoreSet
+
+# 約 11m / 緯度 0.0001 度
+STEP = 0.0001
+
+
+def _node(node_id, lat, lon, brand=None, **tags):
+    elem = {"type": "node", "id": node_id, "lat": lat, "lon": lon}
+    if brand is not None or tags:
+        elem["tags"] = dict(tags, **({"brand:en": brand} if brand else {}))
+    return elem
+
+
+def _convert(elements):
+    return list(convert_elements(elements, RunMetrics("test", metrics_path=os.devnull)).iter_export())
+
+
+def test_brand_sets_id_prefix_and_emoji():
+    stores = _convert([
+        _node(1, 25.0, 121.5, "7-Eleven", name="7-Eleven", branch="百吉門市"),
+        _node(2, 25.1, 121.5, "FamilyMart", name="全家便利商店"),
+        _node(3, 25.2, 121.5, "hi-life"),
+        _node(4, 25.3, 121.5, "OK mart"),
+        _node(5, 25.4, 121.5, None, name="7-ELEVEN"),
+    ])
+    assert [(p["id"], p["title"], p["emoji"]) for p in stores] == [
+        ("711-node1", "7-Eleven 百吉門市", "🥤"),
+        ("osm-family-node2", "全家便利商店", "🏪"),
+        ("osm-hilife-node3", "hi-life", "🏪"),
+        ("osm-ok-node4", "OK mart", "🏪"),
+        ("711-node5", "7-ELEVEN", "🥤"),
+    ]
+    assert [brand_of(p["id"]) for p in stores] == ["711", "family", "hilife", "ok", "711"]
+
+
+def test_merge_keeps_neighbours_of_other_brands():
+    stores = _convert([
+        _node(1, 25.0, 121.5, "7-Eleven"),
+        _node(2, 25.0 + 2 * STEP, 121.5, "FamilyMart"),  # 約 22m，不同品牌
+        _node(3, 25.0 + STEP, 121.5, "7-Eleven"),         # 約 11m，同品牌 → 合併
+        _node(4, 25.0, 121.5, "Hi-Life"),                 # 與 1 同一座標，不同品牌
+    ])
+    assert [p["id"] for p in stores] == ["711-node1", "osm-family-node2", "osm-hilife-node4"]
+
+
+def test_overpass_familymart_links_to_ecpay_fami():
+    overpass = _convert([_node(1, 25.0, 121.5, "7-Eleven"), _node(2, 25.0 + 2 * STEP, 121.5, "FamilyMart")])
+    stores = StoreSet()
+    stores.append("ecpay-UNIMART-100", 25.0 + 0.2 * STEP, 121.5, "7-ELEVEN 測試門市", "🥤")
+    stores.append("ecpay-FAMI-200", 25.0 + 1.8 * STEP, 121.5, "全家 測試店", "🏪")
+    for p in overpass:
+        stores.add_point(p)
+    stores.link()
+    # 每家綠界門市只和同品牌的 Overpass 點合併，座標取 Overpass
+    assert [(p["id"], p["coord"]) for p in stores.iter_export()] == [
+        ("ecpay-UNIMART-100", [121.5, 25.0]),
+        ("ecpay-FAMI-200", [121.5, 25.0002]),
+    ]
+
+
+def _skel_node(node_id, lat, lon):
+    return {"type": "node", "id": node_id, "lat": lat, "lon": lon}
+
+
+def test_way_before_its_nodes_is_located_from_members():
+    elements = [
+        {"type": "way", "id": 10, "nodes": [1, 2, 3, 1], "tags": {"brand:en": "7-Eleven"}},
+        # way 之後的門市先暫存，讀完全部元素後依原順序輸出
+        _node(4, 25.5, 121.5, "7-Eleven"),
+        _skel_node(1, 25.0, 121.0),
+        _skel_node(2, 25.2, 121.1),
+        _skel_node(3, 25.1, 121.4),
+    ]
+    stats = {}
+    out = [(e["type"], e["id"], lat, lon) for e, lat, lon in iter_store_elements(iter(elements), stats)]
+    # 外框中心（與 Overpass out center 相同）
+    assert out == [("way", 10, pytest.approx(25.1), pytest.approx(121.2)), ("node", 4, 25.5, 121.5)]
+    assert stats == {"skel": 3, "from_center": 1, "from_members": 1, "unresolved": 0}
+
+
+def test_relation_with_missing_members():
+    elements = [
+        {"type": "relation", "id": 100, "tags": {"brand:en": "7-Eleven"}, "members": [
+            {"type": "way", "ref": 20, "role": "outer"},
+            {"type": "node", "ref": 999, "role": ""},        # 不在輸出中的節點
+            {"type": "way", "ref": 21, "role": "inner"},     # 不在輸出中的 way
+            {"type": "relation", "ref": 100, "role": ""},    # 自我參照不會無限遞迴
+        ]},
+        # 所有成員都找不到：無法定位，直接丟棄
+        {"type": "relation", "id": 101, "tags": {"brand:en": "7-Eleven"},
+         "members": [{"type": "node", "ref": 998}, {"type": "way", "ref": 22}]},
+        {"type": "way", "id": 30, "center": {"lat": 24.0, "lon": 120.0}, "tags": {"brand:en": "7-Eleven"}},
+        {"type": "way", "id": 20, "nodes": [1, 2, 404]},
+        _skel_node(1, 25.0, 121.0),
+        _skel_node(2, 25.4, 121.2),
+    ]
+    stats = {}
+    out = [(e["id"], lat, lon) for e, lat, lon in iter_store_elements(elements, stats)]
+    assert out == [(100, pytest.approx(25.2), pytest.approx(121.1)), (30, 24.0, 120.0)]
+    assert stats == {"skel": 3, "from_center": 1, "from_members": 1, "unresolved": 1}
+
+
+def test_unresolved_pending_elements_are_dropped_from_output():
+    elements = [
+        {"type": "way", "id": 10, "nodes": [1], "tags": {"brand:en": "7-Eleven"}},
+        {"type": "way", "id": 11, "nodes": [2], "tags": {"brand:en": "7-Eleven"}},
+        _skel_node(1, 25.0, 121.0),
+    ]
+    assert [p["id"] for p in _convert(elements)] == ["711-way10"]
+
+
+def test_bin_is_opt_in(tmp_path):
+    out_path = str(tmp_path / "restaurants.json")
+    stores = convert_elements([_node(1, 25.0, 121.5)], RunMetrics("test", metrics_path=os.devnull))
+
+    write_restaurants(out_path, stores, binary=True)
+    assert read_store_binary(binary_path_for(out_path)) == list(stores.iter_export())
+
+    # 未加 --bin：不寫 .bin，並刪除上次留下的舊檔
+    write_restaurants(out_path, stores)
+    assert os.path.isfile(out_path)
+    assert not os.path.exists(binary_path_for(out_path))
@@ -0,0 +1,63 @@
+import pytest
+
+from store_binary import MAGIC, decode_stores, encode_rows, encode_stores
+
+
+def _point(store_id, lon, lat, title="7-Eleven", emoji="🥤"):
+    return {"id": store_id, "coord": [lon, lat], "title": title, "emoji": emoji}
+
+
+def test_empty_round_trip():
+    data = encode_stores([])
+    assert data.startswith(MAGIC)
+    assert decode_stores(data) == []
+
+
+def test_round_trip_keeps_ids_and_strings():
+    points = [
+        _point("711-node244453297", 121.565, 25.033, "7-Eleven 百吉門市"),
+        _point("ecpay-FAMI-013579", 120.3, 22.6, "全家 高雄中正店", "🏪"),
+        _point("ecpay-UNIMART-0", 121.0, 24.0),
+        _point("ecpay-UNIMART-007", 121.0, 24.0),
+        _point("no-number", 121.0, 24.0, "Café ☕ 「測試」　店", "🧋"),
+        _point("", -0.5, -45.25, "", ""),
+    ]
+    assert decode_stores(encode_stores(points)) == points
+
+
+def test_none_title_and_emoji_round_trip():
+    points = [_point("a1", 121.5, 25.0, None, None), _point("a2", 121.5, 25.0, "門市", None)]
+    decoded = decode_stores(encode_stores(points))
+    assert decoded == points
+    assert decoded[0]["title"] is None and decoded[0]["emoji"] is None
+
+
+def test_missing_title_and_emoji_decode_as_none():
+    assert decode_stores(encode_stores([{"id": "x", "coord": [121.0, 25.0]}])) == [_point("x", 121.0, 25.0, None, None)]
+
+
+def test_wide_string_refs():
+    # 字串超過 65535 個時參照改為 4 bytes（u16 裝不下，編碼會失敗）
+    points = [_point(f"store-{i:06d}x", round(121.0 + i * 1e-6, 6), 25.0, f"門市{i}") for i in range(70000)]
+    data = encode_stores(points)
+    assert decode_stores(data) == points
+    narrow = encode_stores(points[:1000])
+    assert decode_stores(narrow) == points[:1000]
+
+
+def test_rows_match_points():
+    points = [_point("711-node1", 121.5, 25.0), _point("711-node2", 121.6, 25.1, None, None)]
+    rows = [(p["id"], p["coord"][0], p["coord"][1], p["title"], p["emoji"]) for p in points]
+    assert encode_rows(rows) == encode_stores(points)
+
+
+@pytest.mark.parametrize("lon, lat, expected", [
+    (121.1234564, 25.0000004, [121.123456, 25.0]),
+    (121.1234566, 25.0000006, [121.123457, 25.000001]),
+    (-73.9857001, -33.8688197, [-73.9857, -33.86882]),
+])
+def test_coordinates_round_to_microdegrees(lon, lat, expected):
+    (p,) = decode_stores(encode_stores([_point("x", lon, lat)]))
+    assert p["coord"] == expected
+    # 輸出座標本身已是 6 位小數時完全不變
+    assert decode_stores(encode_stores([p])) == [p]
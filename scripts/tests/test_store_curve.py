@@ -0,0 +1,144 @@
+import random
+
+import pytest
+
+import store_curve
+from store_curve import (
+    bbox_ranges,
+    build_index,
+    curve_key,
+    curve_keys,
+    hilbert_index,
+    in_bbox,
+    morton_index,
+    query_bbox,
+    query_slices,
+    sort_stores,
+)
+from store_set import StoreSet
+
+
+@pytest.mark.parametrize("order", [1, 3, 4, 5, 6])
+def test_hilbert_visits_every_cell_through_neighbours(order):
+    n = 1 << order
+    cells = {hilbert_index(x, y, order): (x, y) for x in range(n) for y in range(n)}
+    assert sorted(cells) == list(range(n * n))
+    # 曲線上相鄰的兩個序號必為上下左右相鄰的格
+    for d in range(n * n - 1):
+        (x0, y0), (x1, y1) = cells[d], cells[d + 1]
+        assert abs(x0 - x1) + abs(y0 - y1) == 1
+    assert cells[0] == (0, 0)
+
+
+@pytest.mark.parametrize("order", [3, 5])
+def test_morton_interleaves_bits(order):
+    n = 1 << order
+    for x in range(n):
+        for y in range(n):
+            expected = sum((x >> b & 1) << (2 * b) | (y >> b & 1) << (2 * b + 1) for b in range(order))
+            assert morton_index(x, y, order) == expected
+
+
+@pytest.mark.parametrize("curve", ["hilbert", "z"])
+def test_curve_keys_match_single_key(curve, monkeypatch):
+    rng = random.Random(1)
+    lons = [round(rng.uniform(118, 122.5), 6) for _ in range(400)]
+    lats = [round(rng.uniform(21.5, 26.5), 6) for _ in range(400)]
+    expected = [curve_key(lon, lat, curve) for lon, lat in zip(lons, lats)]
+    # 點數超過 VECTORIZE_MIN_POINTS：有 numpy 時走向量化，與純 Python 結果須相同
+    assert curve_keys(lons, lats, curve) == expected
+    monkeypatch.setattr(store_curve, "np", None)
+    assert curve_keys(lons, lats, curve) == expected
+
+
+@pytest.mark.parametrize("curve", ["hilbert", "z"])
+@pytest.mark.parametrize("max_ranges", [4, 64, 1 << 20])
+def test_bbox_ranges_cover_every_cell(curve, max_ranges):
+    order = 6
+    n = 1 << order
+    rng = random.Random(max_ranges)
+    for _ in range(30):
+        x0, x1 = sorted(rng.randrange(n) for _ in range(2))
+        y0, y1 = sorted(rng.randrange(n) for _ in range(2))
+        # 以格中心的經緯度組 bbox
+        lon = lambda x: (x + 0.5) * 360 / n - 180
+        lat = lambda y: (y + 0.5) * 180 / n - 90
+        ranges = bbox_ranges([lon(x0), lat(y0), lon(x1), lat(y1)], curve, order, max_ranges)
+        assert ranges == sorted(ranges)
+        assert all(lo <= hi for lo, hi in ranges)
+        assert all(a[1] + 1 < b[0] for a, b in zip(ranges, ranges[1:]))
+        index_of = hilbert_index if curve == "hilbert" else morton_index
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                d = index_of(x, y, order)
+                assert any(lo <= d <= hi for lo, hi in ranges)
+        if max_ranges == 1 << 20:
+            # 不限範圍數時拆到單格為止，不多收錄 bbox 外的格
+            assert sum(hi - lo + 1 for lo, hi in ranges) == (x1 - x0 + 1) * (y1 - y0 + 1)
+
+
+def _sorted_points(n=3000, seed=0):
+    rng = random.Random(seed)
+    stores = StoreSet()
+    for i in range(n):
+        stores.append(f"s{i}", rng.uniform(24.9, 25.2), rng.uniform(121.4, 121.7), f"門市{i}", "🏪")
+    keys = sort_stores(stores)
+    return list(stores.iter_export()), build_index(keys, block_size=16)
+
+
+def _brute(points, bbox):
+    return [p for p in points if in_bbox(p, bbox)]
+
+
+def test_sorted_keys_are_non_decreasing():
+    points, index = _sorted_points(500)
+    keys = [curve_key(*p["coord"]) for p in points]
+    assert keys == sorted(keys)
+    assert index["count"] == 500 and index["blocks"][0][0] == 0
+
+
+def test_random_bbox_queries_match_brute_force():
+    points, index = _sorted_points()
+    rng = random.Random(3)
+    for _ in range(200):
+        lon, lat = rng.choice(points)["coord"]
+        w, h = rng.uniform(0.001, 0.1), rng.uniform(0.001, 0.1)
+        bbox = [lon - rng.uniform(0, w), lat - rng.uniform(0, h), lon + rng.uniform(0, w), lat + rng.uniform(0, h)]
+        found, scanned = query_bbox(points, index, bbox)
+        assert found == _brute(points, bbox)
+        assert scanned < len(points)
+
+
+def test_bbox_on_index_edges():
+    points, index = _sorted_points()
+    lons = [p["coord"][0] for p in points]
+    lats = [p["coord"][1] for p in points]
+    extent = [min(lons), min(lats), max(lons), max(lats)]
+    # 整個資料範圍：全部找到，第一塊與最後一塊都會掃到
+    found, _ = query_bbox(points, index, extent)
+    assert found == points
+    slices = query_slices(index, extent)
+    assert slices[0][0] == 0 and slices[-1][1] == len(points)
+    # 只含曲線上第一筆與最後一筆的點（bbox 邊界剛好落在點上）
+    for p in (points[0], points[-1]):
+        lon, lat = p["coord"]
+        assert query_bbox(points, index, [lon, lat, lon, lat])[0] == _brute(points, [lon, lat, lon, lat])
+    # 貼著全球格網邊界的 bbox（經緯度超出範圍會截在邊界格）
+    world = [-180, -90, 180, 90]
+    assert query_bbox(points, index, world)[0] == points
+    assert query_bbox(points, index, [179.9, 89.9, 181, 91]) == ([], 0)
+
+
+def test_empty_bbox():
+    points, index = _sorted_points()
+    # 範圍內沒有門市
+    assert query_bbox(points, index, [120.0, 23.0, 120.1, 23.1])[0] == []
+    # min > max 的 bbox 不含任何格
+    assert bbox_ranges([121.6, 25.1, 121.5, 25.0]) == []
+    assert query_bbox(points, index, [121.6, 25.1, 121.5, 25.0]) == ([], 0)
+
+
+def test_empty_index():
+    index = build_index([])
+    assert index["blocks"] == []
+    assert query_slices(index, [121.5, 25.0, 121.6, 25.1]) == []
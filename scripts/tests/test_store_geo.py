@@ -0,0 +1,103 @@
+import random
+
+import pytest
+
+import store_geo
+from store_geo import (
+    GRID_DECIMALS,
+    SpatialGrid,
+    cell_dedupe,
+    distance_merge,
+    haversine_m,
+    haversine_matrix,
+    haversine_one_to_many,
+    iter_haversine_blocks,
+)
+
+
+def _dense_points(n, seed=0):
+    """集中在約 300m 見方內的點，距離合併時每點都有多個鄰近候選"""
+    rng = random.Random(seed)
+    return [{"lat": 25.03 + rng.uniform(0, 0.003), "lon": 121.56 + rng.uniform(0, 0.003)} for _ in range(n)]
+
+
+def _brute_distance_merge(points, radius_m):
+    kept = []
+    for p in points:
+        if all(haversine_m(p["lat"], p["lon"], k["lat"], k["lon"]) >= radius_m for k in kept):
+            kept.append(p)
+    return kept
+
+
+def test_one_to_many_matches_haversine_m():
+    pts = _dense_points(200)
+    d = haversine_one_to_many(25.0, 121.5, [p["lat"] for p in pts], [p["lon"] for p in pts])
+    for p, got in zip(pts, list(d)):
+        assert got == pytest.approx(haversine_m(25.0, 121.5, p["lat"], p["lon"]), abs=1e-6)
+
+
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_haversine_blocks_match_haversine_m(vectorized, monkeypatch):
+    if not vectorized:
+        monkeypatch.setattr(store_geo, "np", None)
+    a, b = _dense_points(23, seed=1), _dense_points(9, seed=2) + [{"lat": 22.6, "lon": 120.3}]
+    args = ([p["lat"] for p in a], [p["lon"] for p in a], [p["lat"] for p in b], [p["lon"] for p in b])
+    # 23 列、每塊 5 列：最後一塊只有 3 列
+    blocks = list(iter_haversine_blocks(*args, block_rows=5))
+    assert [start for start, _ in blocks] == [0, 5, 10, 15, 20]
+    assert [len(rows) for _, rows in blocks] == [5, 5, 5, 5, 3]
+    matrix = haversine_matrix(*args, block_rows=5)
+    assert len(matrix) == len(a)
+    for p, row in zip(a, matrix):
+        assert len(row) == len(b)
+        for q, got in zip(b, list(row)):
+            assert got == pytest.approx(haversine_m(p["lat"], p["lon"], q["lat"], q["lon"]), abs=1e-6)
+
+
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_haversine_matrix_empty(vectorized, monkeypatch):
+    if not vectorized:
+        monkeypatch.setattr(store_geo, "np", None)
+    assert list(iter_haversine_blocks([], [], [25.0], [121.5])) == []
+    assert len(haversine_matrix([], [], [25.0], [121.5])) == 0
+
+
+@pytest.mark.parametrize("radius_m", [5, 30, 80])
+def test_distance_merge_matches_brute_force(radius_m):
+    pts = _dense_points(1500, seed=radius_m)
+    assert distance_merge(pts, radius_m) == _brute_distance_merge(pts, radius_m)
+
+
+def test_grid_any_within_boundary():
+    grid = SpatialGrid(30)
+    grid.add(25.0, 121.5)
+    lat = 25.0 + 30 / 111194.93  # 約 30m 正北
+    assert grid.any_within(lat - 1e-7, 121.5) == (haversine_m(lat - 1e-7, 121.5, 25.0, 121.5) < 30)
+    assert not grid.any_within(lat + 1e-6, 121.5)
+
+
+def test_cell_dedupe_keeps_first():
+    pts = [{"lat": 25.000001, "lon": 121.5, "id": "a"}, {"lat": 25.000002, "lon": 121.5, "id": "b"},
+           {"lat": 25.0001, "lon": 121.5, "id": "c"}]
+    assert [p["id"] for p in cell_dedupe(pts, GRID_DECIMALS)] == ["a", "c"]
+
+
+def test_grouped_merge_only_compares_within_group():
+    pts = _dense_points(1200, seed=7)
+    for i, p in enumerate(pts):
+        p["brand"] = ("711", "family", "hilife")[i % 3]
+    kept = distance_merge(pts, 30, group_of=lambda p: p["brand"])
+    per_brand = set()
+    for brand in ("711", "family", "hilife"):
+        per_brand.update(id(p) for p in _brute_distance_merge([p for p in pts if p["brand"] == brand], 30))
+    assert kept == [p for p in pts if id(p) in per_brand]
+    # 不分組時不同品牌的鄰居也會被丟掉
+    assert len(distance_merge(pts, 30)) < len(kept)
+
+
+def test_grouped_cell_dedupe():
+    pts = [{"lat": 25.0, "lon": 121.5, "id": "a", "brand": "711"},
+           {"lat": 25.000001, "lon": 121.5, "id": "b", "brand": "family"},
+           {"lat": 25.000002, "lon": 121.5, "id": "c", "brand": "711"}]
+    assert [p["id"] for p in cell_dedupe(pts, GRID_DECIMALS, lambda p: p["brand"])] == ["a", "b"]
+    assert [p["id"] for p in cell_dedupe(pts, GRID_DECIMALS)] == ["a"]
@@ -0,0 +1,95 @@
+import io
+import json
+import os
+
+import pytest
+
+from store_io import JsonArrayWriter, iter_json_array, write_json_atomic
+
+ITEMS = [
+    {"id": "711-node244453297", "coord": [121.565432, 25.033964], "title": "7-Eleven 百吉門市", "emoji": "🥤"},
+    {"title": 'He said "hi" \\ bye', "tags": {"name": "全家便利商店", "nested": [1, [2, {"x": None}]]}},
+    {"n": 0.6, "big": 12345678901234567890, "neg": -1.5e-7, "flags": [True, False, None]},
+    "臺北市信義區松仁路７號",
+    0,
+    [],
+    {},
+]
+CHUNK_SIZES = [1, 2, 3, 5, 7, 64]
+
+
+def _iter(text, key=None, chunk_size=3):
+    return list(iter_json_array(io.StringIO(text), key, chunk_size))
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize("layout", [{}, {"indent": 2}, {"separators": (",", ":")}])
+def test_values_split_across_chunks(chunk_size, layout):
+    text = json.dumps(ITEMS, ensure_ascii=False, **layout)
+    assert _iter(text, chunk_size=chunk_size) == ITEMS
+    # ensure_ascii 時字串內是 \\uXXXX 跳脫（含代理對），同樣會被切開
+    assert _iter(json.dumps(ITEMS), chunk_size=chunk_size) == ITEMS
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_array_under_key(chunk_size):
+    text = json.dumps(
+        {"version": 0.6, "osm3s": {"copyright": "OSM \"contributors\"", "n": [1, 2]}, "elements": ITEMS, "remark": "x"},
+        ensure_ascii=False, indent=1,
+    )
+    assert _iter(text, "elements", chunk_size) == ITEMS
+    assert _iter(text, "missing", chunk_size) == []
+
+
+@pytest.mark.parametrize("text", ["[]", " [ ] ", "\n[\n]\n", "\r\n\t[\r\n\t]"])
+def test_empty_array(text):
+    assert _iter(text, chunk_size=1) == []
+    assert _iter(f'{{"a": 1, "elements": {text}}}', "elements", chunk_size=1) == []
+
+
+def test_whitespace_layouts():
+    text = '\n\t[ 1 ,\r\n  "a"\n,{ "k" :\t[ ] }\n\n]  \n'
+    for chunk_size in CHUNK_SIZES:
+        assert _iter(text, chunk_size=chunk_size) == [1, "a", {"k": []}]
+
+
+@pytest.mark.parametrize("text, key", [("{}", None), ("[1 2]", None), ("[1,", None), ('{"elements": 3}', "elements")])
+def test_malformed_input_raises(text, key):
+    with pytest.raises(ValueError):
+        _iter(text, key)
+
+
+@pytest.mark.parametrize("items", [[], ITEMS[:1], ITEMS])
+def test_writer_matches_json_dump(items, tmp_path):
+    path = tmp_path / "out.json"
+    with JsonArrayWriter(str(path)) as out:
+        for item in items:
+            out.write(item)
+    assert out.count == len(items)
+    reference = tmp_path / "ref.json"
+    with open(reference, "w", encoding="utf-8") as f:
+        json.dump(items, f, ensure_ascii=False, indent=2)
+    assert path.read_bytes() == reference.read_bytes()
+    assert not os.path.exists(f"{path}.tmp")
+    # 寫出的檔案可再以串流讀回
+    with open(path, encoding="utf-8") as f:
+        assert list(iter_json_array(f, chunk_size=5)) == items
+
+
+def test_writer_aborts_on_error(tmp_path):
+    path = tmp_path / "out.json"
+    path.write_text("[1]", encoding="utf-8")
+    with pytest.raises(RuntimeError):
+        with JsonArrayWriter(str(path)) as out:
+            out.write({"a": 1})
+            raise RuntimeError("boom")
+    # 中斷時保留舊檔、不留下暫存檔
+    assert path.read_text(encoding="utf-8") == "[1]"
+    assert os.listdir(tmp_path) == ["out.json"]
+
+
+def test_write_json_atomic(tmp_path):
+    path = tmp_path / "state.json"
+    write_json_atomic(str(path), {"名稱": "全家"}, indent=2)
+    assert json.loads(path.read_text(encoding="utf-8")) == {"名稱": "全家"}
+    assert os.listdir(tmp_path) == ["state.json"]
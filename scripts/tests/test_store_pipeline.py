@@ -0,0 +1,78 @@
+import pytest
+
+from store_pipeline import DEFAULT_MAX_AGE_S, Pipeline, Stage, stale_reason
+
+
+def _write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return str(path)
+
+
+@pytest.fixture
+def graph(tmp_path):
+    """
+    a.txt → a → out_a → c → out_c
+    b.txt → b → out_b → d → out_d
+    各階段都已成功執行過一次
+    """
+    paths = {name: _write(tmp_path / f"{name}.txt", name) for name in
+             ("a", "b", "out_a", "out_b", "out_c", "out_d")}
+    stages = {s.name: s for s in [
+        Stage("a", "store_io.py", inputs=[paths["a"]], outputs=[paths["out_a"]]),
+        Stage("b", "store_io.py", inputs=[paths["b"]], outputs=[paths["out_b"]]),
+        Stage("c", "store_io.py", inputs=[paths["out_a"]], outputs=[paths["out_c"]], deps=["a"]),
+        Stage("d", "store_io.py", inputs=[paths["out_b"]], outputs=[paths["out_d"]], deps=["b"]),
+    ]}
+    state_path = str(tmp_path / "state.json")
+    pipeline = Pipeline(stages, state_path=state_path)
+    for stage in stages.values():
+        pipeline._record(stage, 0)
+    return stages, paths, state_path
+
+
+def _reasons(stages, state_path):
+    """重新載入狀態檔與雜湊快取，逐一計算 stale_reason（不看上游）"""
+    pipeline = Pipeline(stages, state_path=state_path)
+    return {
+        name: stale_reason(stage, pipeline.state["stages"].get(name), pipeline.hashes, False, DEFAULT_MAX_AGE_S)
+        for name, stage in stages.items()
+    }
+
+
+def test_unchanged_inputs_are_fresh(graph):
+    stages, _, state_path = graph
+    assert _reasons(stages, state_path) == {"a": None, "b": None, "c": None, "d": None}
+    assert Pipeline(stages, state_path=state_path).plan(list(stages)) == {"a": None, "b": None, "c": None, "d": None}
+
+
+def test_changed_input_marks_only_dependent_stages(graph):
+    stages, paths, state_path = graph
+    _write(paths["a"], "a, edited")
+
+    reasons = _reasons(stages, state_path)
+    assert reasons["a"].startswith("輸入有變動")
+    assert {name for name, r in reasons.items() if r} == {"a"}
+
+    plan = Pipeline(stages, state_path=state_path).plan(list(stages))
+    assert plan["c"] == "上游可能變動"
+    assert {name for name, r in plan.items() if r} == {"a", "c"}
+
+
+def test_changed_intermediate_marks_downstream_only(graph):
+    stages, paths, state_path = graph
+    # 上游輸出被改：上游本身要重跑（輸出被改過），下游因輸入雜湊不同也要重跑
+    _write(paths["out_b"], "out_b, edited")
+
+    reasons = _reasons(stages, state_path)
+    assert reasons["b"].startswith("輸出")
+    assert reasons["d"].startswith("輸入有變動")
+    assert {name for name, r in reasons.items() if r} == {"b", "d"}
+
+
+def test_same_content_rewrite_is_not_stale(graph):
+    stages, paths, state_path = graph
+    # 重寫成相同內容（mtime 改變）不算變動
+    _write(paths["a"], "a")
+    assert _reasons(stages, state_path) == {"a": None, "b": None, "c": None, "d": None}
+
@@ -0,0 +1,55 @@
+import math
+import random
+
+import pytest
+
+h3 = pytest.importorskip("h3")
+
+from store_geo import EARTH_RADIUS_M, haversine_m  # noqa: E402
+from store_proximity import H3_RESOLUTION, _check, build_table, cells_near  # noqa: E402
+
+RADIUS_M = 20
+CENTERS = [(25.0330, 121.5654), (24.1477, 120.6736), (22.6273, 120.3014), (23.9739, 121.6015)]
+
+
+def _offset(lat, lon, distance_m, bearing):
+    """從 (lat, lon) 沿方位角 bearing（弧度）走 distance_m 米後的位置"""
+    d = distance_m / EARTH_RADIUS_M
+    phi1, lam1 = math.radians(lat), math.radians(lon)
+    phi2 = math.asin(math.sin(phi1) * math.cos(d) + math.cos(phi1) * math.sin(d) * math.cos(bearing))
+    lam2 = lam1 + math.atan2(math.sin(bearing) * math.sin(d) * math.cos(phi1), math.cos(d) - math.sin(phi1) * math.sin(phi2))
+    return math.degrees(phi2), math.degrees(lam2)
+
+
+def _points_in_circle(lat, lon, radius_m, seed):
+    """圓內隨機點加上圓周上每度一點"""
+    rng = random.Random(seed)
+    pts = [_offset(lat, lon, radius_m * math.sqrt(rng.random()), rng.uniform(0, 2 * math.pi)) for _ in range(3000)]
+    pts += [_offset(lat, lon, radius_m, math.radians(deg)) for deg in range(360)]
+    return pts
+
+
+@pytest.mark.parametrize("center", CENTERS)
+def test_cells_near_matches_brute_force(center):
+    lat, lon = center
+    found = cells_near(lat, lon, RADIUS_M)
+
+    # 不漏：圓內（含圓周）任一點所在的格都要在結果中
+    hit = {h3.latlng_to_cell(p_lat, p_lon, H3_RESOLUTION) for p_lat, p_lon in _points_in_circle(lat, lon, RADIUS_M, 0)}
+    assert hit <= found
+
+    # 不多收：每一格的頂點或中心至少有一點離圓心不超過「半徑 + 一個邊長」
+    edge_m = h3.average_hexagon_edge_length(H3_RESOLUTION, unit="m")
+    for cell in found:
+        pts = list(h3.cell_to_boundary(cell)) + [h3.cell_to_latlng(cell)]
+        assert min(haversine_m(lat, lon, p_lat, p_lon) for p_lat, p_lon in pts) <= RADIUS_M + edge_m
+
+
+def test_table_lookup_has_no_misses():
+    points = [{"id": f"711-{i}", "coord": [lon, lat]} for i, (lat, lon) in enumerate(CENTERS)]
+    # 加一間離第一間 15m 的門市，兩者的圓重疊
+    near_lat, near_lon = _offset(*CENTERS[0], 15, 0.7)
+    points.append({"id": "711-near", "coord": [near_lon, near_lat]})
+    table = {"resolution": H3_RESOLUTION, "radius_m": RADIUS_M,
+             "cells": build_table(points, RADIUS_M, H3_RESOLUTION, workers=1)}
+    assert _check(table, points, 3000) == 0
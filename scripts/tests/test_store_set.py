@@ -0,0 +1,65 @@
+import json
+import os
+import random
+
+import pytest
+
+from store_geo import GRID_DECIMALS, cell_dedupe, distance_merge
+from store_linkage import link_records
+from store_set import StoreSet
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "assets", "data")
+
+
+def _export(p):
+    return {"id": p["id"], "coord": p["coord"], "title": p["title"], "emoji": p["emoji"]}
+
+
+def _with_lat_lon(points):
+    return [dict(p, lat=p["coord"][1], lon=p["coord"][0]) for p in points]
+
+
+def _synthetic(n, seed):
+    """兩個來源、四個品牌擠在約 500m 見方內，店名部分相同，含缺店名的紀錄"""
+    rng = random.Random(seed)
+    prefixes = ["ecpay-UNIMART-", "ecpay-FAMI-", "ecpay-HILIFE-", "711-node"]
+    points = []
+    for i in range(n):
+        prefix = rng.choice(prefixes)
+        title = rng.choice(["7-Eleven 信義門市", "統一超商 信義店", "全家 松仁店", "萊爾富", "", None])
+        points.append({
+            "id": f"{prefix}{i}",
+            "coord": [round(121.56 + rng.uniform(0, 0.005), 6), round(25.03 + rng.uniform(0, 0.005), 6)],
+            "title": title,
+            "emoji": "🥤" if prefix in ("ecpay-UNIMART-", "711-node") else "🏪",
+        })
+    return points
+
+
+def _committed_sources():
+    points = []
+    for name in ("ecpay_convenience_stores.json", "taiwan_711_restaurants.json"):
+        with open(os.path.join(DATA_DIR, name), encoding="utf-8") as f:
+            points.extend(json.load(f))
+    return points
+
+
+@pytest.mark.parametrize("points", [_synthetic(600, 1), _synthetic(600, 2), _committed_sources()],
+                         ids=["synthetic-1", "synthetic-2", "committed"])
+def test_link_matches_dict_version(points):
+    dict_stats, set_stats = {}, {}
+    expected = [_export(p) for p in link_records(_with_lat_lon(points), stats=dict_stats)]
+    stores = StoreSet.from_points(points)
+    dropped = stores.link(stats=set_stats)
+    assert list(stores.iter_export()) == expected
+    assert 0 < dropped == len(points) - len(expected)
+    assert set_stats == dict_stats
+
+
+def test_merge_and_dedupe_match_dict_version():
+    points = _synthetic(1500, 3)
+    expected = [_export(p) for p in cell_dedupe(distance_merge(_with_lat_lon(points), 30), GRID_DECIMALS)]
+    stores = StoreSet.from_points(points)
+    stores.distance_merge(30)
+    stores.cell_dedupe(GRID_DECIMALS)
+    assert list(stores.iter_export()) == expected
@@ -0,0 +1,62 @@
+import os
+
+from store_tiles import MANIFEST_NAME, load_manifest, load_points_near, tile_of, write_tiles
+
+TILE_DEG = 0.05
+
+
+def _points():
+    """台北、台中、高雄各幾間，落在不同 tile"""
+    coords = [
+        (121.5601, 25.0301), (121.5612, 25.0333), (121.5150, 25.0480),
+        (120.6801, 24.1401), (120.6855, 24.1500),
+        (120.3010, 22.6270),
+    ]
+    return [
+        {"id": f"711-{i}", "title": f"門市{i}", "emoji": "🥤", "coord": [lon, lat]}
+        for i, (lon, lat) in enumerate(coords)
+    ]
+
+
+def _read_dir(out_dir):
+    files = {}
+    for name in sorted(os.listdir(out_dir)):
+        with open(os.path.join(out_dir, name), "rb") as f:
+            files[name] = f.read()
+    return files
+
+
+def test_write_tiles_is_deterministic(tmp_path):
+    a, b = tmp_path / "a", tmp_path / "b"
+    write_tiles(_points(), str(a), TILE_DEG)
+    write_tiles(_points(), str(b), TILE_DEG)
+    assert _read_dir(str(a)) == _read_dir(str(b))
+
+    # 同一份資料重跑：所有 tile 都沿用，檔案內容不變
+    before = _read_dir(str(a))
+    manifest, stats = write_tiles(_points(), str(a), TILE_DEG)
+    assert stats == {"written": 0, "unchanged": len(manifest["tiles"]), "removed": 0}
+    assert _read_dir(str(a)) == before
+
+
+def test_removed_store_disappears_from_tile_and_manifest(tmp_path):
+    out_dir = str(tmp_path)
+    points = _points()
+    write_tiles(points, out_dir, TILE_DEG)
+
+    # 拿掉台北一間（tile 仍有其他點）與高雄唯一一間（整個 tile 消失）
+    gone_taipei, gone_kaohsiung = points[1], points[5]
+    remaining = [p for p in points if p not in (gone_taipei, gone_kaohsiung)]
+    manifest, stats = write_tiles(remaining, out_dir, TILE_DEG)
+    assert stats["removed"] == 1
+
+    x, y = tile_of(*gone_kaohsiung["coord"], TILE_DEG)
+    assert not os.path.exists(os.path.join(out_dir, f"{x}_{y}.json"))
+    assert f"{x}_{y}" not in {t["key"] for t in manifest["tiles"]}
+    assert load_manifest(out_dir) == manifest
+    assert manifest["count"] == len(remaining)
+
+    near = load_points_near(out_dir, gone_taipei["coord"][1], gone_taipei["coord"][0], 500)
+    assert gone_taipei["id"] not in {p["id"] for p in near}
+    assert points[0]["id"] in {p["id"] for p in near}
+    assert sorted(os.listdir(out_dir)) == sorted([t["file"] for t in manifest["tiles"]] + [MANIFEST_NAME])